@@ -56,7 +56,8 @@ class EbayNetworkDriver(object):
         if not pre_check_data:
             return
         requested_vlan_tags, current_running_config = pre_check_data
-        commands = self.update_switch_port_vlans_on_device(interface, port)
+        commands = self.update_switch_port_vlans_on_device(
+            interface, port, current_config=current_running_config)
         self.post_check_update_switch_port_vlans(
             interface, current_running_config, port, requested_vlan_tags)
         return commands
@@ -70,6 +71,14 @@ class EbayNetworkDriver(object):
         """
         pass
 
+    @abc.abstractmethod
+    def get_vlan_states(self):
+        """
+            Get the status of all the vlans on the device in one fetch
+        :return:{2: u'active', 3: u'suspend'}
+        """
+        pass
+
     @abc.abstractmethod
     def create_vlan(self, name, number, is_active):
         """
@@ -103,6 +112,43 @@ class EbayNetworkDriver(object):
         """
         pass
 
+    @abc.abstractmethod
+    def get_vlans_on_interfaces(self):
+        """
+
+        :return: get vlans configured on all the interfaces, read in one
+        fetch.
+
+        {u'Ethernet1': {'native_vlan': u'2', 'trunk_vlans': u'2-3',
+                        'switch_port_mode': u'trunk'}}
+        """
+        pass
+
+    def get_ports_snapshot(self):
+        """Reads the admin state, label and vlans of every interface.
+
+        Two bulk reads for the whole device, instead of two per port, for
+        comparing the device with what netforce has recorded.
+
+        :return:
+        {u'Ethernet1': {'is_enabled': True, 'description': u'foo',
+                        'native_vlan': u'2', 'trunk_vlans': u'2-3',
+                        'switch_port_mode': u'trunk'}}
+        """
+        vlans_on_interfaces = self.get_vlans_on_interfaces()
+        snapshot = {}
+        for name, data in six.iteritems(self._get_all_interfaces()):
+            port = {
+                'is_enabled': data.get('is_enabled'),
+                'description': data.get('description')
+            }
+            port.update(vlans_on_interfaces.get(name, {}))
+            snapshot[name] = port
+        return snapshot
+
+    def _get_all_interfaces(self):
+        return self.get_interfaces()
+
     @abc.abstractmethod
     def get_interfaces_by_name(self, interface_names):
         """
@@ -153,12 +199,11 @@ class EbayNetworkDriver(object):
         :return: commands
         """
         interface = str(interface)
-        current_running_config = self.pre_check_disable_interface(interface)
-        if not current_running_config:
+        snapshot = self.pre_check_disable_interface(interface)
+        if not snapshot:
             return
         commands = self.disable_interface_on_device(interface)
-        self.post_check_disable_interface(interface,
-                                         current_running_config)
+        self.post_check_disable_interface(interface, snapshot)
         return commands
 
     def enable_interface(self, interface):
@@ -168,13 +213,11 @@ class EbayNetworkDriver(object):
         :return: commands
         """
         interface = str(interface)
-        pre_check_data = self.pre_check_enable_interface(interface)
-        if not pre_check_data:
+        snapshot = self.pre_check_enable_interface(interface)
+        if not snapshot:
             return
-        current_running_config = pre_check_data
         commands = self.enable_interface_on_device(interface)
-        self.post_check_enable_interface(interface,
-                                         current_running_config)
+        self.post_check_enable_interface(interface, snapshot)
         return commands
 
     @abc.abstractmethod
@@ -196,6 +239,15 @@ class EbayNetworkDriver(object):
         """
         pass
 
+    @abc.abstractmethod
+    def get_mac_address_table(self):
+        """
+            Get the learned mac addresses of all the interfaces in one fetch
+        :return: [{'mac_address': 'dead.dead.dead', 'vlan': 2,
+                   'interface': 'Ethernet1'}]
+        """
+        pass
+
     @abc.abstractmethod
     def get_traffic_on_interface(self, interface_name):
         """
@@ -245,7 +297,8 @@ class EbayNetworkDriver(object):
         pass
 
     @abc.abstractmethod
-    def update_switch_port_vlans_on_device(self, interface, port):
+    def update_switch_port_vlans_on_device(self, interface, port,
+                                           current_config=None):
         """
             updating switch port mode and tag the port with specified vlans.
 
@@ -268,8 +321,10 @@ class EbayNetworkDriver(object):
                         }
                         ]
                      }
-        :param old_switch_port_mode This is temporary until pre-validation
-                                    is ready.
+        :param current_config: the get_vlans_on_interface output read by
+                               the pre-check; when given, a trunk that
+                               stays a trunk is changed by adding and
+                               removing only the vlans that differ.
         :return: commands
         """
 
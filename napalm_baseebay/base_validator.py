@@ -16,8 +16,11 @@
 
 import napalm_baseebay.ebay_exceptions as exceptions
 import netaddr
+from netforce.common import vlan_bitmap
+from netforce.plugins.common import netforce_constants
 from oslo_config import cfg
 from oslo_log import log as logging
+import six
 import socket
 
 LOG = logging.getLogger(__name__)
@@ -44,6 +47,8 @@ cfg.CONF.register_opts(device_traffic_opts)
 class ValidatorMixin(object):
 
     def post_change_validate_vlan(self, number):
+        # the vlans of the device changed, read them again when needed.
+        self._vlan_bitmaps = None
         vlan = self.get_vlan(number)
         if not vlan:
             raise exceptions.PostChangeValidationException(
@@ -122,18 +127,15 @@ class ValidatorMixin(object):
         vlan_tags = self.get_requested_vlans(port['vlans'])
         current_trunk_vlan_tags = vlan_data.get('trunk_vlans', None)
         current_access_vlan = vlan_data.get('access_vlan', None)
-        if current_trunk_vlan_tags:
-            current_trunk_vlan_tags = self._parse_vlan_range(
-                [str(member) for member in current_trunk_vlan_tags])
         current_switchport_mode = vlan_data.get('switch_port_mode', None)
         if port['switch_port_mode'] != current_switchport_mode:
             return False
         if current_trunk_vlan_tags:
-            if set(current_trunk_vlan_tags) != set(vlan_tags):
+            if self._parse_vlan_range(current_trunk_vlan_tags) != vlan_tags:
                 return False
 
         if current_access_vlan:
-            if set(current_access_vlan) != set(vlan_tags):
+            if self._parse_vlan_range(current_access_vlan) != vlan_tags:
                 return False
 
         native_vlan_id = vlan_data.get('native_vlan', None)
@@ -145,14 +147,14 @@ class ValidatorMixin(object):
         return True
 
     def get_requested_vlans(self, vlans):
-
-        vlan_tags = []
+        """Returns the tags of the requested vlans as a VlanBitmap."""
+        vlan_tags = vlan_bitmap.VlanBitmap()
         if vlans:
             for vlan in vlans:
                 if vlan.get('vlan', None):
                     vlan_data = vlan['vlan']
                     if vlan_data.get('tag', None):
-                        vlan_tags.append(str(vlan_data['tag']))
+                        vlan_tags.add(vlan_data['tag'])
         return vlan_tags
 
     def _get_requested_native_vlan(self, vlans):
@@ -164,21 +166,71 @@ class ValidatorMixin(object):
                     return vlan_data.get('tag', None)
 
     def _parse_vlan_range(self, vlan_members):
-        # Iterate the members and parse '-' and get the range of vlan members.
-        # e.g. vlan members = ['51-60']. Convert it to ['51', '52'..].
-        # e.g. vlan_members = ['1', '20', '31-33', 'tatat'] =>
-        # ['1', '20', '31', '32', '33']
-        all_members = []
+        # Parse the vlan members of a port into a VlanBitmap, skipping the
+        # ones that are not tags or ranges of tags.
+        # e.g. vlan_members = ['1', '20', '31-33', 'tatat'] or
+        # '1,20,31-33' => 1,20,31-33
         LOG.debug("vlan members are %s" % vlan_members)
-        for mem in vlan_members:
-            if mem.isdigit():
-                all_members.append(str(mem))
-            elif '-' in mem:
-                vlan_range = mem.split('-')
-                for i in range(int(vlan_range[0]), int(vlan_range[1]) + 1):
-                    all_members.append(str(i))
-                continue
-        return all_members
+        return vlan_bitmap.VlanBitmap.from_ranges(vlan_members,
+                                                  ignore_invalid=True)
+
+    def get_trunk_vlan_delta(self, current_config, port):
+        """Returns what to change to move a trunk to the requested vlans.
+
+        The result is (vlans_to_add, vlans_to_remove, native_vlan), the
+        first two VlanBitmaps and native_vlan the requested native vlan, or
+        None when it is already the native one. None is returned instead
+        when the port is not a trunk now, or when its current members can
+        not be read as tags, and the whole configuration has to be pushed.
+        """
+        if not isinstance(current_config, dict) or \
+                port['switch_port_mode'] != 'trunk' or \
+                current_config.get('switch_port_mode') != 'trunk':
+            return None
+        members = current_config.get('trunk_vlans')
+        if not members:
+            return None
+        try:
+            current_vlans = vlan_bitmap.VlanBitmap.from_ranges(members)
+        except ValueError:
+            # ALL, NONE or vlan names, do not guess.
+            return None
+        requested_vlans = self.get_requested_vlans(port['vlans'])
+        native_vlan = self._get_requested_native_vlan(port['vlans'])
+        if str(native_vlan) == str(current_config.get('native_vlan')):
+            native_vlan = None
+        vlans_to_add, vlans_to_remove = requested_vlans.diff(current_vlans)
+        return vlans_to_add, vlans_to_remove, native_vlan
+
+    def get_vlan_bitmaps(self, refresh=False):
+        """Returns (vlans on the device, suspended vlans) as VlanBitmaps.
+
+        All the vlans are read with one fetch and kept for the life of the
+        driver, i.e. the device session, so that validating many ports or a
+        wide trunk costs one round trip.
+        """
+        if refresh or getattr(self, '_vlan_bitmaps', None) is None:
+            existing = vlan_bitmap.VlanBitmap()
+            suspended = vlan_bitmap.VlanBitmap()
+            for tag, status in six.iteritems(self.get_vlan_states()):
+                existing.add(tag)
+                if status == 'suspend':
+                    suspended.add(tag)
+            self._vlan_bitmaps = (existing, suspended)
+        return self._vlan_bitmaps
+
+    def _validate_vlan_tags(self, vlan_tags):
+        # Validate if the vlans exist and are not suspended.
+        vlan_tags = vlan_bitmap.VlanBitmap(vlan_tags)
+        existing, suspended = self.get_vlan_bitmaps()
+        missing = vlan_tags - existing
+        if missing:
+            raise exceptions.EntityDoesNotExistsException(
+                'vlan %s does not exist' % missing)
+        in_suspend = vlan_tags & suspended
+        if in_suspend:
+            raise exceptions.EntityInSuspendedModeException(
+                'vlan_tag %s' % in_suspend)
 
     def pre_check_update_switch_port_vlans(
             self, interface, mode, port):
@@ -233,63 +285,118 @@ class ValidatorMixin(object):
             raise exceptions.EntityDoesNotExistsException(
                 'vrf %s does not exist.' % vrf_name)
 
-    def _check_interface_config(self, interface):
+    def get_interface_snapshot(self, interface, with_traffic=False):
+        """Returns the state of an interface the port checks work from.
+
+        {'exists': True, 'is_enabled': True,
+         'running_config': ['interface Ethernet1', 'description foo'],
+         'traffic': (input_bits, output_bits) or None}
+
+        Only 'exists' is set for an interface that is not on the device.
+        This default reads the state with the per item getters, drivers
+        that can read it in one round trip override it.
+        """
         interfaces_data = self.get_interfaces_by_name(interface)
         if interface not in interfaces_data:
+            return {'exists': False}
+        running_config = self.get_interface_running_config(interface)
+        snapshot = {
+            'exists': True,
+            'is_enabled': self._is_enabled_in_running_config(running_config),
+            'running_config': running_config,
+            'traffic': None
+        }
+        if with_traffic:
+            snapshot['traffic'] = self.get_traffic_on_interface(interface)
+        return snapshot
+
+    def _is_enabled_in_running_config(self, running_config):
+        if isinstance(running_config, six.string_types):
+            running_config = running_config.split('\n')
+        for conf in running_config:
+            if conf.strip() == netforce_constants.DISABLE_PORT:
+                return False
+        return True
+
+    def diff_interface_snapshots(self, before, after):
+        """Returns what changed on an interface between two snapshots.
+
+        {'is_enabled': (before, after),
+         'running_config': (lines added, lines removed)}, with only the
+        keys that changed.
+        """
+        diff = {}
+        if before.get('is_enabled') != after.get('is_enabled'):
+            diff['is_enabled'] = (before.get('is_enabled'),
+                                  after.get('is_enabled'))
+        before_config = before.get('running_config') or []
+        after_config = after.get('running_config') or []
+        if before_config != after_config:
+            if isinstance(before_config, six.string_types):
+                before_config = before_config.split('\n')
+            if isinstance(after_config, six.string_types):
+                after_config = after_config.split('\n')
+            diff['running_config'] = (
+                [conf for conf in after_config if conf not in before_config],
+                [conf for conf in before_config if conf not in after_config])
+        return diff
+
+    def _check_interface_config(self, interface, with_traffic=True):
+        snapshot = self.get_interface_snapshot(
+            interface,
+            with_traffic=with_traffic and cfg.CONF.enable_traffic_check)
+        if not snapshot['exists']:
             raise exceptions.EntityDoesNotExistsException(
                 'interface %s does not exists' % interface)
-        self.check_traffic_on_interface(interface)
-        is_enabled = self.is_interface_enabled(interface)
-        current_running_config = self.get_interface_running_config(
-            interface)
-        return is_enabled, current_running_config
+        if snapshot['traffic']:
+            input_bits, output_bits = snapshot['traffic']
+            self.parse_and_compare_traffic_on_interface(
+                interface, input_bits, output_bits)
+        return snapshot
 
     def pre_check_enable_interface(self, interface):
         # Ensure the configuration is not same as the one requested.
-        is_enabled, current_running_config = self._check_interface_config(
-            interface)
-        if is_enabled:
+        snapshot = self._check_interface_config(interface)
+        if snapshot['is_enabled']:
             # If port is already enabled, just return saying current is same
             # as requested.
             LOG.info("Port %s is already enabled. Hence changes will not be"
                      " pushed.", interface)
             return
-        return current_running_config
+        return snapshot
 
-    def post_check_enable_interface(self, interface,
-                                    previous_running_config):
+    def post_check_enable_interface(self, interface, previous_snapshot):
         # Ensure the configuration is not same as the one requested.
-        is_enabled, current_running_config = self._check_interface_config(
-            interface)
-        if previous_running_config == current_running_config and not \
-                is_enabled:
+        snapshot = self._check_interface_config(interface,
+                                                with_traffic=False)
+        diff = self.diff_interface_snapshots(previous_snapshot, snapshot)
+        if not diff and not snapshot['is_enabled']:
             msg = 'Unable to enable port for current config %s' \
-                  % current_running_config
+                  % snapshot['running_config']
             raise exceptions.PostChangeValidationException(msg)
-        LOG.debug("successfully enabled port %s", interface)
+        LOG.debug("successfully enabled port %s: %s", interface, diff)
 
     def pre_check_disable_interface(self, interface):
         # Ensure the configuration is not same as the one requested.
-        is_enabled, current_running_config = self._check_interface_config(
-            interface)
-        if not is_enabled:
+        snapshot = self._check_interface_config(interface)
+        if not snapshot['is_enabled']:
             # If port is already disabled, just return saying current is same
             # as requested.
             LOG.info("Since port %s is already disabled, no changes will be"
                      " pushed." % interface)
             return
-        return current_running_config
+        return snapshot
 
-    def post_check_disable_interface(self, interface,
-                                     previous_running_config):
+    def post_check_disable_interface(self, interface, previous_snapshot):
         # Ensure the configuration is not same as the one requested.
-        is_enabled, current_running_config = self._check_interface_config(
-            interface)
-        if is_enabled:
-            msg = 'Unable to shutdown port for current config %s',\
-                  current_running_config
+        snapshot = self._check_interface_config(interface,
+                                                with_traffic=False)
+        if snapshot['is_enabled']:
+            msg = 'Unable to shutdown port for current config %s' \
+                  % snapshot['running_config']
             raise exceptions.PostChangeValidationException(msg)
-        LOG.debug("successfully disabled port %s", interface)
+        LOG.debug("successfully disabled port %s: %s", interface,
+                  self.diff_interface_snapshots(previous_snapshot, snapshot))
 
     def convert_to_bits_per_sec(self, trans_unit, bits):
         trans_unit = trans_unit.lower()
@@ -21,15 +21,17 @@ from napalm_baseebay import base_ebay
 from napalm_baseebay import base_validator
 import napalm_baseebay.ebay_exceptions as exceptions
 import napalm_eos as base_eos_driver
-from netforce.plugins.common import netforce_constants
+from netforce.common import vlan_bitmap
 from oslo_log import log as logging
-from pyeapi.eapilib import CommandError
 import re
 import socket
 
 MAC_REGEX = r"[a-fA-F0-9]{4}\.[a-fA-F0-9]{4}\.[a-fA-F0-9]{4}"
 VLAN_REGEX = r"\d{1,4}"
 RE_MAC = re.compile(r"{}".format(MAC_REGEX))
+# e.g. 5 minutes input rate 830 Mbps (8.4% with framing overhead), ...
+RE_RATE = re.compile(r"^\d+ \w+ (input|output) rate (\d+) (\S+)")
+RE_RATE_LINE = re.compile(r"^(Last )?\d+ \w+ (input|output) rate\b")
 
 LOG = logging.getLogger(__name__)
 
@@ -133,6 +135,11 @@ class EbayEosDriver(base_connection.SSHConnectionMixin,
                 return vlan_dict
             return None
 
+    def get_vlan_states(self):
+        output = self._exec_command_json('show vlan')
+        return dict((int(tag), vlan['status']) for tag, vlan in
+                    output.get('vlans', {}).iteritems())
+
     def create_vlan(self, name, number, is_active):
         """
 
@@ -158,6 +165,18 @@ class EbayEosDriver(base_connection.SSHConnectionMixin,
         :param interface_number:
         :return:
         """
+        vlans_on_interfaces = self.get_vlans_on_interfaces()
+        if self._long_interface_name(interface) not in vlans_on_interfaces:
+            raise exceptions.EntityDoesNotExistsException(
+                'interface %s does not exists' %
+                interface.replace("hernet", ""))
+        return vlans_on_interfaces[self._long_interface_name(interface)]
+
+    def get_vlans_on_interfaces(self):
+        """
+            Get vlans configured on all the interfaces
+        :return:
+        """
         # a dict to map the device property names to driver names.
         device_prop_to_driver_dict = {
             'Trunking VLANs Enabled': 'trunk_vlans',
@@ -195,45 +214,41 @@ class EbayEosDriver(base_connection.SSHConnectionMixin,
                                     device_prop_to_driver_dict[prop_key]] = \
                                     prop_value
 
-        interface = interface.replace("hernet", "")
-        if interface not in interface_dict:
-            raise exceptions.EntityDoesNotExistsException(
-                'interface %s does not exists' % interface)
-
-        interface_data = interface_dict[interface]
-        access_vlan = interface_data['access_vlan']
-        native_vlan = interface_data['native_vlan']
-        if '(' in access_vlan:
-            access_vlan = access_vlan.split('(')[0].strip()
-            interface_data['access_vlan'] = access_vlan
-        if '(' in native_vlan:
-            native_vlan = native_vlan.split('(')[0].strip()
-            interface_data['native_vlan'] = native_vlan
-        if interface_data['switch_port_mode'] == 'static access':
-            interface_data.pop('trunk_vlans')
-        else:
-            interface_data.pop('access_vlan')
-        return interface_data
-
-    # Validate if the vlans exists
-    def _validate_vlan_tags(self, vlan_tags):
-        for v in vlan_tags:
-            try:
-                vlan_wiri = self.get_vlan(int(v))
-                if vlan_wiri and vlan_wiri['status'] == 'suspend':
-                    raise exceptions.\
-                        EntityInSuspendedModeException('vlan_tag %s' % v)
-            except CommandError:
-                raise exceptions.\
-                    EntityDoesNotExistsException('vlan %s does not exist'
-                                                 '' % str(v))
-
-    def update_switch_port_vlans_on_device(self, interface, port):
+        vlans_on_interfaces = dict()
+        for interface, interface_data in interface_dict.iteritems():
+            for key in ('access_vlan', 'native_vlan'):
+                if '(' in interface_data.get(key, ''):
+                    interface_data[key] = \
+                        interface_data[key].split('(')[0].strip()
+            if interface_data.get('switch_port_mode') == 'static access':
+                interface_data.pop('trunk_vlans', None)
+            else:
+                interface_data.pop('access_vlan', None)
+            vlans_on_interfaces[self._long_interface_name(interface)] = \
+                interface_data
+        return vlans_on_interfaces
+
+    def _long_interface_name(self, interface):
+        # show interfaces switchport names the interfaces Et1, Po1.
+        for short_name, long_name in (('Et', 'Ethernet'),
+                                      ('Po', 'Port-Channel')):
+            if interface.startswith(short_name) and \
+                    not interface.startswith(long_name):
+                return long_name + interface[len(short_name):]
+        return interface
+
+    def _get_all_interfaces(self):
+        # get_interfaces lists the interface lines, read the parsed data.
+        return self._parse_interfaces_output(
+            self._exec_command_json('show interfaces'))
+
+    def update_switch_port_vlans_on_device(self, interface, port,
+                                           current_config=None):
         mode = port['switch_port_mode']
         commands = []
         interface_number = interface[len("Ethernet"):]
         commands.append('interface ethernet %s' % interface_number)
-        vlans_allowed = []
+        vlans_allowed = vlan_bitmap.VlanBitmap()
         vlans = port['vlans']
         native_vlan = None
 
@@ -250,18 +265,37 @@ class EbayEosDriver(base_connection.SSHConnectionMixin,
         else:
             for vlan in vlans:
                 vlan_data = vlan['vlan']
-                vlans_allowed.append(str(vlan_data['tag']))
+                vlans_allowed.add(vlan_data['tag'])
                 if vlan_data['is_native']:
                     native_vlan = str(vlan_data['tag'])
 
             if not native_vlan:
                 raise exceptions.NoNativeVlan(reason=str(vlans))
 
-            commands.append('no switchport access vlan')
-            commands.append('switchport trunk native vlan %s' % native_vlan)
-            commands.append('switchport mode trunk')
-            commands.append('switchport trunk allowed vlan %s' % ','.join(
-                vlans_allowed))
+            delta = self.get_trunk_vlan_delta(current_config, port)
+            if delta is None:
+                commands.append('no switchport access vlan')
+                commands.append('switchport trunk native vlan %s' %
+                                native_vlan)
+                commands.append('switchport mode trunk')
+                commands.append('switchport trunk allowed vlan %s' %
+                                vlans_allowed.to_ranges())
+            else:
+                vlans_to_add, vlans_to_remove, native_change = delta
+                if vlans_to_add:
+                    commands.append('switchport trunk allowed vlan add %s' %
+                                    vlans_to_add.to_ranges())
+                if native_change:
+                    commands.append('switchport trunk native vlan %s' %
+                                    native_change)
+                if vlans_to_remove:
+                    commands.append(
+                        'switchport trunk allowed vlan remove %s' %
+                        vlans_to_remove.to_ranges())
+                if len(commands) == 1:
+                    LOG.info('Trunk vlans of %s are already as requested' %
+                             interface)
+                    return
 
         self._execute(config=commands, commit=True)
         return str(commands)
@@ -325,29 +359,6 @@ class EbayEosDriver(base_connection.SSHConnectionMixin,
             [conf.strip() for conf in current_running_config]
         return current_running_config
 
-    def _parse_mac_address_table(self, data):
-        '''
-        data sample:
-            {u'multicastTable': {u'tableEntries': []},
-              u'unicastTable': {u'tableEntries': [
-                        {u'macAddress': u'54:52:00:23:f2:e5',
-                        u'lastMove': 1473243754.287243,
-                        u'vlanId': 3,
-                        u'interface': u'Ethernet1',
-                        u'moves': 1,
-                        u'entryType': u'dynamic'}]
-                        }}
-        '''
-        rslt = []
-        mac_entry = data['unicastTable']['tableEntries']
-        if mac_entry:
-            elem = {'mac_address': mac_entry['macAddress'],
-                    'vlan': mac_entry['vlanId']}
-            rslt.append(elem)
-            return rslt
-        else:
-            return rslt
-
     def get_mac_addresses_on_interface(self, interface_name, vlan=None):
         """
         Returns a lists of dictionaries. Each dictionary represents an entry
@@ -379,6 +390,44 @@ class EbayEosDriver(base_connection.SSHConnectionMixin,
         if not found:
             raise exceptions.EntityDoesNotExistsException(
                 'interface %s does not exists' % interface_name)
+        if vlan:
+            cmd = "show mac address-table vlan %s " % vlan
+        else:
+            cmd = 'show mac address-table interface %s ' % interface_name
+        mac_address_table = self._parse_mac_address_table(
+            self._exec_command(cmd))
+        result = []
+        interface_name = interface_name.replace('Ethernet', 'Et')
+        if mac_address_table:
+            for mac_address in mac_address_table:
+                if interface_name == mac_address['interface']:
+                    result.append(
+                        {
+                            'mac_address': mac_address['mac'],
+                            'vlan': int(mac_address['vlan'])
+                        }
+                    )
+                if vlan and vlan == mac_address['vlan']:
+                    result.append(
+                        {
+                            'mac_address': mac_address['mac'],
+                            'vlan': int(mac_address['vlan'])
+                        }
+                    )
+
+        return result
+
+    def get_mac_address_table(self):
+        """Returns the learned mac addresses of all the interfaces."""
+        self._check_if_connected()
+        output = self._exec_command('show mac address-table')
+        return [{'mac_address': entry['mac'],
+                 'vlan': entry['vlan'],
+                 'interface': self._long_interface_name(entry['interface'])}
+                for entry in self._parse_mac_address_table(output)
+                if entry['interface'] and not entry['static']]
+
+    def _parse_mac_address_table(self, output):
         RE_MACTABLE_DEFAULT = r"^" + MAC_REGEX
         RE_MACTABLE_6500_1 = r"^\*\s+{}\s+{}\s+".\
             format(VLAN_REGEX, MAC_REGEX)  # 7 fields
@@ -418,11 +467,6 @@ class EbayEosDriver(base_connection.SSHConnectionMixin,
             }
 
         mac_address_table = []
-        if vlan:
-            cmd = "show mac address-table vlan %s " % vlan
-        else:
-            cmd = 'show mac address-table interface %s ' % interface_name
-        output = self._exec_command(cmd)
         # Skip the header lines
         output = re.split(r'^----.*', output, flags=re.M)[1:]
         output = "\n".join(output).strip()
@@ -515,26 +559,7 @@ class EbayEosDriver(base_connection.SSHConnectionMixin,
             else:
                 raise ValueError("Unexpected output from: {}".
                                  format(repr(line)))
-        result = []
-        interface_name = interface_name.replace('Ethernet', 'Et')
-        if mac_address_table:
-            for mac_address in mac_address_table:
-                if interface_name == mac_address['interface']:
-                    result.append(
-                        {
-                            'mac_address': mac_address['mac'],
-                            'vlan': int(mac_address['vlan'])
-                        }
-                    )
-                if vlan and vlan == mac_address['vlan']:
-                    result.append(
-                        {
-                            'mac_address': mac_address['mac'],
-                            'vlan': int(mac_address['vlan'])
-                        }
-                    )
-
-        return result
+        return mac_address_table
 
     def get_traffic_on_interface(self, interface_name):
         self._check_if_connected()
@@ -563,11 +588,43 @@ class EbayEosDriver(base_connection.SSHConnectionMixin,
     def is_interface_enabled(self, interface):
         current_running_config = self.get_interface_running_config(
             interface)
-        is_enabled = True
-        for conf in current_running_config:
-            if netforce_constants.DISABLE_PORT in conf:
-                is_enabled = False
-        return is_enabled
+        return self._is_enabled_in_running_config(current_running_config)
+
+    def get_interface_snapshot(self, interface, with_traffic=False):
+        # the running config and the rates are read over one session
+        # instead of one per getter.
+        self._check_if_connected()
+        commands = ['show running-config interfaces %s' % interface]
+        if with_traffic:
+            commands.append('show interfaces %s | include rate' % interface)
+        output = self._exec_command('\n'.join(commands)) or ''
+        running_config = []
+        traffic = {}
+        for line in output.split('\n'):
+            line = line.strip()
+            if with_traffic and RE_RATE_LINE.match(line):
+                # a rate line, parsed or not, is never running config.
+                match = RE_RATE.match(line)
+                if match:
+                    direction, bits, trans_unit = match.groups()
+                    traffic[direction] = self.convert_to_bits_per_sec(
+                        trans_unit, bits)
+            elif line:
+                running_config.append(line)
+        if 'interface %s' % interface not in running_config:
+            return {'exists': False}
+        if with_traffic and len(traffic) < 2:
+            # the rate lines did not parse, read them on their own rather
+            # than take a busy port for an idle one.
+            traffic = dict(zip(('input', 'output'),
+                               self.get_traffic_on_interface(interface)))
+        return {
+            'exists': True,
+            'is_enabled': self._is_enabled_in_running_config(running_config),
+            'running_config': running_config,
+            'traffic': (traffic['input'], traffic['output'])
+            if with_traffic else None
+        }
 
     def create_subnet(self, subnet, vlan_id):
 
@@ -21,7 +21,6 @@ from napalm_baseebay import base_ebay
 from napalm_baseebay import base_validator
 from napalm_baseebay import ebay_exceptions
 
-from netforce.plugins.common import netforce_constants
 from oslo_log import log as logging
 import re
 import time
@@ -149,10 +148,20 @@ class IOSDriver(base_connection.SSHConnectionMixin,
     def get_vlan(self, number):
         pass
 
+    def get_vlan_states(self):
+        pass
+
     def get_vlans_on_interface(self, interface):
         pass
 
-    def update_switch_port_vlans_on_device(self, interface, port):
+    def get_vlans_on_interfaces(self):
+        pass
+
+    def get_mac_address_table(self):
+        pass
+
+    def update_switch_port_vlans_on_device(self, interface, port,
+                                           current_config=None):
         pass
 
     def create_vlan(self, name, number, is_active):
@@ -212,11 +221,7 @@ class IOSDriver(base_connection.SSHConnectionMixin,
     def is_interface_enabled(self, interface):
         current_running_config = self.get_interface_running_config(
             interface)
-        is_enabled = True
-        for conf in current_running_config:
-            if netforce_constants.DISABLE_PORT in conf:
-                is_enabled = False
-        return is_enabled
+        return self._is_enabled_in_running_config(current_running_config)
 
     def get_mac_addresses_on_interface(self, interface_name, vlan=None):
 
@@ -118,29 +118,35 @@ class JunOsEbayDriver(base_junos_driver.JunOSDriver,
                                              % (interface))
 
     def get_vlans_on_interface(self, interface):
-        result = {}
+        vlans_on_interfaces = self.get_vlans_on_interfaces()
+        if interface in vlans_on_interfaces:
+            return vlans_on_interfaces[interface]
+        raise exceptions.EntityDoesNotExistsException(
+            'interface %s does not exists' % interface)
+
+    def get_vlans_on_interfaces(self):
+        vlans_on_interfaces = {}
         interfaces = junos_views.junos_config_iface_table(self.device)
         interfaces.get()
-        # interfaces
-        if interface in interfaces:
+        for interface in interfaces.keys():
+            result = {}
             vlan_members = interfaces[interface]['members']
             if isinstance(vlan_members, unicode):
                 vlan_members = [str(vlan_members)]
             else:
-                vlan_members = [str(mem) for mem in vlan_members]
+                vlan_members = [str(mem) for mem in vlan_members or []]
             result['native_vlan'] = str(interfaces[interface]
                                         ['native-vlan-id']) \
                 if interfaces[interface]['native-vlan-id'] else None
 
             if interfaces[interface]['interface-mode'] == "access":
-                result['access_vlan'] = [vlan_members[0]]
+                result['access_vlan'] = vlan_members[:1]
             else:
                 result['trunk_vlans'] = vlan_members
             result['switch_port_mode'] =\
                 interfaces[interface]['interface-mode']
-            return result
-        raise exceptions.EntityDoesNotExistsException(
-            'interface %s does not exists' % interface)
+            vlans_on_interfaces[interface] = result
+        return vlans_on_interfaces
 
     def get_all_vlans_on_device(self):
         """
@@ -155,29 +161,9 @@ class JunOsEbayDriver(base_junos_driver.JunOSDriver,
         LOG.debug("All vlans configured on device are %s" % all_vlans_on_dev)
         return all_vlans_on_dev
 
-    def _validate_vlan_tags(self, vlan_tags):
-        """
-        :param vlans:
-        :return:
-        """
-        valid_tags = []
-        all_vlans_on_dev = self.get_all_vlans_on_device()
-        # all_vlans_on_dev = [{'status': None, 'tag': '10', 'name':
-        # 'INFRA-lab1-10-10', 'members': 'ae0.0*'}]
-        # Here compare two lists , one is requested vlan_list with one on
-        # device. We also want to compare the status of vlans and make sure
-        # the status is active before pushing any changes.
-        for tag in vlan_tags:
-            for vlan in all_vlans_on_dev:
-                if vlan['status'] == 'suspend':
-                    raise exceptions.EntityInSuspendedModeException(
-                        'vlan_tag %s' % vlan['tag'])
-                if tag == vlan['tag']:
-                    valid_tags.append(tag)
-        if set(valid_tags) == set(vlan_tags):
-            return
-        msg = 'vlans does not exist on device. %s' % vlan_tags
-        raise exceptions.InvalidValueForParameterException(msg)
+    def get_vlan_states(self):
+        return dict((int(vlan['tag']), vlan['status']) for vlan in
+                    self.get_all_vlans_on_device() if vlan['tag'])
 
     def _check_native_vlan_id(self, interface):
 
@@ -185,7 +171,8 @@ class JunOsEbayDriver(base_junos_driver.JunOSDriver,
         vlan_data = self.get_vlans_on_interface(interface)
         return True if vlan_data["native_vlan"] else False
 
-    def update_switch_port_vlans_on_device(self, interface, port):
+    def update_switch_port_vlans_on_device(self, interface, port,
+                                           current_config=None):
 
         # Do pre-validation before pushing any changes to device.
         # check the tags are valid
@@ -227,6 +214,18 @@ class JunOsEbayDriver(base_junos_driver.JunOSDriver,
             if not native_vlan:
                 raise exceptions.NoNativeVlan(reason=str(vlans))
 
+            delta = self._get_junos_trunk_vlan_delta(current_config, port)
+            if delta is not None:
+                set_commands = self._get_trunk_delta_commands(interface,
+                                                              *delta)
+                if not set_commands:
+                    LOG.info('Trunk vlans of %s are already as requested' %
+                             interface)
+                    return
+                self.device.cu.load(set_commands, format="set")
+                self.device.cu.commit(sync=True)
+                return set_commands
+
             set_commands = """
                            delete interfaces %s unit 0 family \
                            ethernet-switching vlan members
@@ -239,6 +238,31 @@ class JunOsEbayDriver(base_junos_driver.JunOSDriver,
         self.device.cu.commit(sync=True)
         return set_commands
 
+    def _get_junos_trunk_vlan_delta(self, current_config, port):
+        # a member configured as a range can only be deleted as a whole,
+        # such trunks are rewritten in full.
+        members = current_config.get('trunk_vlans') \
+            if isinstance(current_config, dict) else None
+        if not members or any('-' in str(m) for m in members):
+            return None
+        return self.get_trunk_vlan_delta(current_config, port)
+
+    def _get_trunk_delta_commands(self, interface, vlans_to_add,
+                                  vlans_to_remove, native_vlan):
+        commands = []
+        if vlans_to_add:
+            commands.append('set interfaces %s unit 0 family '
+                            'ethernet-switching vlan members [ %s ]' %
+                            (interface, ' '.join(map(str, vlans_to_add))))
+        if native_vlan:
+            commands.append('set interfaces %s native-vlan-id %s' %
+                            (interface, native_vlan))
+        for vlan in vlans_to_remove:
+            commands.append('delete interfaces %s unit 0 family '
+                            'ethernet-switching vlan members %s' %
+                            (interface, vlan))
+        return '\n'.join(commands)
+
     def disable_interface_on_device(self, interface):
         """Disable device interface
 
@@ -265,9 +289,10 @@ class JunOsEbayDriver(base_junos_driver.JunOSDriver,
 
     def is_interface_enabled(self, interface):
         command = "show configuration interfaces %s" % interface
-        if "disable" in self.device.cli(command):
-            return False
-        return True
+        return self._is_enabled_in_running_config(self.device.cli(command))
+
+    def _is_enabled_in_running_config(self, running_config):
+        return "disable" not in running_config
 
     def get_interfaces_by_name(self, interface_names):
         interfaces_dict = {}
@@ -319,6 +344,25 @@ class JunOsEbayDriver(base_junos_driver.JunOSDriver,
 
         return result
 
+    def get_mac_address_table(self):
+        """Returns the learned mac addresses of all the interfaces."""
+        data = junos_views.junos_mac_address_table(self.device)
+        data.get()
+        result = []
+        for _, entry in data.items():
+            entry = dict(entry)
+            if not entry['interface'] or not entry['vlan']:
+                continue
+            result.append(
+                {
+                    'mac_address': entry['mac_address'],
+                    'vlan': int(entry['vlan']),
+                    # xe-0/0/1.0 is learned on unit 0 of port xe-0/0/1.
+                    'interface': entry['interface'].split('.')[0]
+                }
+            )
+        return result
+
     def get_traffic_on_interface(self, interface_name):
         command = "show interfaces %s extensive" % interface_name
         data = self.device.cli(command)
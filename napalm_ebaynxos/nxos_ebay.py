@@ -20,7 +20,7 @@ from napalm_baseebay import base_connection
 from napalm_baseebay import base_ebay
 from napalm_baseebay import base_validator
 from napalm_baseebay import ebay_exceptions
-from netforce.plugins.common import netforce_constants
+from netforce.common import vlan_bitmap
 from oslo_log import log as logging
 import xmltodict
 
@@ -154,6 +154,16 @@ class NexusOSNetConfDriver(base_connection.SSHConnectionMixin,
         return self._parse_interfaces_data(interfaces_data)
 
     def get_vlan(self, number):
+        vlan_result_list = self._get_vlan_table()
+        if str(number) in vlan_result_list:
+            return vlan_result_list[str(number)]
+        return None
+
+    def get_vlan_states(self):
+        return dict((int(tag), vlan['status']) for tag, vlan in
+                    self._get_vlan_table().iteritems())
+
+    def _get_vlan_table(self):
         self._check_if_connected()
         command = "show vlan "
         response_dict = self._exec_command_xml(command)
@@ -172,11 +182,9 @@ class NexusOSNetConfDriver(base_connection.SSHConnectionMixin,
                 vlan_result_list[
                     vlan_table_rows['vlanshowbr-vlanid-utf']][
                     'status'] = vlan_table_rows['vlanshowbr-vlanstate']
-        if str(number) in vlan_result_list:
-            return vlan_result_list[str(number)]
-        return None
+        return vlan_result_list
 
-    def get_vlans_on_interface(self, interface):
+    def get_vlans_on_interfaces(self):
         self._check_if_connected()
         command = "show interface switchport "
         response_dict = self._exec_command_xml(command)
@@ -195,47 +203,36 @@ class NexusOSNetConfDriver(base_connection.SSHConnectionMixin,
         vlan_data = {}
         if 'ROW_interface' in vlans_interface_list:
             for vlans_if_list in vlans_interface_list['ROW_interface']:
-                if vlans_if_list['interface'] != interface:
-                    continue
                 vlan_list = dict()
                 vlan_list['access_vlan'] = vlans_if_list['access_vlan']
                 vlan_list['native_vlan'] = vlans_if_list['native_vlan']
                 vlan_list['trunk_vlans'] = vlans_if_list['trunk_vlans'].\
                     split(',')
                 vlan_list['switch_port_mode'] = vlans_if_list['oper_mode']
+                if vlan_list['switch_port_mode'] == 'access':
+                    vlan_list.pop('trunk_vlans')
+                else:
+                    vlan_list.pop('access_vlan')
                 vlan_data[vlans_if_list['interface']] = vlan_list
+        return vlan_data
+
+    def get_vlans_on_interface(self, interface):
+        vlan_data = self.get_vlans_on_interfaces()
         if interface in vlan_data:
-            vlan_data = vlan_data[interface]
-            if vlan_data['switch_port_mode'] == 'access':
-                vlan_data.pop('trunk_vlans')
-            else:
-                vlan_data.pop('access_vlan')
-            return vlan_data
+            return vlan_data[interface]
 
         raise ebay_exceptions.EntityDoesNotExistsException(
             'interface %s does not exists' % interface)
 
-    # Validate if the vlans exists
-    def _validate_vlan_tags(self, vlan_tags):
-        self._check_if_connected()
-        for v in vlan_tags:
-            vlan_wiri = self.get_vlan(int(v))
-            if not vlan_wiri:
-                raise ebay_exceptions.EntityDoesNotExistsException(
-                    'vlan %s does not exist''' % str(v))
-
-            if vlan_wiri['status'] == 'suspend':
-                raise ebay_exceptions.\
-                    EntityInSuspendedModeException('vlan_tag %s' % v)
-
-    def update_switch_port_vlans_on_device(self, interface, port):
+    def update_switch_port_vlans_on_device(self, interface, port,
+                                           current_config=None):
         self._check_if_connected()
         mode = port['switch_port_mode']
         commands = []
         commands.append('configure terminal')
         interface_number = interface[len("Ethernet"):]
         commands.append('interface ethernet %s' % interface_number)
-        vlans_allowed = []
+        vlans_allowed = vlan_bitmap.VlanBitmap()
         vlans = port['vlans']
         native_vlan = None
 
@@ -252,20 +249,39 @@ class NexusOSNetConfDriver(base_connection.SSHConnectionMixin,
         else:
             for vlan in vlans:
                 vlan_data = vlan['vlan']
-                vlans_allowed.append(str(vlan_data['tag']))
+                vlans_allowed.add(vlan_data['tag'])
                 if vlan_data['is_native']:
                     native_vlan = str(vlan_data['tag'])
             if not native_vlan:
                 raise ebay_exceptions.NoNativeVlan(reason=str(vlans))
-            vlan_data = self.get_vlans_on_interface(interface)
-            current_native_vlan = vlan_data.get('native_vlan', None)
-            commands.append('no switchport access vlan')
-            commands.append('switchport mode trunk')
-            if current_native_vlan != native_vlan:
-                commands.append('switchport trunk native vlan %s' %
-                                native_vlan)
-            commands.append('switchport trunk allowed vlan %s' % ','.join(
-                vlans_allowed))
+            if current_config is None:
+                current_config = self.get_vlans_on_interface(interface)
+            delta = self.get_trunk_vlan_delta(current_config, port)
+            if delta is None:
+                current_native_vlan = current_config.get('native_vlan', None)
+                commands.append('no switchport access vlan')
+                commands.append('switchport mode trunk')
+                if current_native_vlan != native_vlan:
+                    commands.append('switchport trunk native vlan %s' %
+                                    native_vlan)
+                commands.append('switchport trunk allowed vlan %s' %
+                                vlans_allowed.to_ranges())
+            else:
+                vlans_to_add, vlans_to_remove, native_change = delta
+                if vlans_to_add:
+                    commands.append('switchport trunk allowed vlan add %s' %
+                                    vlans_to_add.to_ranges())
+                if native_change:
+                    commands.append('switchport trunk native vlan %s' %
+                                    native_change)
+                if vlans_to_remove:
+                    commands.append(
+                        'switchport trunk allowed vlan remove %s' %
+                        vlans_to_remove.to_ranges())
+                if len(commands) == 2:
+                    LOG.info('Trunk vlans of %s are already as requested' %
+                             interface)
+                    return
         commands.append('copy running-config startup-config')
         cmd_string = ' ; '.join(commands)
         self._exec_command(cmd_string)
@@ -337,11 +353,7 @@ class NexusOSNetConfDriver(base_connection.SSHConnectionMixin,
     def is_interface_enabled(self, interface):
         current_running_config = self.get_interface_running_config(
             interface)
-        is_enabled = True
-        for conf in current_running_config:
-            if netforce_constants.DISABLE_PORT in conf:
-                is_enabled = False
-        return is_enabled
+        return self._is_enabled_in_running_config(current_running_config)
 
     def get_mac_addresses_on_interface(self, interface_name, vlan=None):
         self._check_if_connected()
@@ -350,6 +362,28 @@ class NexusOSNetConfDriver(base_connection.SSHConnectionMixin,
         else:
             cmd = 'show mac address-table interface %s ' % interface_name
 
+        result = []
+        for mac_row in self._get_mac_rows(cmd):
+            result.append(
+                {
+                    'mac_address': mac_row['disp_mac_addr'],
+                    'vlan': int(mac_row['disp_vlan'])
+                }
+            )
+
+        return result
+
+    def get_mac_address_table(self):
+        """Returns the learned mac addresses of all the interfaces."""
+        self._check_if_connected()
+        return [{'mac_address': mac_row['disp_mac_addr'],
+                 'vlan': int(mac_row['disp_vlan']),
+                 'interface': mac_row['disp_port']}
+                for mac_row in self._get_mac_rows('show mac address-table ')
+                if mac_row.get('disp_port') and
+                mac_row.get('disp_is_static') != 'enabled']
+
+    def _get_mac_rows(self, cmd):
         output = self._exec_command_xml(cmd)
         mac_table = (
             output['show']['mac']['address-table']
@@ -357,27 +391,16 @@ class NexusOSNetConfDriver(base_connection.SSHConnectionMixin,
             ['__XML__OPT_Cmd_show_mac_addr_tbl_address']
             ['__XML__OPT_Cmd_show_mac_addr_tbl___readonly__']
             ['__readonly__'].get('TABLE_mac_address'))
-
-        result = []
         if not mac_table:
-            return result
+            return []
 
         mac_rows = mac_table.get('ROW_mac_address')
         if not mac_rows:
-            return result
+            return []
 
         if not isinstance(mac_rows, list):
             mac_rows = [mac_rows]
-
-        for mac_row in mac_rows:
-            result.append(
-                {
-                    'mac_address': mac_row['disp_mac_addr'],
-                    'vlan': int(mac_row['disp_vlan'])
-                }
-            )
-
-        return result
+        return mac_rows
 
     def get_traffic_on_interface(self, interface_name):
         self._check_if_connected()
@@ -84,7 +84,7 @@ def start_session(req, req_id, user_id, a_strategy, auth_state):
     else:
         raddr = ("%s:%s" % ('127.0.0.1', '9696'))
 
-    this_sess = sesdb.Session(
+    session_state = dict(
         req_id=req_id, user_agent=req.environ['HTTP_USER_AGENT'],
         req_api_start=time.time(),
         http_rtn=req.environ['webob.adhoc_attrs']['response'].status,
@@ -98,8 +98,35 @@ def start_session(req, req_id, user_id, a_strategy, auth_state):
         originating_ip=req.headers.get('X_NF_ORIGINATING_IP', '')
     )
 
+    if CONF.session_audit.async_write:
+        # written later in a batch by the audit writer's green thread.
+        sesdb.get_session_audit_writer().create(
+            sesdb.make_session_row(**session_state))
+        return
+
+    admin_ctx = context.get_admin_context()
+    sesdb.SessionDbMixin().create_session(admin_ctx,
+                                          sesdb.Session(**session_state))
+
+
+def end_session(req_id, response):
+    """Records the outcome of the request on its session.
+
+    params req_id: the req_id request's context.
+    params response: the response returned to the client.
+    """
+    session_end = {'req_id': req_id,
+                   'req_api_end': time.time(),
+                   'http_rtn': response.status,
+                   'rtn_bytes': response.content_length or 0}
+
+    if CONF.session_audit.async_write:
+        # applied later in a batch, after the create of the session.
+        sesdb.get_session_audit_writer().end(**session_end)
+        return
+
     admin_ctx = context.get_admin_context()
-    sesdb.SessionDbMixin().create_session(admin_ctx, this_sess)
+    sesdb.SessionDbMixin().end_sessions(admin_ctx, [session_end])
 
 
 class NetforceKeystoneContext(wsgi.Middleware):
@@ -117,7 +144,9 @@ class NetforceKeystoneContext(wsgi.Middleware):
             LOG.debug("Neither X_USER_ID nor X_USER found in request")
             auth_state = "FAIL"
             start_session(req, req_id, user_id, auth_strategy, auth_state)
-            return webob.exc.HTTPUnauthorized()
+            response = webob.exc.HTTPUnauthorized()
+            end_session(req_id, response)
+            return response
 
         auth_state = 'PENDING'
         roles = [r.strip() for r in req.headers.get('X_ROLES', '').split(',')]
@@ -166,7 +195,9 @@ class NetforceKeystoneContext(wsgi.Middleware):
         start_session(req, req_id, user_id, auth_strategy, auth_state)
         req.environ['neutron.context'] = ctx
 
-        return self.application
+        response = req.get_response(self.application)
+        end_session(req_id, response)
+        return response
 
 
 class NoAuthMiddleware(wsgi.Middleware):
@@ -198,4 +229,6 @@ class NoAuthMiddleware(wsgi.Middleware):
             remote_address = req.headers.get('X-Forwarded-For', remote_address)
 
         start_session(req, req_id, user_id, 'noauth', 'SUCCESS')
-        return self.application
+        response = req.get_response(self.application)
+        end_session(req_id, response)
+        return response
@@ -16,6 +16,7 @@
 
 from datetime import datetime
 from datetime import timedelta
+from eventlet import pools
 import httplib2
 import netforce.api_client.exceptions as ticket_exceptions
 from oslo_config import cfg
@@ -29,6 +30,7 @@ LOG = logging.getLogger(__name__)
 GENERATION_ID_TIMEOUT = -1
 DEFAULT_CONCURRENT_CONNECTIONS = 3
 DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_HTTP_TIMEOUT = 75
 
 HTTP_GET = "GET"
 HTTP_POST = "POST"
@@ -60,11 +62,62 @@ ticket_opts = [
                help='access ticket with either http or https'),
     cfg.StrOpt('zone_name', default="US/Pacific",
                help='Zone name for ticket.'),
+    cfg.IntOpt('ticket_pool_size', default=DEFAULT_CONCURRENT_CONNECTIONS,
+               help='number of keep-alive connections to the ticket '
+                    'service shared by the requests of a process'),
+    cfg.IntOpt('ticket_connect_timeout', default=DEFAULT_CONNECT_TIMEOUT,
+               help='seconds to wait for a connection to the ticket '
+                    'service'),
+    cfg.IntOpt('ticket_http_timeout', default=DEFAULT_HTTP_TIMEOUT,
+               help='seconds to wait for the ticket service to answer on '
+                    'a connection'),
 
 ]
 
 cfg.CONF.register_opts(ticket_opts)
 
+# pools of keep-alive connections, shared by all the clients of a host.
+_pools = {}
+
+
+def _get_pool(host, size, connect_timeout, http_timeout):
+    key = (host, size, connect_timeout, http_timeout)
+    pool = _pools.get(key)
+    if pool is None:
+        # the most recently used connection is handed out first, it is
+        # the least likely to have been closed by the server.
+        pool = _pools.setdefault(key, pools.Pool(
+            max_size=size, order_as_stack=True,
+            create=lambda: httplib2.Http(timeout=http_timeout)))
+    return pool
+
+
+class _HTTPConnection(httplib2.HTTPConnectionWithTimeout):
+    """Connects within connect_timeout, then reads within timeout."""
+
+    connect_timeout = DEFAULT_CONNECT_TIMEOUT
+
+    def connect(self):
+        http_timeout = self.timeout
+        self.timeout = self.connect_timeout
+        try:
+            httplib2.HTTPConnectionWithTimeout.connect(self)
+        finally:
+            self.timeout = http_timeout
+        self.sock.settimeout(http_timeout)
+
+
+_connection_types = {}
+
+
+def _get_connection_type(connect_timeout):
+    connection_type = _connection_types.get(connect_timeout)
+    if connection_type is None:
+        connection_type = _connection_types.setdefault(
+            connect_timeout, type('HTTPConnection', (_HTTPConnection,),
+                                  {'connect_timeout': connect_timeout}))
+    return connection_type
+
 
 class ticketApiClient(object):
     """The ticket API Client.
@@ -89,17 +142,29 @@ class ticketApiClient(object):
 
     def __init__(self, ticket_service_url, ticket_api_user,
                  ticket_api_password,
-                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, http_timeout=75,
-                 retries=2, redirects=2):
+                 connect_timeout=None, http_timeout=None,
+                 retries=2, redirects=2, pool_size=None):
         LOG.debug("ticket url %s", ticket_service_url)
+        if connect_timeout is None:
+            connect_timeout = cfg.CONF.ticket_connect_timeout
+        if http_timeout is None:
+            http_timeout = cfg.CONF.ticket_http_timeout
+        if pool_size is None:
+            pool_size = cfg.CONF.ticket_pool_size
         self.ticket_host = ticket_service_url
         self.ticket_user = ticket_api_user
         self.ticket_password = ticket_api_password
         self.request_timeout = http_timeout * retries
+        self.connect_timeout = connect_timeout
         self.http_timeout = http_timeout
         self.retries = retries
         self.redirects = redirects
         self.version = None
+        # connections are kept open and reused across the requests of all
+        # the clients of the host instead of being set up for each one.
+        self._pool = _get_pool(ticket_service_url, pool_size,
+                               connect_timeout, http_timeout)
+        self._connection_type = _get_connection_type(connect_timeout)
 
     def request(self, method, url, body=None,
                 content_type="application/json",
@@ -117,12 +182,13 @@ class ticketApiClient(object):
             else:
                 body = ''
 
-            conn = httplib2.Http()
             LOG.debug("Send request to ticket, method %s, url %s, "
                       "headers %s, body %s",
                       method, uri, headers, body)
-            response, content = conn.request(uri, method, body,
-                                             headers=headers)
+            with self._pool.item() as conn:
+                response, content = conn.request(
+                    uri, method, body, headers=headers,
+                    connection_type=self._connection_type)
         except Exception as e:
             LOG.warn("Exception: %s" % e)
             raise e
@@ -0,0 +1,98 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import collections
+import threading
+import time
+
+from oslo_config import cfg
+
+CONF = cfg.CONF
+reference_cache_conf = [
+    cfg.BoolOpt('enabled', default=True,
+                help='cache lookups of device types, bridge groups, vpcs, '
+                     'bubbles and vrfs in process'),
+    cfg.IntOpt('ttl', default=300,
+               help='seconds a cached entry stays valid'),
+    cfg.IntOpt('max_size', default=1024,
+               help='maximum number of cached entries'),
+]
+CONF.register_opts(reference_cache_conf, group='reference_cache')
+
+
+class TTLCache(object):
+    """Size bounded LRU mapping whose entries expire after ttl seconds.
+
+    Keys are expected to be tuples whose first item names a region, so
+    that all the entries of a region can be dropped at once.
+    """
+
+    def __init__(self, max_size, ttl, timer=time.time):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._timer = timer
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= self._timer():
+                return default
+            # re-insert to mark the entry as most recently used.
+            self._data[key] = item
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (self._timer() + self._ttl, value)
+            while len(self._data) > self._max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, region):
+        with self._lock:
+            for key in [k for k in self._data if k[0] == region]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_reference_cache = None
+
+
+def get_reference_cache():
+    """Returns the process wide reference data cache, None if disabled."""
+    global _reference_cache
+    if not CONF.reference_cache.enabled:
+        return None
+    if _reference_cache is None:
+        _reference_cache = TTLCache(CONF.reference_cache.max_size,
+                                    CONF.reference_cache.ttl)
+    return _reference_cache
+
+
+def clear_reference_cache():
+    if _reference_cache is not None:
+        _reference_cache.clear()
@@ -16,6 +16,7 @@
 
 
 import contextlib
+import time
 import uuid
 
 from oslo_config import cfg
@@ -31,11 +32,17 @@ dist_lock_conf = [
                help='distributed lock backend url'),
     cfg.IntOpt('timeout', default=45,
                help='lock timeout time'),
+    cfg.FloatOpt('wait_warning_threshold', default=5.0,
+                 help='log a warning when acquiring locks takes longer '
+                      'than this many seconds'),
 ]
 CONF.register_opts(dist_lock_conf, group='dist_lock')
 
 LOG = logging.getLogger(__name__)
 
+# lock wait time, across all the lock_all calls of this process.
+_lock_wait_stats = {'count': 0, 'total': 0.0, 'max': 0.0}
+
 
 @contextlib.contextmanager
 def lock(name, blocking=True):
@@ -82,3 +89,61 @@ def lock(name, blocking=True):
                           {'lock': name})
     except coordination.LockAcquireFailed:
         raise n_exc.AcquireDistributedLockFailed(name=name)
+
+
+@contextlib.contextmanager
+def _acquire_in_order(names, blocking):
+    if not names:
+        yield
+        return
+    with lock(names[0], blocking=blocking):
+        with _acquire_in_order(names[1:], blocking):
+            yield
+
+
+def _record_lock_wait(names, waited):
+    _lock_wait_stats['count'] += 1
+    _lock_wait_stats['total'] += waited
+    _lock_wait_stats['max'] = max(_lock_wait_stats['max'], waited)
+    if waited > CONF.dist_lock.wait_warning_threshold:
+        LOG.warning('Waited %(waited).3f seconds for locks %(locks)s',
+                    {'waited': waited, 'locks': names})
+    else:
+        LOG.debug('Waited %(waited).3f seconds for locks %(locks)s',
+                  {'waited': waited, 'locks': names})
+
+
+def get_lock_wait_stats():
+    """Returns count, total and max seconds spent waiting in lock_all."""
+    return dict(_lock_wait_stats)
+
+
+@contextlib.contextmanager
+def lock_all(names, blocking=True):
+    """acquire several distributed locks
+
+    The locks are always taken in sorted order and released in reverse, so
+    two callers asking for overlapping sets of locks can not deadlock each
+    other. The time spent waiting is logged and added to the lock wait
+    stats.
+
+        with lockutils.lock_all(['device-<id>', 'port-<id>']):
+            ...
+    """
+    names = sorted(set(names))
+    start = time.time()
+    with _acquire_in_order(names, blocking):
+        _record_lock_wait(names, time.time() - start)
+        yield
+
+
+def stop_coordinator():
+    """Stops the coordinator of the current thread, if any."""
+    coordinator = getattr(local.strong_store, 'coordinator', None)
+    if coordinator is None:
+        return
+    del local.strong_store.coordinator
+    try:
+        coordinator.stop()
+    except coordination.ToozError as e:
+        LOG.warning('Stopping distribute lock coordinator failed, %s' % e)
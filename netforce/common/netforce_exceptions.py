@@ -129,6 +129,15 @@ class SubnetIsNotAllowed(exceptions.BadRequest):
     message = _('Subnet %(requested)s is not under %(allowed)s')
 
 
+class SubnetAlreadyReserved(exceptions.Conflict):
+    message = _('CIDR %(cidr)s is overlapping with reserved CIDR '
+                '%(reserved_cidr)s')
+
+
+class NoFreeSubnet(exceptions.Conflict):
+    message = _('No free /%(prefixlen)s block is left under %(allowed)s')
+
+
 class DistributedLockError(exceptions.NeutronException):
     message = _('Distributed lock error: %(message)s')
 
@@ -278,3 +287,21 @@ class DeviceTypeNotFound(exceptions.Conflict):
 
 class PortNotFoundByAssetId(exceptions.NotFound):
     message = _("Port with %(asset_id)s not present in Netforce.")
+
+
+class JobNotFound(exceptions.NotFound):
+    message = _("Job %(job_id)s could not be found")
+
+
+class JobQueueFull(exceptions.ServiceUnavailable):
+    message = _("%(count)s jobs are already waiting to run, retry later.")
+
+
+class RouteSnapshotNotFound(exceptions.NotFound):
+    message = _("No recent route snapshot of vrf %(vrf_name)s "
+                "in bubble %(bubble_id)s.")
+
+
+class NoFreeVlanTag(exceptions.Conflict):
+    message = _("No free vlan tag is left between %(low)s and %(high)s "
+                "on bridge group %(bridge_group)s.")
@@ -0,0 +1,109 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import eventlet
+from oslo_log import log as logging
+
+from netforce.common import lockutils
+from netforce.common import netforce_exceptions as netforce_exc
+from neutron import context as n_context
+
+LOG = logging.getLogger(__name__)
+
+
+class PeriodicTask(object):
+    """A task run every interval seconds in the background.
+
+    Subclasses name the task and its lock and implement _run. Only one
+    run of a task happens at a time across the processes, run raises
+    AcquireDistributedLockFailed if another one is running.
+    """
+
+    name = None
+    lock_name = None
+
+    def __init__(self, plugin):
+        self._plugin = plugin
+
+    def run(self, *args, **kwargs):
+        with lockutils.lock(self.lock_name, blocking=False):
+            return self._run(*args, **kwargs)
+
+    def _run(self, *args, **kwargs):
+        raise NotImplementedError()
+
+    def run_periodically(self, interval, *args, **kwargs):
+        while True:
+            eventlet.sleep(interval)
+            try:
+                self.run(*args, **kwargs)
+            except netforce_exc.AcquireDistributedLockFailed:
+                LOG.debug('%s is running in another process', self.name)
+            except Exception:
+                LOG.exception('%s failed', self.name)
+
+    def start(self, interval, *args, **kwargs):
+        """Spawns the periodic runs, None when interval is not positive."""
+        if interval <= 0:
+            return None
+        return eventlet.spawn(self.run_periodically, interval, *args,
+                              **kwargs)
+
+
+class Collector(PeriodicTask):
+    """Reads a set of items concurrently, each within a timeout.
+
+    Subclasses list the items and read one of them, returning the number
+    of records it stored. An item that can not be read is logged and
+    counted as failed, it does not stop the others.
+    """
+
+    # describes the read of an item in the logs, formatted with its id.
+    item_desc = None
+    # formatted with total, count and failed once all the items are read.
+    summary = None
+
+    def __init__(self, plugin, concurrency, item_timeout):
+        super(Collector, self).__init__(plugin)
+        self._concurrency = concurrency
+        self._item_timeout = item_timeout
+
+    def _get_item_ids(self, context):
+        raise NotImplementedError()
+
+    def _collect_item(self, context, item_id):
+        raise NotImplementedError()
+
+    def _run(self):
+        """Collects all the items, returns the number of records read."""
+        item_ids = self._get_item_ids(n_context.get_admin_context())
+        pool = eventlet.GreenPool(self._concurrency)
+        counts = [count for count in pool.imap(self._read_item, item_ids)
+                  if count is not None]
+        LOG.info(self.summary, {'total': sum(counts), 'count': len(counts),
+                                'failed': len(item_ids) - len(counts)})
+        return sum(counts)
+
+    def _read_item(self, item_id):
+        context = n_context.get_admin_context()
+        try:
+            with eventlet.Timeout(self._item_timeout):
+                return self._collect_item(context, item_id)
+        except eventlet.Timeout:
+            LOG.warning('Reading %s timed out', self.item_desc % item_id)
+        except Exception:
+            LOG.exception('Reading %s failed', self.item_desc % item_id)
+        return None
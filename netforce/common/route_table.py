@@ -0,0 +1,118 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import bisect
+import hashlib
+import struct
+import zlib
+
+import netaddr
+
+# a route is packed as its first address and its prefix length.
+_ROUTE = struct.Struct('!IB')
+
+
+class RouteTable(object):
+    """The IPv4 routes of a RIB, kept as integer arrays sorted by address.
+
+    Finding the routes that overlap a block is a binary search and at most
+    32 set lookups instead of a scan of the whole RIB. The table packs into
+    five bytes a route, zlib compressed, with a hash of its content so that
+    unchanged RIBs are stored once.
+    """
+
+    def __init__(self, routes=()):
+        self._route_set = set(routes)
+        routes = sorted(self._route_set)
+        self._firsts = [first for first, _ in routes]
+        self._prefixlens = [prefixlen for _, prefixlen in routes]
+
+    @classmethod
+    def from_cidrs(cls, cidrs):
+        """Builds the table from cidrs, IPv6 routes are left out."""
+        routes = []
+        for cidr in cidrs:
+            network = netaddr.IPNetwork(cidr)
+            if network.version == 4:
+                routes.append((network.first, network.prefixlen))
+        return cls(routes)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = zlib.decompress(data)
+        return cls(_ROUTE.unpack_from(data, offset)
+                   for offset in range(0, len(data), _ROUTE.size))
+
+    def to_bytes(self):
+        return zlib.compress(self._pack(), 9)
+
+    def _pack(self):
+        return b''.join(_ROUTE.pack(first, prefixlen) for first, prefixlen
+                        in zip(self._firsts, self._prefixlens))
+
+    @property
+    def content_hash(self):
+        return hashlib.sha256(self._pack()).hexdigest()
+
+    def overlaps(self, cidr):
+        """Returns the routes that overlap cidr, as supernet or subnet."""
+        network = netaddr.IPNetwork(cidr)
+        first, last = network.first, network.last
+        # two prefixes either nest or are apart, so a route starting before
+        # the block overlaps it only as one of its at most 32 supernets...
+        found = []
+        for prefixlen in range(network.prefixlen):
+            supernet = (first & ~((1 << (32 - prefixlen)) - 1), prefixlen)
+            if supernet[0] < first and supernet in self._route_set:
+                found.append(supernet)
+        # ...and the others are the routes starting within the block.
+        start = bisect.bisect_left(self._firsts, first)
+        end = bisect.bisect_right(self._firsts, last)
+        found.extend(zip(self._firsts[start:end],
+                         self._prefixlens[start:end]))
+        return [_format_route(*route) for route in found]
+
+    def diff(self, other):
+        """Returns (routes only in self, routes only in other)."""
+        return ([_format_route(*route) for route in
+                 sorted(self._route_set - other._route_set)],
+                [_format_route(*route) for route in
+                 sorted(other._route_set - self._route_set)])
+
+    def _routes(self):
+        return zip(self._firsts, self._prefixlens)
+
+    def __iter__(self):
+        for first, prefixlen in self._routes():
+            yield _format_route(first, prefixlen)
+
+    def __len__(self):
+        return len(self._firsts)
+
+    def __eq__(self, other):
+        if not isinstance(other, RouteTable):
+            return NotImplemented
+        return self._route_set == other._route_set
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+
+def _format_route(first, prefixlen):
+    return '%s/%d' % (netaddr.IPAddress(first, 4), prefixlen)
@@ -0,0 +1,68 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import bisect
+
+import netaddr
+
+
+class SubnetAllocator(object):
+    """Hands out the free blocks of a supernet, lowest address first.
+
+    The blocks in use are kept as address intervals sorted by their first
+    address, so the first free block of a size is found in one walk over
+    the used blocks instead of trying every block of the supernet.
+    """
+
+    def __init__(self, supernet, used=()):
+        self._supernet = netaddr.IPNetwork(supernet)
+        self._used = []
+        for cidr in used:
+            self.add(cidr)
+
+    def add(self, cidr):
+        """Marks cidr as used, blocks outside the supernet are ignored."""
+        network = netaddr.IPNetwork(cidr)
+        if network.version != self._supernet.version or \
+                network.last < self._supernet.first or \
+                network.first > self._supernet.last:
+            return
+        bisect.insort(self._used, (network.first, network.last))
+
+    def allocate(self, prefixlen):
+        """Returns the first free block of prefixlen and marks it used.
+
+        Returns None when no block of that size is free, raises ValueError
+        when prefixlen does not fit in the supernet.
+        """
+        width = 32 if self._supernet.version == 4 else 128
+        if not self._supernet.prefixlen <= prefixlen <= width:
+            raise ValueError('a /%s does not fit in %s' %
+                             (prefixlen, self._supernet))
+        size = 1 << (width - prefixlen)
+        candidate = self._supernet.first
+        for first, last in self._used:
+            if candidate + size - 1 < first:
+                break
+            if last >= candidate:
+                # next block of the size past the used one.
+                candidate = (last // size + 1) * size
+        if candidate + size - 1 > self._supernet.last:
+            return None
+        block = netaddr.IPNetwork('%s/%d' % (
+            netaddr.IPAddress(candidate, self._supernet.version), prefixlen))
+        self.add(block)
+        return str(block)
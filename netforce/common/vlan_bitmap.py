@@ -0,0 +1,160 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import six
+
+# vlan ids are 12 bits.
+MAX_VLAN_TAG = 4095
+
+
+class VlanBitmap(object):
+    """A set of vlan tags kept as the bits of one 4096 bit integer.
+
+    Union, difference and equality of two sets are single integer
+    operations however wide the trunks are, and the set is read from and
+    written to the range notation used by the devices, e.g. "2-4,10".
+    """
+
+    __hash__ = None
+
+    def __init__(self, tags=(), bits=0):
+        self._bits = bits
+        for tag in tags:
+            self.add(tag)
+
+    @classmethod
+    def from_ranges(cls, members, ignore_invalid=False):
+        """Parses vlan members such as "2-4,10" or ['2-4', '10'].
+
+        Raises ValueError on a member that is not a tag or a range of
+        tags, unless ignore_invalid is set, in which case it is skipped.
+        """
+        if isinstance(members, six.string_types):
+            members = members.split(',')
+        bitmap = cls()
+        for member in members:
+            try:
+                bitmap._add_member(member)
+            except ValueError:
+                if not ignore_invalid:
+                    raise
+        return bitmap
+
+    def _add_member(self, member):
+        bounds = str(member).strip().split('-')
+        if len(bounds) > 2:
+            raise ValueError('invalid vlan range %s' % member)
+        first, last = _to_tag(bounds[0]), _to_tag(bounds[-1])
+        if first > last:
+            raise ValueError('invalid vlan range %s' % member)
+        # set bits first..last in one go.
+        self._bits |= ((1 << (last - first + 1)) - 1) << first
+
+    def add(self, tag):
+        self._bits |= 1 << _to_tag(tag)
+
+    def discard(self, tag):
+        self._bits &= ~(1 << _to_tag(tag))
+
+    def to_ranges(self, separator=','):
+        """Returns the tags in range notation, e.g. "2-4,10"."""
+        ranges = []
+        first = last = None
+        for tag in self:
+            if last is not None and tag == last + 1:
+                last = tag
+                continue
+            if first is not None:
+                ranges.append(_format_range(first, last))
+            first = last = tag
+        if first is not None:
+            ranges.append(_format_range(first, last))
+        return separator.join(ranges)
+
+    def first_free(self, first=0, last=MAX_VLAN_TAG):
+        """Returns the lowest tag of first..last not in the set, or None."""
+        first, last = _to_tag(first), _to_tag(last)
+        span = ((1 << (last - first + 1)) - 1) << first
+        free = ~self._bits & span
+        if not free:
+            return None
+        # the lowest set bit of free.
+        return (free & -free).bit_length() - 1
+
+    def diff(self, other):
+        """Returns (tags only in self, tags only in other)."""
+        return self - other, other - self
+
+    def __contains__(self, tag):
+        try:
+            return bool(self._bits >> _to_tag(tag) & 1)
+        except ValueError:
+            return False
+
+    def __iter__(self):
+        bits = self._bits
+        tag = 0
+        while bits:
+            if bits & 1:
+                yield tag
+            bits >>= 1
+            tag += 1
+
+    def __len__(self):
+        return bin(self._bits).count('1')
+
+    def __nonzero__(self):
+        return self._bits != 0
+
+    __bool__ = __nonzero__
+
+    def __eq__(self, other):
+        if not isinstance(other, VlanBitmap):
+            return NotImplemented
+        return self._bits == other._bits
+
+    def __ne__(self, other):
+        if not isinstance(other, VlanBitmap):
+            return NotImplemented
+        return self._bits != other._bits
+
+    def __or__(self, other):
+        return VlanBitmap(bits=self._bits | other._bits)
+
+    def __and__(self, other):
+        return VlanBitmap(bits=self._bits & other._bits)
+
+    def __sub__(self, other):
+        return VlanBitmap(bits=self._bits & ~other._bits)
+
+    def __str__(self):
+        return self.to_ranges()
+
+    def __repr__(self):
+        return 'VlanBitmap(%r)' % self.to_ranges()
+
+
+def _to_tag(tag):
+    tag = int(tag)
+    if not 0 <= tag <= MAX_VLAN_TAG:
+        raise ValueError('invalid vlan tag %s' % tag)
+    return tag
+
+
+def _format_range(first, last):
+    if first == last:
+        return str(first)
+    return '%d-%d' % (first, last)
@@ -0,0 +1,54 @@
+# Copyright 2018 eBay Inc.
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+"""Add port macs table for the mac address index
+
+Revision ID: 2c7f94d1e0a5
+Revises: 8d3e51b0a7c2
+Create Date: 2018-03-29 16:20:51.904417
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2c7f94d1e0a5'
+down_revision = '8d3e51b0a7c2'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('nf_portmacs',
+                    sa.Column('mac', sa.String(17), nullable=False),
+                    sa.Column('port_id', sa.String(36), nullable=False),
+                    sa.Column('vlan', sa.Integer, nullable=False,
+                              autoincrement=False),
+                    sa.Column('device_id', sa.String(36), nullable=False),
+                    sa.Column('last_seen', sa.DateTime, nullable=False),
+                    sa.ForeignKeyConstraint(['port_id'], ['nf_ports.id'],
+                                            ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['device_id'], ['nf_devices.id'],
+                                            ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('mac', 'port_id', 'vlan')
+                    )
+    op.create_index('ix_nf_portmacs_device_id',
+                    'nf_portmacs', ['device_id'])
+
+
+def downgrade():
+    op.drop_table('nf_portmacs')
@@ -0,0 +1,55 @@
+# Copyright 2018 eBay Inc.
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+"""Add idempotency keys table
+
+Revision ID: 3e8c0b72d5a6
+Revises: 9b57d3e6a1f4
+Create Date: 2018-04-10 11:22:47.604915
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3e8c0b72d5a6'
+down_revision = '9b57d3e6a1f4'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('nf_idempotencykeys',
+                    sa.Column('idempotency_key', sa.String(255),
+                              nullable=False),
+                    sa.Column('tenant_id', sa.String(255), nullable=False),
+                    sa.Column('request_hash', sa.String(64), nullable=False),
+                    sa.Column('status', sa.String(16), nullable=False),
+                    sa.Column('response_status', sa.Integer),
+                    sa.Column('response_body', sa.Text),
+                    sa.Column('content_type', sa.String(255)),
+                    sa.Column('created_at', sa.DateTime, nullable=False),
+                    sa.Column('expires_at', sa.DateTime, nullable=False),
+                    sa.PrimaryKeyConstraint('idempotency_key', 'tenant_id')
+                    )
+    op.create_index('ix_nf_idempotencykeys_expires_at',
+                    'nf_idempotencykeys', ['expires_at'])
+
+
+def downgrade():
+    op.drop_table('nf_idempotencykeys')
@@ -0,0 +1,59 @@
+# Copyright 2018 eBay Inc.
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+"""Add jobs table for asynchronous device changes
+
+Revision ID: 4f2d8a61c3b7
+Revises: 135e94a9d248
+Create Date: 2018-03-19 14:02:37.610248
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4f2d8a61c3b7'
+down_revision = '135e94a9d248'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import datetime
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('nf_jobs',
+                    sa.Column('id', sa.String(36), nullable=False),
+                    sa.Column('tenant_id', sa.String(255)),
+                    sa.Column('resource', sa.String(64), nullable=False),
+                    sa.Column('action', sa.String(16), nullable=False),
+                    sa.Column('resource_id', sa.String(36)),
+                    sa.Column('request', sa.Text),
+                    sa.Column('result', sa.Text),
+                    sa.Column('error', sa.Text),
+                    sa.Column('status', sa.String(16), nullable=False),
+                    sa.Column('status_description', sa.String(length=255)),
+                    sa.Column('created_at', sa.DateTime,
+                              default=datetime.datetime.now),
+                    sa.Column('updated_at', sa.DateTime,
+                              onupdate=datetime.datetime.now),
+                    sa.Column('created_by', sa.String(length=255)),
+                    sa.Column('last_updated_by', sa.String(length=255)),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+
+
+def downgrade():
+    op.drop_table('nf_jobs')
@@ -0,0 +1,65 @@
+# Copyright 2018 eBay Inc.
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+"""Add route snapshot tables
+
+Revision ID: 6a41c8e2f3d9
+Revises: 2c7f94d1e0a5
+Create Date: 2018-04-02 10:08:33.571260
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '6a41c8e2f3d9'
+down_revision = '2c7f94d1e0a5'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('nf_routeblobs',
+                    sa.Column('content_hash', sa.String(64), nullable=False),
+                    sa.Column('routes', sa.LargeBinary, nullable=False),
+                    sa.Column('route_count', sa.Integer, nullable=False),
+                    sa.PrimaryKeyConstraint('content_hash')
+                    )
+    op.create_table('nf_routesnapshots',
+                    sa.Column('id', sa.String(36), nullable=False),
+                    sa.Column('bubble_id', sa.String(36), nullable=False),
+                    sa.Column('vrf_name', sa.String(255)),
+                    sa.Column('device_id', sa.String(36)),
+                    sa.Column('content_hash', sa.String(64), nullable=False),
+                    sa.Column('created_at', sa.DateTime, nullable=False),
+                    sa.Column('collected_at', sa.DateTime, nullable=False),
+                    sa.ForeignKeyConstraint(['bubble_id'], ['nf_bubbles.id'],
+                                            ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['device_id'], ['nf_devices.id'],
+                                            ondelete='SET NULL'),
+                    sa.ForeignKeyConstraint(['content_hash'],
+                                            ['nf_routeblobs.content_hash']),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index('ix_nf_routesnapshots_bubble_id_vrf_name',
+                    'nf_routesnapshots',
+                    ['bubble_id', 'vrf_name', 'collected_at'])
+
+
+def downgrade():
+    op.drop_table('nf_routesnapshots')
+    op.drop_table('nf_routeblobs')
@@ -0,0 +1,55 @@
+# Copyright 2018 eBay Inc.
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+"""Add ticket updates table
+
+Revision ID: 7f1a9c4e2b83
+Revises: 3e8c0b72d5a6
+Create Date: 2018-04-12 09:51:16.270348
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '7f1a9c4e2b83'
+down_revision = '3e8c0b72d5a6'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('nf_ticketupdates',
+                    sa.Column('id', sa.String(36), nullable=False),
+                    sa.Column('ticket_num', sa.String(255), nullable=False),
+                    sa.Column('payload', sa.Text, nullable=False),
+                    sa.Column('attempts', sa.Integer, nullable=False),
+                    sa.Column('last_error', sa.Text),
+                    sa.Column('created_at', sa.DateTime, nullable=False),
+                    sa.Column('next_attempt_at', sa.DateTime,
+                              nullable=False),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index('ix_nf_ticketupdates_ticket_num', 'nf_ticketupdates',
+                    ['ticket_num'])
+    op.create_index('ix_nf_ticketupdates_next_attempt_at',
+                    'nf_ticketupdates', ['next_attempt_at'])
+
+
+def downgrade():
+    op.drop_table('nf_ticketupdates')
@@ -0,0 +1,72 @@
+# Copyright 2018 eBay Inc.
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+"""Add device reconciliation checkpoint and drift report tables
+
+Revision ID: 8d3e51b0a7c2
+Revises: 4f2d8a61c3b7
+Create Date: 2018-03-26 11:47:05.318842
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '8d3e51b0a7c2'
+down_revision = '4f2d8a61c3b7'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import datetime
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('nf_devicereconciliations',
+                    sa.Column('device_id', sa.String(36), nullable=False),
+                    sa.Column('sweep_id', sa.String(36), nullable=False),
+                    sa.Column('checked_at', sa.DateTime, nullable=False),
+                    sa.Column('status', sa.String(16), nullable=False),
+                    sa.Column('error', sa.Text),
+                    sa.Column('drift_count', sa.Integer, nullable=False,
+                              default=0),
+                    sa.ForeignKeyConstraint(['device_id'], ['nf_devices.id'],
+                                            ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('device_id')
+                    )
+    op.create_index('ix_nf_devicereconciliations_sweep_id',
+                    'nf_devicereconciliations', ['sweep_id'])
+    op.create_table('nf_driftreports',
+                    sa.Column('id', sa.String(36), nullable=False),
+                    sa.Column('device_id', sa.String(36), nullable=False),
+                    sa.Column('sweep_id', sa.String(36), nullable=False),
+                    sa.Column('resource', sa.String(16), nullable=False),
+                    sa.Column('name', sa.String(255), nullable=False),
+                    sa.Column('expected', sa.Text),
+                    sa.Column('actual', sa.Text),
+                    sa.Column('mismatches', sa.String(255)),
+                    sa.Column('created_at', sa.DateTime,
+                              default=datetime.datetime.now),
+                    sa.ForeignKeyConstraint(['device_id'], ['nf_devices.id'],
+                                            ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index('ix_nf_driftreports_device_id',
+                    'nf_driftreports', ['device_id'])
+
+
+def downgrade():
+    op.drop_table('nf_driftreports')
+    op.drop_table('nf_devicereconciliations')
@@ -0,0 +1,56 @@
+# Copyright 2018 eBay Inc.
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+"""Add subnet reservations table
+
+Revision ID: 9b57d3e6a1f4
+Revises: 6a41c8e2f3d9
+Create Date: 2018-04-05 16:41:09.118432
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '9b57d3e6a1f4'
+down_revision = '6a41c8e2f3d9'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('nf_subnetreservations',
+                    sa.Column('id', sa.String(36), nullable=False),
+                    sa.Column('cidr', sa.String(64), nullable=False),
+                    sa.Column('bubble_id', sa.String(36)),
+                    sa.Column('vpc_id', sa.String(36)),
+                    sa.Column('created_at', sa.DateTime, nullable=False),
+                    sa.Column('expires_at', sa.DateTime, nullable=False),
+                    sa.ForeignKeyConstraint(['bubble_id'], ['nf_bubbles.id'],
+                                            ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['vpc_id'], ['nf_vpcs.id'],
+                                            ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('id'),
+                    sa.UniqueConstraint('cidr')
+                    )
+    op.create_index('ix_nf_subnetreservations_expires_at',
+                    'nf_subnetreservations', ['expires_at'])
+
+
+def downgrade():
+    op.drop_table('nf_subnetreservations')
@@ -18,6 +18,8 @@ from alembic import script as alembic_script
 from alembic import util as alembic_util
 import os
 from oslo_config import cfg
+from oslo_utils import timeutils
+import sqlalchemy as sa
 
 HEAD_FILENAME = 'HEAD'
 
@@ -95,6 +97,57 @@ def do_revision(config, cmd):
     update_head_file(config)
 
 
+def do_purge_sessions(config, cmd):
+    # imported here so that the migration commands do not need the neutron
+    # db models loaded.
+    from netforce.db import session_db
+
+    if not CONF.database.connection:
+        raise SystemExit(_('You must provide a database connection'))
+    engine = sa.create_engine(CONF.database.connection)
+    try:
+        purged, archive_purged = session_db.purge_sessions(
+            engine, CONF.command.retention_days,
+            batch_size=CONF.command.batch_size,
+            archive=not CONF.command.no_archive,
+            archive_retention_days=CONF.command.archive_retention_days)
+    finally:
+        engine.dispose()
+    alembic_util.msg(_('Purged %(purged)d sessions and %(archived)d '
+                       'archived sessions') % {'purged': purged,
+                                               'archived': archive_purged})
+
+
+def _parse_time(value):
+    # sessions are stored in naive UTC.
+    return timeutils.normalize_time(timeutils.parse_isotime(value))
+
+
+def do_list_sessions(config, cmd):
+    from netforce.db import session_db
+    from sqlalchemy import orm
+
+    if not CONF.database.connection:
+        raise SystemExit(_('You must provide a database connection'))
+    engine = sa.create_engine(CONF.database.connection)
+    try:
+        sessions = session_db.get_sessions_in_range(
+            orm.sessionmaker(bind=engine)(),
+            start=CONF.command.start and _parse_time(CONF.command.start),
+            end=CONF.command.end and _parse_time(CONF.command.end),
+            username=CONF.command.username, limit=CONF.command.limit,
+            marker=CONF.command.marker)
+        for session in sessions:
+            alembic_util.msg('%s %s %s %s %s %s' % (
+                session.created_at.isoformat(), session.id, session.req_id,
+                session.username or '-', session.http_rtn or '-',
+                session.url))
+    finally:
+        engine.dispose()
+    if sessions:
+        alembic_util.msg(_('Next page: --marker %s') % sessions[-1].id)
+
+
 def validate_head_file(config):
     script = alembic_script.ScriptDirectory.from_config(config)
     if len(script.get_heads()) > 1:
@@ -149,6 +202,33 @@ def add_command_parsers(subparsers):
     parser.add_argument('--head')
     parser.set_defaults(func=do_revision)
 
+    parser = subparsers.add_parser('purge_sessions')
+    parser.add_argument('--retention-days', type=int, default=90,
+                        help='keep sessions created in the last N days')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='number of rows moved per transaction')
+    parser.add_argument('--no-archive', action='store_true',
+                        help='delete old sessions instead of archiving them')
+    parser.add_argument('--archive-retention-days', type=int, default=0,
+                        help='delete archived sessions older than N days, '
+                             '0 keeps them forever')
+    parser.set_defaults(func=do_purge_sessions)
+
+    parser = subparsers.add_parser('list_sessions')
+    parser.add_argument('--start',
+                        help='list sessions created at or after this ISO '
+                             '8601 time, in UTC when no offset is given')
+    parser.add_argument('--end',
+                        help='list sessions created before this ISO 8601 '
+                             'time')
+    parser.add_argument('--username', help='list the sessions of this user')
+    parser.add_argument('--limit', type=int,
+                        help='number of sessions listed, at most '
+                             'max_query_sessions')
+    parser.add_argument('--marker',
+                        help='id of the last session of the previous page')
+    parser.set_defaults(func=do_list_sessions)
+
 
 command_opt = cfg.SubCommandOpt('command',
                                 title='Command',
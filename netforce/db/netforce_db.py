@@ -15,23 +15,143 @@
 #    limitations under the License.
 
 
+import datetime
+
+from netforce.common import cache
 from netforce.common import netforce_exceptions
 from netforce.db import netforce_model
 from netforce.plugins.common import netforce_constants
 from netforce.services.netforce_service_plugin import plugin as netforce_plugin
 from neutron.common import exceptions as n_exc
 from neutron.db import common_db_mixin
+from neutron.openstack.common import uuidutils
 from neutron.plugins.common import constants
 
+from oslo_config import cfg
 from oslo_db import exception as db_exc
+import sqlalchemy as sa
+from sqlalchemy import orm
 from sqlalchemy.orm import exc as orm_exc
 
 _author__ = 'kugandhi'
 
+db_opts = [
+    cfg.IntOpt('stream_batch_size',
+               default=500,
+               help='Number of rows fetched from the database per round '
+                    'trip when a list is streamed to the client.')
+]
+cfg.CONF.register_opts(db_opts)
+
 
 class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
                       common_db_mixin.CommonDbMixin):
 
+    def _get_collection_iter(self, context, model, dict_func, filters=None,
+                             fields=None, options=()):
+        """Yields the view dict of each row instead of building a list.
+
+        Rows are read in pages of stream_batch_size ordered by id, so memory
+        use does not grow with the size of the collection. Each page is a
+        query of its own, so the load options given for the relationships
+        the view needs are applied once per page instead of once per row.
+        """
+        batch_size = cfg.CONF.stream_batch_size
+        query = self._get_collection_query(context, model, filters=filters)
+        query = query.options(*options).order_by(model.id)
+        last_id = None
+        while True:
+            page = query
+            if last_id is not None:
+                page = page.filter(model.id > last_id)
+            items = page.limit(batch_size).all()
+            for item in items:
+                yield dict_func(item, fields)
+            if len(items) < batch_size:
+                return
+            last_id = items[-1].id
+
+    def _cached_lookup(self, context, model, key, loader):
+        """Read-through lookup of slowly changing reference data.
+
+        The cache holds the column values of the rows and not the ORM
+        objects, which belong to the session that loaded them. On a hit the
+        rows are attached to the caller's session without a query, so the
+        relationships still lazy load as usual.
+        """
+        reference_cache = cache.get_reference_cache()
+        if reference_cache is None:
+            return loader()
+        # non admin queries are scoped to the tenant, keep them apart.
+        key = key + (None if context.is_admin else context.tenant_id,)
+        values = reference_cache.get(key)
+        if isinstance(values, list):
+            return [self._attach_cached_row(context, model, v)
+                    for v in values]
+        if values is not None:
+            return self._attach_cached_row(context, model, values)
+
+        result = loader()
+        if isinstance(result, list):
+            if result:
+                reference_cache.set(key, [self._get_row_values(r)
+                                          for r in result])
+        elif result is not None:
+            reference_cache.set(key, self._get_row_values(result))
+        return result
+
+    def _get_row_values(self, db_obj):
+        return dict((attr.key, getattr(db_obj, attr.key))
+                    for attr in orm.object_mapper(db_obj).column_attrs)
+
+    def _attach_cached_row(self, context, model, values):
+        db_obj = model(**values)
+        orm.make_transient_to_detached(db_obj)
+        return context.session.merge(db_obj, load=False)
+
+    def _invalidate_reference_cache(self, region):
+        reference_cache = cache.get_reference_cache()
+        if reference_cache is not None:
+            reference_cache.invalidate(region)
+
+    def _get_scalar_fields(self, resource, fields):
+        """Returns the fields to select, or None if the ORM object is needed.
+
+        A projection can be served from the columns alone only when every
+        requested field is listed in SCALAR_FIELDS for the resource.
+        """
+        if not fields:
+            return None
+        scalar_fields = self.SCALAR_FIELDS.get(resource, ())
+        names = []
+        for field in fields:
+            if field not in scalar_fields:
+                return None
+            if field not in names:
+                names.append(field)
+        return names
+
+    def _get_projected_collection(self, context, model, resource, dict_func,
+                                  filters=None, fields=None):
+        names = self._get_scalar_fields(resource, fields)
+        if not names:
+            return self._get_collection(context, model, dict_func,
+                                        filters=filters, fields=fields)
+        query = self._get_collection_query(context, model, filters=filters)
+        query = query.with_entities(*[getattr(model, name)
+                                      for name in names])
+        return [dict(zip(names, row)) for row in query]
+
+    def _get_projected_by_id(self, context, model, resource, id, dict_func,
+                             fields=None):
+        names = self._get_scalar_fields(resource, fields)
+        if not names:
+            return dict_func(self._get_by_id(context, model, id), fields)
+        query = self._model_query(context, model).with_entities(
+            *[getattr(model, name) for name in names])
+        row = query.filter(model.id == id).one()
+        return dict(zip(names, row))
+
     def update_vlanportassociation(self, context, vlanportassociation_id,
                                    vlanportassociation):
         with context.session.begin(subtransactions=True):
@@ -55,17 +175,44 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
                     resource='Device', name=device['name'])
             return device_db
 
+    def create_devices(self, context, devices):
+        """Adds many devices in one transaction, all or none of them."""
+        with context.session.begin(subtransactions=True):
+            devices_db = []
+            for device in devices:
+                device_db = netforce_model.Device(**device)
+                device_db.status = constants.ACTIVE
+                device_db.status_description = \
+                    netforce_constants.ACTIVE_STATUS_DESCRIPTION
+                devices_db.append(device_db)
+            try:
+                context.session.add_all(devices_db)
+                context.session.flush()
+            except db_exc.DBDuplicateEntry as e:
+                raise netforce_exceptions.ResourceAlreadyExists(
+                    resource='Device', name=','.join(e.columns))
+            return devices_db
+
     def get_device_db(self, context, device_id):
         return self._get_by_id(context, netforce_model.Device, device_id)
 
     def get_device(self, context, device_id, fields=None):
-        return self.make_device_dict(self.get_device_db(context, device_id),
-                                     fields)
+        return self._get_projected_by_id(context, netforce_model.Device,
+                                         'device', device_id,
+                                         self.make_device_dict, fields)
 
     def get_devices(self, context, filters=None, fields=None):
-        return self._get_collection(context, netforce_model.Device,
-                                    self.make_device_dict,
-                                    filters=filters, fields=fields)
+        return self._get_projected_collection(context,
+                                              netforce_model.Device,
+                                              'device',
+                                              self.make_device_dict,
+                                              filters=filters,
+                                              fields=fields)
+
+    def iter_devices(self, context, filters=None, fields=None):
+        return self._get_collection_iter(context, netforce_model.Device,
+                                         self.make_device_dict,
+                                         filters=filters, fields=fields)
 
     def get_devices_by_type_and_bubble_id(self, context, device_type_id,
                                           bubble_id):
@@ -102,6 +249,7 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
             except db_exc.DBDuplicateEntry:
                 netforce_exceptions.ResourceAlreadyExists(
                     resource='DeviceType', name=device_type['name'])
+            self._invalidate_reference_cache('devicetype')
             return device_type_db
 
     def get_devicetype_db(self, context, device_type_id):
@@ -115,24 +263,43 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
                                          fields)
 
     def get_devicetypes(self, context, filters=None, fields=None):
-        return self._get_collection(context, netforce_model.DeviceType,
-                                    self.make_devicetype_dict,
-                                    filters=filters, fields=fields)
+        return self._get_projected_collection(context,
+                                              netforce_model.DeviceType,
+                                              'devicetype',
+                                              self.make_devicetype_dict,
+                                              filters=filters,
+                                              fields=fields)
 
     def get_devicetype_by_type(self, context, type):
+        def _get_devicetype():
+            query = self._model_query(context, netforce_model.DeviceType)
+            try:
+                return query.filter(
+                    netforce_model.DeviceType.type == type).one()
+            except orm_exc.NoResultFound:
+                raise netforce_exceptions.DeviceTypeNotFound(type=type)
+
+        return self._cached_lookup(context, netforce_model.DeviceType,
+                                   ('devicetype', 'type', type),
+                                   _get_devicetype)
+
+    def get_devicetype_ids_by_type(self, context, types):
+        """Returns {type: device type id}, raises on an unknown type."""
         query = self._model_query(context, netforce_model.DeviceType)
-        try:
-            device_type = query.filter(
-                netforce_model.DeviceType.type == type).one()
-        except orm_exc.NoResultFound:
-            raise netforce_exceptions.DeviceTypeNotFound(type=type)
-        return device_type
+        type_ids = dict(query.with_entities(
+            netforce_model.DeviceType.type, netforce_model.DeviceType.id
+        ).filter(netforce_model.DeviceType.type.in_(types)))
+        for type in types:
+            if type not in type_ids:
+                raise netforce_exceptions.DeviceTypeNotFound(type=type)
+        return type_ids
 
     def update_devicetype(self, context, device_type_id, device_type_dict):
         with context.session.begin(subtransactions=True):
             device_type_db = self.get_devicetype_db(context, device_type_id)
             if device_type_db:
                 device_type_db.update(device_type_dict)
+            self._invalidate_reference_cache('devicetype')
             return device_type_db
 
     def delete_devicetype(self, context, device_type_id):
@@ -143,6 +310,7 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
             if device_db:
                 context.session.delete(device_db)
                 context.session.flush()
+            self._invalidate_reference_cache('devicetype')
 
     def create_port(self, context, port):
         with context.session.begin(subtransactions=True):
@@ -165,8 +333,27 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
         return port
 
     def get_port(self, context, port_id, fields=None):
-        port_db = self.get_port_db(context, port_id)
-        return self.make_port_dict(port_db, fields)
+        try:
+            return self._get_projected_by_id(context, netforce_model.Port,
+                                             'port', port_id,
+                                             self.make_port_dict, fields)
+        except orm_exc.NoResultFound:
+            raise n_exc.PortNotFound(port_id=port_id)
+
+    def get_port_device_id(self, context, port_id):
+        # a column query, so that no port object is loaded into the session.
+        query = self._model_query(context, netforce_model.Port).with_entities(
+            netforce_model.Port.device_id)
+        row = query.filter(netforce_model.Port.id == port_id).first()
+        if not row:
+            raise n_exc.PortNotFound(port_id=port_id)
+        return row[0]
+
+    def get_port_device_ids(self, context, port_ids):
+        """Returns {port_id: device_id} for those of the ports that exist."""
+        query = self._model_query(context, netforce_model.Port).with_entities(
+            netforce_model.Port.id, netforce_model.Port.device_id)
+        return dict(query.filter(netforce_model.Port.id.in_(port_ids)))
 
     def get_port_by_asset_id(self, context, asset_id):
         try:
@@ -179,9 +366,83 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
         return port_db
 
     def get_ports(self, context, filters=None, fields=None):
-        return self._get_collection(context, netforce_model.Port,
-                                    self.make_port_dict,
-                                    filters=filters, fields=fields)
+        return self._get_projected_collection(context,
+                                              netforce_model.Port,
+                                              'port',
+                                              self.make_port_dict,
+                                              filters=filters,
+                                              fields=fields)
+
+    def iter_ports(self, context, filters=None, fields=None):
+        options = ()
+        if not fields or 'vlans' in fields:
+            # the associations of a page and their vlans in two queries.
+            options = (orm.subqueryload('vlans').joinedload('vlan')
+                       .lazyload('ports'),)
+        return self._get_collection_iter(context, netforce_model.Port,
+                                         self.make_port_dict,
+                                         filters=filters, fields=fields,
+                                         options=options)
+
+    def upsert_device_ports(self, context, device_db, admin_states):
+        """Records the ports found on a device in bulk.
+
+        The ports of the device are diffed with the found ones by name.
+        Ports new to the device are added with one multi-row INSERT, and
+        ports whose admin status changed are set with one UPDATE. Running
+        it again with the same ports writes nothing.
+
+        :param admin_states: dict of port name to admin status.
+        :returns: (number of ports added, number of ports updated)
+        """
+        model = netforce_model.Port
+        now = datetime.datetime.now()
+        with context.session.begin(subtransactions=True):
+            existing = dict(
+                (name, (admin_status, status)) for name, admin_status, status
+                in context.session.query(model.name, model.admin_status,
+                                         model.status).filter(
+                    model.device_id == device_db.id))
+            rows = [{'id': uuidutils.generate_uuid(),
+                     'name': name,
+                     'description': 'port for %s' % name,
+                     'admin_status': admin_states[name],
+                     'switch_port_mode': netforce_constants.ACCESS_MODE,
+                     'device_id': device_db.id,
+                     'tenant_id': device_db.tenant_id,
+                     'status': constants.ACTIVE,
+                     'status_description':
+                         netforce_constants.ACTIVE_STATUS_DESCRIPTION,
+                     'created_at': now}
+                    for name in sorted(set(admin_states) - set(existing))]
+            changed = [name for name in set(admin_states) & set(existing)
+                       if existing[name] != (admin_states[name],
+                                             constants.ACTIVE)]
+            if rows:
+                context.session.execute(model.__table__.insert().values(rows))
+            updated = 0
+            if changed:
+                active = [name for name in changed
+                          if admin_states[name] == constants.ACTIVE]
+                updated = context.session.query(model).filter(
+                    model.device_id == device_db.id,
+                    model.name.in_(changed)).update({
+                        'admin_status': sa.case(
+                            [(model.name.in_(active), constants.ACTIVE)],
+                            else_=netforce_constants.SUSPENDED)
+                        if active else netforce_constants.SUSPENDED,
+                        'status': constants.ACTIVE,
+                        'status_description':
+                            netforce_constants.ACTIVE_STATUS_DESCRIPTION,
+                        'updated_at': now}, synchronize_session=False)
+            if rows or changed:
+                # the rows were written behind the ORM's back, make the
+                # ports of the device that are already loaded reload.
+                if 'ports' in device_db.__dict__:
+                    for port_db in device_db.ports:
+                        context.session.expire(port_db)
+                context.session.expire(device_db, ['ports'])
+        return len(rows), updated
 
     def update_port(self, context, port_id, port_dict):
         with context.session.begin(subtransactions=True):
@@ -271,7 +532,7 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
     def get_vlan(self, context, vlan_id, fields=None):
         return self.make_vlan_dict(self.get_vlan_db(context, vlan_id), fields)
 
-    def get_vlans(self, context, filters=None, fields=None):
+    def _convert_vlan_filters(self, context, filters):
         # TODO(aginwala): NTWK-3384 Handle all error cases if bg
         # or vpc not found in db.
         if filters:
@@ -285,9 +546,22 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
                 vpc_db = self.get_vpc_by_name(context, vpc[0])
                 if vpc_db:
                     filters['vpc_id'] = [vpc_db['id']]
-        return self._get_collection(context, netforce_model.Vlan,
-                                    self.make_vlan_dict,
-                                    filters=filters, fields=fields)
+        return filters
+
+    def get_vlans(self, context, filters=None, fields=None):
+        filters = self._convert_vlan_filters(context, filters)
+        return self._get_projected_collection(context,
+                                              netforce_model.Vlan,
+                                              'vlan',
+                                              self.make_vlan_dict,
+                                              filters=filters,
+                                              fields=fields)
+
+    def iter_vlans(self, context, filters=None, fields=None):
+        filters = self._convert_vlan_filters(context, filters)
+        return self._get_collection_iter(context, netforce_model.Vlan,
+                                         self.make_vlan_dict,
+                                         filters=filters, fields=fields)
 
     def get_vlan_by_tag_and_port_id(self, context, vlan_tag, port_id):
         port_db = self.get_port_db(context, port_id)
@@ -325,6 +599,44 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
                                           )
             return vlan_db
 
+    def replace_vlanportassociations(self, context, port_id, bindings):
+        """Replaces all the vlan associations of a port in bulk.
+
+        One DELETE by port and one multi-row INSERT, whatever the number of
+        vlans, instead of a flush per association.
+
+        :param bindings: list of (vlan_id, is_native) tuples.
+        :returns: the number of associations deleted.
+        """
+        model = netforce_model.VlanPortAssociation
+        now = datetime.datetime.now()
+        rows = []
+        seen = set()
+        for vlan_id, is_native in bindings:
+            # the same vlan twice would violate uniq_port_id_and_vlan_id.
+            if vlan_id in seen:
+                continue
+            seen.add(vlan_id)
+            rows.append({'id': uuidutils.generate_uuid(),
+                         'port_id': port_id,
+                         'vlan_id': vlan_id,
+                         'is_native_vlan': is_native,
+                         'tenant_id': context.tenant_id,
+                         'status': constants.ACTIVE,
+                         'created_at': now})
+        with context.session.begin(subtransactions=True):
+            deleted = self.delete_vlanportassociation_by_port_id(context,
+                                                                 port_id)
+            if rows:
+                context.session.execute(model.__table__.insert().values(rows))
+            # the rows were written behind the ORM's back, make a port
+            # already loaded in the session reload its vlans.
+            port_db = context.session.identity_map.get(
+                orm.util.identity_key(netforce_model.Port, port_id))
+            if port_db is not None:
+                context.session.expire(port_db, ['vlans'])
+        return deleted
+
     def _get_vlanportassociation_db_by_id(self, context,
                                          vlanportassociation_id):
         return self._get_by_id(context, netforce_model.VlanPortAssociation,
@@ -349,7 +661,19 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
 
     def get_vlanportassociation(self, context, id, fields=None):
         db = self._get_vlanportassociation_db_by_id(context, id)
-        self.make_vlanportassociation_dict(db, fields)
+        return self.make_vlanportassociation_dict(db, fields)
+
+    def get_vlanportassociations(self, context, filters=None, fields=None):
+        return self._get_collection(context,
+                                    netforce_model.VlanPortAssociation,
+                                    self.make_vlanportassociation_dict,
+                                    filters=filters, fields=fields)
+
+    def iter_vlanportassociations(self, context, filters=None, fields=None):
+        return self._get_collection_iter(context,
+                                         netforce_model.VlanPortAssociation,
+                                         self.make_vlanportassociation_dict,
+                                         filters=filters, fields=fields)
 
     def _get_vlanportassociations_by_vlan_id(self, context, vlan_id):
         query = self._model_query(context, netforce_model.VlanPortAssociation)
@@ -366,6 +690,8 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
                         vpc_name=vpc_db.name)
                 context.session.delete(vpc_db)
                 context.session.flush()
+            self._invalidate_reference_cache('vpc')
+            self._invalidate_reference_cache('vrf')
 
     def create_vpc(self, context, vpc):
         with context.session.begin(subtransactions=True):
@@ -378,6 +704,7 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
             except db_exc.DBDuplicateEntry:
                 netforce_exceptions.ResourceAlreadyExists(
                     resource='Vpc', name=vpc_db['name'])
+            self._invalidate_reference_cache('vpc')
             return vpc_db
 
     def get_vpc_db(self, context, vpc_id):
@@ -389,13 +716,20 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
         return self.make_vpc_dict(vpc_db, fields)
 
     def get_vpc_by_name(self, context, vpc_name):
-        query = self._model_query(context, netforce_model.VPC)
-        return query.filter(netforce_model.VPC.name == vpc_name).first()
+        def _get_vpc():
+            query = self._model_query(context, netforce_model.VPC)
+            return query.filter(netforce_model.VPC.name == vpc_name).first()
+
+        return self._cached_lookup(context, netforce_model.VPC,
+                                   ('vpc', 'name', vpc_name), _get_vpc)
 
     def get_vpcs(self, context, filters=None, fields=None):
-        return self._get_collection(context, netforce_model.VPC,
-                                    self.make_vpc_dict,
-                                    filters=filters, fields=fields)
+        return self._get_projected_collection(context,
+                                              netforce_model.VPC,
+                                              'vpc',
+                                              self.make_vpc_dict,
+                                              filters=filters,
+                                              fields=fields)
 
     def update_vpc(self, context, vpc_id, vpc_dict):
         with context.session.begin(subtransactions=True):
@@ -403,6 +737,7 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
 
             if vpc_db:
                 vpc_db.update(vpc_dict)
+            self._invalidate_reference_cache('vpc')
             return vpc_db
 
     def get_bridgegroup_db(self, context, bridgegroup_id):
@@ -425,6 +760,7 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
 
                 context.session.delete(bg_db)
                 context.session.flush()
+            self._invalidate_reference_cache('bridgegroup')
 
     def delete_vlanportassociation_by_port_id(self, context, port_id):
         query = self._model_query(context, netforce_model.VlanPortAssociation)
@@ -449,6 +785,7 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
                 netforce_exceptions.\
                     ResourceAlreadyExists(resource='BridgeGroup',
                                           name=bridgegroup_db['name'])
+            self._invalidate_reference_cache('bridgegroup')
             return bridgegroup_db
 
     def get_bridgegroup(self, context, bridgegroup_id, fields=None):
@@ -456,14 +793,22 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
         return self.make_bridgegroup_dict(bg_db, fields)
 
     def get_bridgegroup_by_name(self, context, bridgegroup_name):
-        query = self._model_query(context, netforce_model.BridgeGroup)
-        return query.filter(netforce_model.BridgeGroup.name ==
-                            bridgegroup_name).one()
+        def _get_bridgegroup():
+            query = self._model_query(context, netforce_model.BridgeGroup)
+            return query.filter(netforce_model.BridgeGroup.name ==
+                                bridgegroup_name).one()
+
+        return self._cached_lookup(context, netforce_model.BridgeGroup,
+                                   ('bridgegroup', 'name', bridgegroup_name),
+                                   _get_bridgegroup)
 
     def get_bridgegroups(self, context, filters=None, fields=None):
-        return self._get_collection(context, netforce_model.BridgeGroup,
-                                    self.make_bridgegroup_dict,
-                                    filters=filters, fields=fields)
+        return self._get_projected_collection(context,
+                                              netforce_model.BridgeGroup,
+                                              'bridgegroup',
+                                              self.make_bridgegroup_dict,
+                                              filters=filters,
+                                              fields=fields)
 
     def update_bridgegroup(self, context, bridgegroup_id, bridgegroup):
         with context.session.begin(subtransactions=True):
@@ -471,6 +816,7 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
 
             if bridgegroup_db:
                 bridgegroup_db.update(bridgegroup)
+            self._invalidate_reference_cache('bridgegroup')
             return bridgegroup_db
 
     def get_subnet_db(self, context, subnet_id):
@@ -497,9 +843,17 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
         return self.make_subnet_dict(subnet_db, fields)
 
     def get_subnets(self, context, filters=None, fields=None):
-        return self._get_collection(context, netforce_model.Subnet,
-                                    self.make_subnet_dict,
-                                    filters=filters, fields=fields)
+        return self._get_projected_collection(context,
+                                              netforce_model.Subnet,
+                                              'subnet',
+                                              self.make_subnet_dict,
+                                              filters=filters,
+                                              fields=fields)
+
+    def iter_subnets(self, context, filters=None, fields=None):
+        return self._get_collection_iter(context, netforce_model.Subnet,
+                                         self.make_subnet_dict,
+                                         filters=filters, fields=fields)
 
     def get_subnet_by_vlan_id(self, context, vlan_id):
         query = self._model_query(context, netforce_model.Subnet)
@@ -510,6 +864,58 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
         query = self._model_query(context, netforce_model.Subnet)
         return query.filter(netforce_model.Subnet.cidr == cidr).first()
 
+    def get_subnet_cidrs(self, context):
+        query = self._model_query(context, netforce_model.Subnet)
+        return [cidr for cidr, in query.with_entities(
+            netforce_model.Subnet.cidr)]
+
+    def get_reserved_subnet_cidrs(self, context, now):
+        """Returns the cidrs of the reservations not expired at now."""
+        model = netforce_model.SubnetReservation
+        query = context.session.query(model.cidr).filter(
+            model.expires_at > now)
+        return [cidr for cidr, in query]
+
+    def get_subnet_reservations(self, context, now):
+        """Returns (id, cidr) of the reservations not expired at now."""
+        model = netforce_model.SubnetReservation
+        return context.session.query(model.id, model.cidr).filter(
+            model.expires_at > now).all()
+
+    def extend_subnet_reservation(self, context, reservation_id, cidr, now,
+                                  expires_at):
+        """Extends a reservation of cidr not expired at now, 0 if none."""
+        model = netforce_model.SubnetReservation
+        with context.session.begin(subtransactions=True):
+            return context.session.query(model).filter(
+                model.id == reservation_id, model.cidr == cidr,
+                model.expires_at > now).update(
+                {'expires_at': expires_at}, synchronize_session=False)
+
+    def reserve_subnet(self, context, cidr, bubble_id, vpc_id, now,
+                       expires_at):
+        """Reserves a block, dropping the reservations expired at now."""
+        model = netforce_model.SubnetReservation
+        with context.session.begin(subtransactions=True):
+            context.session.query(model).filter(
+                model.expires_at <= now).delete(synchronize_session=False)
+            reservation_db = model(id=uuidutils.generate_uuid(), cidr=cidr,
+                                   bubble_id=bubble_id, vpc_id=vpc_id,
+                                   created_at=now, expires_at=expires_at)
+            try:
+                context.session.add(reservation_db)
+                context.session.flush()
+            except db_exc.DBDuplicateEntry:
+                raise netforce_exceptions.ResourceAlreadyExists(
+                    resource='SubnetReservation', name=cidr)
+            return reservation_db
+
+    def delete_subnet_reservation(self, context, cidr):
+        model = netforce_model.SubnetReservation
+        with context.session.begin(subtransactions=True):
+            return context.session.query(model).filter_by(
+                cidr=cidr).delete(synchronize_session=False)
+
     def update_subnet(self, context, subnet_id, subnet):
         with context.session.begin(subtransactions=True):
             subnet_db = self.get_subnet_db(context, subnet_id)
@@ -533,24 +939,44 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
             except db_exc.DBDuplicateEntry:
                 netforce_exceptions.ResourceAlreadyExists(
                     resource='Bubble', name=bubble_db['name'])
+            self._invalidate_reference_cache('bubble')
             return bubble_db
 
     def get_bubbles(self, context, filters=None, fields=None):
-        return self._get_collection(context, netforce_model.Bubble,
-                                    self.make_bubble_dict,
-                                    filters=filters, fields=fields)
+        return self._get_projected_collection(context,
+                                              netforce_model.Bubble,
+                                              'bubble',
+                                              self.make_bubble_dict,
+                                              filters=filters,
+                                              fields=fields)
 
     def get_bubble(self, context, bubble_id, fields=None):
         return self._get_by_id(context, netforce_model.Bubble, bubble_id)
 
     def get_bubble_by_name(self, context, bubble_name):
+        def _get_bubble():
+            query = self._model_query(context, netforce_model.Bubble)
+            return query.filter(
+                netforce_model.Bubble.name == bubble_name).one()
+
+        return self._cached_lookup(context, netforce_model.Bubble,
+                                   ('bubble', 'name', bubble_name),
+                                   _get_bubble)
+
+    def check_bubbles_exist(self, context, bubble_ids):
         query = self._model_query(context, netforce_model.Bubble)
-        return query.filter(netforce_model.Bubble.name == bubble_name).one()
+        found = set(bubble_id for bubble_id, in query.with_entities(
+            netforce_model.Bubble.id).filter(
+            netforce_model.Bubble.id.in_(bubble_ids)))
+        for bubble_id in bubble_ids:
+            if bubble_id not in found:
+                raise netforce_exceptions.BubbleNotFound(bubble_id=bubble_id)
 
     def update_bubble(self, context, bubble_id, bubble_dict):
         with context.session.begin(subtransactions=True):
             bubble_db = self.get_bubble(context, bubble_id)
             bubble_db.update(bubble_dict)
+            self._invalidate_reference_cache('bubble')
             return bubble_db
 
     def delete_bubble(self, context, bubble_id):
@@ -564,6 +990,8 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
                     bubble_name=bubble_db.name)
             context.session.delete(bubble_db)
             context.session.flush()
+            self._invalidate_reference_cache('bubble')
+            self._invalidate_reference_cache('vrf')
 
     def create_vrf(self, context, vrf):
         with context.session.begin(subtransactions=True):
@@ -575,30 +1003,44 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
             except db_exc.DBDuplicateEntry:
                 netforce_exceptions.ResourceAlreadyExists(
                     resource='Vrf', name=vrf_db['name'])
+            self._invalidate_reference_cache('vrf')
             return vrf_db
 
     def get_vrfs(self, context, filters=None, fields=None):
-        return self._get_collection(context, netforce_model.Vrf,
-                                    self.make_vrf_dict,
-                                    filters=filters, fields=fields)
+        return self._get_projected_collection(context,
+                                              netforce_model.Vrf,
+                                              'vrf',
+                                              self.make_vrf_dict,
+                                              filters=filters,
+                                              fields=fields)
 
     def get_vrf(self, context, vrf_id, fields=None):
         return self._get_by_id(context, netforce_model.Vrf, vrf_id)
 
     def get_vrf_by_name(self, context, vrf_name):
-        query = self._model_query(context, netforce_model.Vrf)
-        return query.filter(netforce_model.Vrf.name == vrf_name).one()
+        def _get_vrf():
+            query = self._model_query(context, netforce_model.Vrf)
+            return query.filter(netforce_model.Vrf.name == vrf_name).one()
+
+        return self._cached_lookup(context, netforce_model.Vrf,
+                                   ('vrf', 'name', vrf_name), _get_vrf)
 
     def get_vrf_by_bubble_id_and_vpc_id(self, context, bubble_id, vpc_id):
-        query = self._model_query(context, netforce_model.Vrf)
-        return query.filter(
-            netforce_model.Vrf.bubble_id == bubble_id).filter(
-            netforce_model.Vrf.vpc_id == vpc_id).all()
+        def _get_vrfs():
+            query = self._model_query(context, netforce_model.Vrf)
+            return query.filter(
+                netforce_model.Vrf.bubble_id == bubble_id).filter(
+                netforce_model.Vrf.vpc_id == vpc_id).all()
+
+        return self._cached_lookup(context, netforce_model.Vrf,
+                                   ('vrf', 'bubble_and_vpc', bubble_id,
+                                    vpc_id), _get_vrfs)
 
     def update_vrf(self, context, vrf_id, vrf_dict):
         with context.session.begin(subtransactions=True):
             vrf_db = self.get_vrf(context, vrf_id)
             vrf_db.update(vrf_dict)
+            self._invalidate_reference_cache('vrf')
             return vrf_db
 
     def delete_vrf(self, context, vrf_id):
@@ -606,3 +1048,340 @@ class NetforceDbMixin(netforce_plugin.NetForceServicePlugin,
             vrf_db = self.get_vrf(context, vrf_id)
             context.session.delete(vrf_db)
             context.session.flush()
+            self._invalidate_reference_cache('vrf')
+
+    def create_job(self, context, job):
+        with context.session.begin(subtransactions=True):
+            job_db = netforce_model.Job(**job)
+            job_db.status = netforce_constants.JOB_PENDING
+            context.session.add(job_db)
+            return job_db
+
+    def get_job(self, context, job_id, fields=None):
+        try:
+            return self._get_projected_by_id(context, netforce_model.Job,
+                                             'job', job_id,
+                                             self.make_job_dict,
+                                             fields=fields)
+        except orm_exc.NoResultFound:
+            raise netforce_exceptions.JobNotFound(job_id=job_id)
+
+    def get_jobs(self, context, filters=None, fields=None):
+        return self._get_projected_collection(context,
+                                              netforce_model.Job,
+                                              'job',
+                                              self.make_job_dict,
+                                              filters=filters,
+                                              fields=fields)
+
+    def update_job(self, context, job_id, job_dict):
+        with context.session.begin(subtransactions=True):
+            job_db = self._get_by_id(context, netforce_model.Job, job_id)
+            job_db.update(job_dict)
+            return job_db
+
+    def claim_job(self, context, job_id):
+        """Marks a PENDING job RUNNING, False if it is not PENDING anymore.
+
+        A job can be queued by more than one API process after a recovery,
+        only the one that claims it runs it.
+        """
+        with context.session.begin(subtransactions=True):
+            count = context.session.query(netforce_model.Job).filter(
+                netforce_model.Job.id == job_id,
+                netforce_model.Job.status == netforce_constants.JOB_PENDING
+            ).update({'status': netforce_constants.JOB_RUNNING,
+                      'status_description': 'Running'},
+                     synchronize_session=False)
+        return count == 1
+
+    def get_pending_jobs(self, context):
+        query = context.session.query(netforce_model.Job)
+        return query.filter(
+            netforce_model.Job.status == netforce_constants.JOB_PENDING
+        ).order_by(netforce_model.Job.created_at).all()
+
+    def fail_stale_jobs(self, context, before, job_dict):
+        """Fails the RUNNING jobs not updated since before."""
+        job_model = netforce_model.Job
+        with context.session.begin(subtransactions=True):
+            job_dict = dict(job_dict, status=netforce_constants.JOB_FAILED)
+            return context.session.query(job_model).filter(
+                job_model.status == netforce_constants.JOB_RUNNING,
+                sa.func.coalesce(job_model.updated_at,
+                                 job_model.created_at) < before
+            ).update(job_dict, synchronize_session=False)
+
+    def get_devices_to_reconcile(self, context, sweep_id, limit=None):
+        """Returns the ids of the devices not yet checked in a sweep.
+
+        Devices that were never checked, or whose record or ports changed
+        since they were last checked, come first and the rest in the order
+        they were last checked, so an interrupted or limited sweep looks at
+        the likeliest drift first.
+        """
+        device = netforce_model.Device
+        reconciliation = netforce_model.DeviceReconciliation
+        port_changes = context.session.query(
+            netforce_model.Port.device_id,
+            sa.func.max(netforce_model.Port.updated_at).label('updated_at')
+        ).group_by(netforce_model.Port.device_id).subquery()
+        changed = sa.or_(reconciliation.checked_at.is_(None),
+                         device.updated_at > reconciliation.checked_at,
+                         port_changes.c.updated_at > reconciliation.checked_at)
+        query = context.session.query(device.id).outerjoin(
+            reconciliation, reconciliation.device_id == device.id).outerjoin(
+            port_changes, port_changes.c.device_id == device.id).filter(
+            sa.or_(reconciliation.sweep_id.is_(None),
+                   reconciliation.sweep_id != sweep_id)).order_by(
+            sa.case([(changed, 0)], else_=1), reconciliation.checked_at)
+        if limit:
+            query = query.limit(limit)
+        return [device_id for device_id, in query]
+
+    def get_last_reconcile_sweep_id(self, context):
+        reconciliation = netforce_model.DeviceReconciliation
+        last = context.session.query(reconciliation.sweep_id).order_by(
+            reconciliation.checked_at.desc()).first()
+        return last.sweep_id if last else None
+
+    def save_reconciliation(self, context, device_id, sweep_id, checked_at,
+                            status, error=None, drifts=None):
+        """Checkpoints a device in a sweep.
+
+        The drift report of the device is replaced when it was checked,
+        a failed check leaves the last report in place.
+        """
+        with context.session.begin(subtransactions=True):
+            reconciliation_db = context.session.query(
+                netforce_model.DeviceReconciliation).filter_by(
+                device_id=device_id).first()
+            if not reconciliation_db:
+                reconciliation_db = netforce_model.DeviceReconciliation(
+                    device_id=device_id)
+                context.session.add(reconciliation_db)
+            reconciliation_db.update({
+                'sweep_id': sweep_id,
+                'checked_at': checked_at,
+                'status': status,
+                'error': error
+            })
+            if drifts is None:
+                return reconciliation_db
+            reconciliation_db.drift_count = len(drifts)
+            context.session.query(netforce_model.DriftReport).filter_by(
+                device_id=device_id).delete(synchronize_session=False)
+            for drift in drifts:
+                context.session.add(netforce_model.DriftReport(
+                    id=uuidutils.generate_uuid(), device_id=device_id,
+                    sweep_id=sweep_id, **drift))
+            return reconciliation_db
+
+    def get_device_reconciliation_db(self, context, device_id):
+        return context.session.query(
+            netforce_model.DeviceReconciliation).filter_by(
+            device_id=device_id).first()
+
+    def get_drift_reports(self, context, filters=None, fields=None):
+        return self._get_collection(context, netforce_model.DriftReport,
+                                    self.make_drift_report_dict,
+                                    filters=filters, fields=fields)
+
+    def get_device_ids(self, context):
+        query = self._model_query(context, netforce_model.Device)
+        return [device_id for device_id, in query.with_entities(
+            netforce_model.Device.id)]
+
+    def replace_device_macs(self, context, device_id, entries, seen_at):
+        """Replaces the indexed mac addresses of a device in bulk.
+
+        One DELETE by device and one multi-row INSERT, however large the
+        mac table of the device is.
+
+        :param entries: iterable of (mac, port_id, vlan) tuples.
+        :returns: the number of mac addresses indexed.
+        """
+        model = netforce_model.PortMac
+        rows = [{'mac': mac, 'port_id': port_id, 'vlan': vlan,
+                 'device_id': device_id, 'last_seen': seen_at}
+                for mac, port_id, vlan in set(entries)]
+        with context.session.begin(subtransactions=True):
+            context.session.query(model).filter_by(
+                device_id=device_id).delete(synchronize_session=False)
+            if rows:
+                context.session.execute(model.__table__.insert().values(rows))
+        return len(rows)
+
+    def get_port_macs(self, context, port_id, seen_since):
+        """Returns {(mac, vlan)} seen on a port since the given time."""
+        model = netforce_model.PortMac
+        query = context.session.query(model.mac, model.vlan).filter(
+            model.port_id == port_id, model.last_seen >= seen_since)
+        return set(query)
+
+    def find_mac(self, context, mac):
+        """Returns where a mac address was last seen, most recent first."""
+        model = netforce_model.PortMac
+        query = context.session.query(
+            model, netforce_model.Port.name, netforce_model.Device.name).join(
+            netforce_model.Port, netforce_model.Port.id == model.port_id).join(
+            netforce_model.Device,
+            netforce_model.Device.id == model.device_id).filter(
+            model.mac == mac).order_by(model.last_seen.desc())
+        return [{'mac_address': mac_db.mac,
+                 'device_id': mac_db.device_id,
+                 'device_name': device_name,
+                 'port_id': mac_db.port_id,
+                 'port_name': port_name,
+                 'vlan': mac_db.vlan,
+                 'last_seen': mac_db.last_seen}
+                for mac_db, port_name, device_name in query]
+
+    def get_bubble_ids(self, context):
+        query = self._model_query(context, netforce_model.Bubble)
+        return [bubble_id for bubble_id, in query.with_entities(
+            netforce_model.Bubble.id)]
+
+    def get_latest_route_snapshot(self, context, bubble_id, vrf_name=None):
+        """Returns the last route snapshot of a vrf of a bubble, or None.
+
+        A vrf_name of None is the default vrf.
+        """
+        model = netforce_model.RouteSnapshot
+        query = context.session.query(model).filter(
+            model.bubble_id == bubble_id,
+            model.vrf_name.is_(None) if vrf_name is None
+            else model.vrf_name == vrf_name)
+        return query.order_by(model.collected_at.desc()).first()
+
+    def save_route_snapshot(self, context, bubble_id, vrf_name, device_id,
+                            content_hash, data, route_count, collected_at):
+        """Records the routes collected for a vrf of a bubble.
+
+        When the routes did not change since the last snapshot only its
+        collected_at is moved forward, and the packed routes are stored
+        once by content hash whatever the number of snapshots using them.
+
+        :returns: the snapshot of the routes.
+        """
+        with context.session.begin(subtransactions=True):
+            snapshot = self.get_latest_route_snapshot(context, bubble_id,
+                                                      vrf_name)
+            if snapshot and snapshot.content_hash == content_hash:
+                snapshot.collected_at = collected_at
+                snapshot.device_id = device_id
+                return snapshot
+            if not context.session.query(netforce_model.RouteBlob).get(
+                    content_hash):
+                context.session.add(netforce_model.RouteBlob(
+                    content_hash=content_hash, routes=data,
+                    route_count=route_count))
+            snapshot = netforce_model.RouteSnapshot(
+                id=uuidutils.generate_uuid(), bubble_id=bubble_id,
+                vrf_name=vrf_name, device_id=device_id,
+                content_hash=content_hash, created_at=collected_at,
+                collected_at=collected_at)
+            context.session.add(snapshot)
+        return snapshot
+
+    def get_idempotency_key(self, context, key, tenant_id):
+        return context.session.query(netforce_model.IdempotencyKey).get(
+            (key, tenant_id))
+
+    def claim_idempotency_key(self, context, key, tenant_id, request_hash,
+                              now, expires_at):
+        """Records a key as in progress unless a live record has it.
+
+        :returns: None when the key was claimed, the live record otherwise.
+        """
+        model = netforce_model.IdempotencyKey
+        with context.session.begin(subtransactions=True):
+            context.session.query(model).filter(
+                model.idempotency_key == key, model.tenant_id == tenant_id,
+                model.expires_at <= now).delete(synchronize_session=False)
+        try:
+            with context.session.begin(subtransactions=True):
+                context.session.add(model(
+                    idempotency_key=key, tenant_id=tenant_id,
+                    request_hash=request_hash,
+                    status=netforce_constants.IDEMPOTENCY_IN_PROGRESS,
+                    created_at=now, expires_at=expires_at))
+        except db_exc.DBDuplicateEntry:
+            return self.get_idempotency_key(context, key, tenant_id)
+        return None
+
+    def complete_idempotency_key(self, context, key, tenant_id,
+                                 response_status, response_body,
+                                 content_type, expires_at):
+        model = netforce_model.IdempotencyKey
+        with context.session.begin(subtransactions=True):
+            context.session.query(model).filter_by(
+                idempotency_key=key, tenant_id=tenant_id).update(
+                {'status': netforce_constants.IDEMPOTENCY_COMPLETED,
+                 'response_status': response_status,
+                 'response_body': response_body,
+                 'content_type': content_type,
+                 'expires_at': expires_at}, synchronize_session=False)
+
+    def delete_idempotency_key(self, context, key, tenant_id):
+        model = netforce_model.IdempotencyKey
+        with context.session.begin(subtransactions=True):
+            context.session.query(model).filter_by(
+                idempotency_key=key, tenant_id=tenant_id).delete(
+                synchronize_session=False)
+
+    def enqueue_ticket_update(self, context, ticket_num, payload, now):
+        """Adds a CR update to the outbox, payload is a JSON string."""
+        with context.session.begin(subtransactions=True):
+            update_db = netforce_model.TicketUpdate(
+                id=uuidutils.generate_uuid(), ticket_num=ticket_num,
+                payload=payload, attempts=0, created_at=now,
+                next_attempt_at=now)
+            context.session.add(update_db)
+        return update_db
+
+    def get_due_ticket_updates(self, context, now, limit):
+        """Returns the updates to send now, the oldest first.
+
+        Only the oldest update of a ticket is returned, so that the
+        updates of a ticket are sent in the order they were made even
+        when one of them has to be retried.
+        """
+        model = netforce_model.TicketUpdate
+        oldest = context.session.query(
+            model.ticket_num,
+            sa.func.min(model.created_at).label('created_at')
+        ).group_by(model.ticket_num).subquery()
+        # of two updates of a ticket made at the same time, the first by id
+        # goes first.
+        tied = orm.aliased(model)
+        earlier_tie = sa.exists().where(sa.and_(
+            tied.ticket_num == model.ticket_num,
+            tied.created_at == model.created_at, tied.id < model.id))
+        query = context.session.query(model).join(
+            oldest, sa.and_(model.ticket_num == oldest.c.ticket_num,
+                            model.created_at == oldest.c.created_at)).filter(
+            model.next_attempt_at <= now, ~earlier_tie).order_by(
+            model.created_at, model.id).limit(limit)
+        return query.all()
+
+    def reschedule_ticket_update(self, context, update_id, attempts,
+                                 next_attempt_at, error):
+        model = netforce_model.TicketUpdate
+        with context.session.begin(subtransactions=True):
+            context.session.query(model).filter_by(id=update_id).update(
+                {'attempts': attempts, 'next_attempt_at': next_attempt_at,
+                 'last_error': error}, synchronize_session=False)
+
+    def delete_ticket_update(self, context, update_id):
+        model = netforce_model.TicketUpdate
+        with context.session.begin(subtransactions=True):
+            context.session.query(model).filter_by(id=update_id).delete(
+                synchronize_session=False)
+
+    def delete_ticket_updates(self, context, ticket_num):
+        """Removes all the queued updates of a ticket."""
+        model = netforce_model.TicketUpdate
+        with context.session.begin(subtransactions=True):
+            context.session.query(model).filter_by(
+                ticket_num=ticket_num).delete(synchronize_session=False)
@@ -192,3 +192,123 @@ class Vrf(BASEV2, models_v2.HasId,
     description = sa.Column(sa.String(attributes.NAME_MAX_LEN))
     bubble_id = sa.Column(sa.String(36), ForeignKey('nf_bubbles.id'))
     vpc_id = sa.Column(sa.String(36), ForeignKey('nf_vpcs.id'))
+
+
+class Job(BASEV2, models_v2.HasId,
+          models_v2.HasStatusDescription, models_v2.HasTenant,
+          HasAuditInformation):
+    resource = sa.Column(sa.String(64), nullable=False)
+    action = sa.Column(sa.String(16), nullable=False)
+    resource_id = sa.Column(sa.String(36), nullable=True)
+    request = sa.Column(sa.Text, nullable=True)
+    result = sa.Column(sa.Text, nullable=True)
+    error = sa.Column(sa.Text, nullable=True)
+
+
+class DeviceReconciliation(BASEV2):
+    """Where the last reconciliation sweep left a device."""
+    device_id = sa.Column(sa.String(36),
+                          ForeignKey('nf_devices.id', ondelete='CASCADE'),
+                          primary_key=True)
+    sweep_id = sa.Column(sa.String(36), nullable=False, index=True)
+    checked_at = sa.Column(sa.DateTime, nullable=False)
+    status = sa.Column(sa.String(16), nullable=False)
+    error = sa.Column(sa.Text, nullable=True)
+    drift_count = sa.Column(sa.Integer, nullable=False, default=0)
+
+
+class DriftReport(BASEV2, models_v2.HasId):
+    """A port, vlan or subnet of a device that differs from its record."""
+    device_id = sa.Column(sa.String(36),
+                          ForeignKey('nf_devices.id', ondelete='CASCADE'),
+                          nullable=False, index=True)
+    sweep_id = sa.Column(sa.String(36), nullable=False)
+    resource = sa.Column(sa.String(16), nullable=False)
+    name = sa.Column(sa.String(attributes.NAME_MAX_LEN), nullable=False)
+    expected = sa.Column(sa.Text, nullable=True)
+    actual = sa.Column(sa.Text, nullable=True)
+    mismatches = sa.Column(sa.String(255), nullable=True)
+    created_at = sa.Column(sa.DateTime, default=datetime.datetime.now)
+
+
+class PortMac(BASEV2):
+    """A mac address learned on a port, from the mac table of its device."""
+    mac = sa.Column(sa.String(17), primary_key=True)
+    port_id = sa.Column(sa.String(36),
+                        ForeignKey('nf_ports.id', ondelete='CASCADE'),
+                        primary_key=True)
+    vlan = sa.Column(sa.Integer, primary_key=True, autoincrement=False)
+    device_id = sa.Column(sa.String(36),
+                          ForeignKey('nf_devices.id', ondelete='CASCADE'),
+                          nullable=False, index=True)
+    last_seen = sa.Column(sa.DateTime, nullable=False)
+
+
+class RouteBlob(BASEV2):
+    """A packed route table, stored once whatever the number of snapshots
+    that have the same routes.
+    """
+    content_hash = sa.Column(sa.String(64), primary_key=True)
+    routes = sa.Column(sa.LargeBinary, nullable=False)
+    route_count = sa.Column(sa.Integer, nullable=False)
+
+
+class RouteSnapshot(BASEV2, models_v2.HasId):
+    """The routes of a vrf of a bubble as read from one of its devices.
+
+    A snapshot is added when the routes changed since the last one, and
+    only the collected_at of the last one is moved forward otherwise.
+    """
+    bubble_id = sa.Column(sa.String(36),
+                          ForeignKey('nf_bubbles.id', ondelete='CASCADE'),
+                          nullable=False)
+    vrf_name = sa.Column(sa.String(attributes.NAME_MAX_LEN), nullable=True)
+    device_id = sa.Column(sa.String(36),
+                          ForeignKey('nf_devices.id', ondelete='SET NULL'),
+                          nullable=True)
+    content_hash = sa.Column(sa.String(64),
+                             ForeignKey('nf_routeblobs.content_hash'),
+                             nullable=False)
+    created_at = sa.Column(sa.DateTime, nullable=False)
+    collected_at = sa.Column(sa.DateTime, nullable=False)
+    blob = orm.relationship(RouteBlob, lazy='joined')
+
+
+class SubnetReservation(BASEV2, models_v2.HasId):
+    """A block handed out by the subnet allocator until a subnet is
+    created with it or the reservation expires.
+    """
+    cidr = sa.Column(sa.String(64), nullable=False, unique=True)
+    bubble_id = sa.Column(sa.String(36),
+                          ForeignKey('nf_bubbles.id', ondelete='CASCADE'),
+                          nullable=True)
+    vpc_id = sa.Column(sa.String(36),
+                       ForeignKey('nf_vpcs.id', ondelete='CASCADE'),
+                       nullable=True)
+    created_at = sa.Column(sa.DateTime, nullable=False)
+    expires_at = sa.Column(sa.DateTime, nullable=False, index=True)
+
+
+class IdempotencyKey(BASEV2):
+    """The outcome of a create or update sent with an Idempotency-Key,
+    replayed to the retries of the request until it expires.
+    """
+    idempotency_key = sa.Column(sa.String(255), primary_key=True)
+    tenant_id = sa.Column(sa.String(255), primary_key=True, default='')
+    request_hash = sa.Column(sa.String(64), nullable=False)
+    status = sa.Column(sa.String(16), nullable=False)
+    response_status = sa.Column(sa.Integer)
+    response_body = sa.Column(sa.Text)
+    content_type = sa.Column(sa.String(255))
+    created_at = sa.Column(sa.DateTime, nullable=False)
+    expires_at = sa.Column(sa.DateTime, nullable=False, index=True)
+
+
+class TicketUpdate(BASEV2, models_v2.HasId):
+    """A CR status update waiting to be sent to the ticket service."""
+    ticket_num = sa.Column(sa.String(255), nullable=False, index=True)
+    payload = sa.Column(sa.Text, nullable=False)
+    attempts = sa.Column(sa.Integer, nullable=False, default=0)
+    last_error = sa.Column(sa.Text)
+    created_at = sa.Column(sa.DateTime, nullable=False)
+    next_attempt_at = sa.Column(sa.DateTime, nullable=False, index=True)
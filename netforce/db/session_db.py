@@ -15,20 +15,51 @@
 #    limitations under the License.
 
 
+import atexit
+import datetime
 import time
 
-from eventlet import greenthread
+import eventlet
+from eventlet import queue
+from oslo_config import cfg
+from oslo_log import log as logging
 from oslo_utils import timeutils
 
 import sqlalchemy as sa
 
 from netforce.common import netforce_exceptions as net_esc
+from neutron import context as n_context
 from neutron.common import exceptions as exc
 from neutron.db import common_db_mixin
 from neutron.db import model_base
 from neutron.db import models_v2
+from neutron.openstack.common import uuidutils
 from sqlalchemy.orm import exc as sql_exc
 
+CONF = cfg.CONF
+session_audit_conf = [
+    cfg.BoolOpt('async_write', default=True,
+                help='write session audit records from a background green '
+                     'thread in batches instead of inside the request'),
+    cfg.IntOpt('queue_size', default=10000,
+               help='maximum number of session audit records waiting to '
+                    'be written'),
+    cfg.IntOpt('batch_size', default=500,
+               help='maximum number of records written per batch'),
+    cfg.FloatOpt('flush_interval', default=1.0,
+                 help='seconds to wait for a batch to fill up before it is '
+                      'written'),
+    cfg.BoolOpt('drop_when_full', default=True,
+                help='drop records when the queue is full; when false the '
+                     'request waits for room in the queue instead'),
+    cfg.IntOpt('max_query_sessions', default=1000,
+               help='maximum number of sessions returned by a single '
+                    'session query'),
+]
+CONF.register_opts(session_audit_conf, group='session_audit')
+
+LOG = logging.getLogger(__name__)
+
 
 class HasCreatedUpdatedTime(object):
     """created_at updated_at mixin, add to subclasses that have these."""
@@ -38,19 +69,8 @@ class HasCreatedUpdatedTime(object):
                            onupdate=sa.func.now())
 
 
-class Session(model_base.BASEV2, models_v2.HasId,
-              HasCreatedUpdatedTime):
-    '''Session: this is the sessioning table to track and audit
-       netforce activity.
-    '''
-    __table_args__ = (
-        sa.Index('idx_username', 'username'),
-        sa.Index('idx_tid', 'tid'),
-        sa.Index('idx_remote_addr', 'remote_addr'),
-        sa.Index('idx_auth_state', 'auth_state'),
-        sa.Index('idx_req_id', 'req_id'),
-        model_base.BASEV2.__table_args__
-    )
+class HasSessionInformation(object):
+    '''The audit columns shared by sessions and sessions_archive.'''
 
     # column definitions:
     # ===================
@@ -93,6 +113,35 @@ class Session(model_base.BASEV2, models_v2.HasId,
     originating_ip = sa.Column(sa.String(32), server_default='')
 
 
+class Session(model_base.BASEV2, models_v2.HasId,
+              HasCreatedUpdatedTime, HasSessionInformation):
+    '''Session: this is the sessioning table to track and audit
+       netforce activity.
+    '''
+    __table_args__ = (
+        sa.Index('idx_username', 'username'),
+        sa.Index('idx_tid', 'tid'),
+        sa.Index('idx_remote_addr', 'remote_addr'),
+        sa.Index('idx_auth_state', 'auth_state'),
+        sa.Index('idx_req_id', 'req_id'),
+        sa.Index('idx_created_at', 'created_at'),
+        model_base.BASEV2.__table_args__
+    )
+
+
+class SessionArchive(model_base.BASEV2, models_v2.HasId,
+                     HasCreatedUpdatedTime, HasSessionInformation):
+    '''Sessions older than the retention window, moved out of the sessions
+       table by purge_sessions.
+    '''
+    __tablename__ = 'sessions_archive'
+    __table_args__ = (
+        sa.Index('idx_archive_created_at', 'created_at'),
+        sa.Index('idx_archive_username', 'username'),
+        model_base.BASEV2.__table_args__
+    )
+
+
 class SessionDbMixin(common_db_mixin.CommonDbMixin):
     '''All the necessary items to provide CRUD a session table.'''
 
@@ -114,16 +163,22 @@ class SessionDbMixin(common_db_mixin.CommonDbMixin):
     def get_sessions_with_username(self, context, username, count=0):
         '''Return a list of session belonging to the specified user, if greater
         than 0 then only the latest count of session for this user will be
-        returned.
+        returned, otherwise at most max_query_sessions of them.
         '''
         query = context.session.query(Session)
-        if count:
-            rs = query.filter(Session.username == username).order_by(
-                Session.updated_at.desc()).limit(count)
-        else:
-            rs = query.filter(Session.username == username).all()
+        count = count or CONF.session_audit.max_query_sessions
+        return query.filter(Session.username == username).order_by(
+            Session.updated_at.desc()).limit(count).all()
 
-        return rs
+    def get_sessions_in_range(self, context, start=None, end=None,
+                              username=None, limit=None, marker=None):
+        '''Return one page of sessions created in [start, end), oldest first.
+
+        The id of the last session of a page is the marker of the next one.
+        '''
+        return get_sessions_in_range(context.session, start=start, end=end,
+                                     username=username, limit=limit,
+                                     marker=marker)
 
     def _make_session_dict(self, session, fields=None):
         return self._fields(session, fields)
@@ -152,13 +207,39 @@ class SessionDbMixin(common_db_mixin.CommonDbMixin):
                 res[k] = v
 
             res['created_at'] = current_time
-            greenthread.sleep(0)
             sess_db = Session(**res)
-            greenthread.sleep(0)
             context.session.add(sess_db)
-            greenthread.sleep(0)
             return sess_db
 
+    def create_sessions(self, context, session_rows):
+        '''Inserts session records, given as dicts having the same keys,
+        with a single multi-row INSERT.
+        '''
+        with context.session.begin(subtransactions=True):
+            context.session.execute(
+                Session.__table__.insert().values(session_rows))
+
+    def end_sessions(self, context, session_ends):
+        '''Sets the session ending values of many sessions at once.
+
+        Each item is a dict of req_id, req_api_end, http_rtn and rtn_bytes;
+        a http_rtn of None leaves the stored value unchanged.
+        '''
+        table = Session.__table__
+        stmt = table.update().where(
+            table.c.req_id == sa.bindparam('b_req_id')).values(
+            req_api_end=sa.bindparam('b_req_api_end'),
+            http_rtn=sa.func.coalesce(sa.bindparam('b_http_rtn'),
+                                      table.c.http_rtn),
+            rtn_bytes=sa.bindparam('b_rtn_bytes'),
+            updated_at=timeutils.utcnow())
+        params = [{'b_req_id': end['req_id'],
+                   'b_req_api_end': end['req_api_end'],
+                   'b_http_rtn': end['http_rtn'],
+                   'b_rtn_bytes': end['rtn_bytes']} for end in session_ends]
+        with context.session.begin(subtransactions=True):
+            context.session.execute(stmt, params)
+
     def session_end(self, context, req_id, req_api_end=None,
                     http_rtn=None, rtn_bytes=0):
         '''Sets the session ending values and updates a session defined by its
@@ -192,3 +273,233 @@ class SessionDbMixin(common_db_mixin.CommonDbMixin):
                                           sorts=sorts, limit=limit,
                                           marker_obj=marker_obj,
                                           page_reverse=page_reverse)
+
+
+_STOP = object()
+_CREATE = 'create'
+_END = 'end'
+
+
+class SessionAuditWriter(object):
+    """Writes session audit records in batches from a green thread.
+
+    Records are queued in memory and written with one multi-row INSERT (and
+    one batched UPDATE for session ends) per batch, so the request does not
+    wait for the audit write. The queue is bounded; when it is full records
+    are dropped, or the caller blocks when drop_when_full is off. A batch
+    that fails to write is retried one record at a time. Whatever is still
+    queued is written when the writer is stopped, which happens at
+    interpreter exit.
+    """
+
+    def __init__(self, queue_size, batch_size, flush_interval,
+                 drop_when_full):
+        self._queue = queue.LightQueue(queue_size)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._drop_when_full = drop_when_full
+        self._dropped = 0
+        self._db = SessionDbMixin()
+        self._thread = None
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    def start(self):
+        if self._thread is None:
+            self._thread = eventlet.spawn(self._run)
+
+    def stop(self):
+        """Writes out everything queued and stops the writer thread."""
+        if self._thread is None:
+            return
+        thread, self._thread = self._thread, None
+        self._queue.put(_STOP)
+        thread.wait()
+
+    def create(self, session_row):
+        self._put((_CREATE, session_row))
+
+    def end(self, req_id, req_api_end=None, http_rtn=None, rtn_bytes=0):
+        self._put((_END, {'req_id': req_id,
+                          'req_api_end': req_api_end or time.time(),
+                          'http_rtn': http_rtn,
+                          'rtn_bytes': rtn_bytes}))
+
+    def _put(self, item):
+        self.start()
+        if not self._drop_when_full:
+            self._queue.put(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._dropped += 1
+            if self._dropped % 1000 == 1:
+                LOG.warning('Session audit queue is full, %d records '
+                            'dropped so far', self._dropped)
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.time() + self._flush_interval
+        while len(batch) < self._batch_size and batch[-1] is not _STOP:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        # creates come before ends in the queue, and therefore in a batch.
+        creates = [record for kind, record in batch if kind == _CREATE]
+        ends = [record for kind, record in batch if kind == _END]
+        admin_ctx = n_context.get_admin_context()
+        try:
+            with admin_ctx.session.begin(subtransactions=True):
+                if creates:
+                    self._db.create_sessions(admin_ctx, creates)
+                if ends:
+                    self._db.end_sessions(admin_ctx, ends)
+        except Exception:
+            LOG.exception('Failed to write %d session audit records, '
+                          'writing them one by one', len(batch))
+            self._write_one_by_one(creates, ends)
+
+    def _write_one_by_one(self, creates, ends):
+        """Writes each record on its own so a bad one loses only itself."""
+        admin_ctx = n_context.get_admin_context()
+        for write, records in ((self._db.create_sessions, creates),
+                               (self._db.end_sessions, ends)):
+            for record in records:
+                try:
+                    with admin_ctx.session.begin(subtransactions=True):
+                        write(admin_ctx, [record])
+                except Exception as e:
+                    LOG.warning('Dropped session audit record of request '
+                                '%(req_id)s: %(error)s',
+                                {'req_id': record.get('req_id'),
+                                 'error': e})
+
+
+_session_audit_writer = None
+
+
+def get_session_audit_writer():
+    global _session_audit_writer
+    if _session_audit_writer is None:
+        _session_audit_writer = SessionAuditWriter(
+            CONF.session_audit.queue_size, CONF.session_audit.batch_size,
+            CONF.session_audit.flush_interval,
+            CONF.session_audit.drop_when_full)
+        atexit.register(_session_audit_writer.stop)
+    return _session_audit_writer
+
+
+def make_session_row(**session_state):
+    """Returns a complete Session row dict for the audit writer."""
+    now = timeutils.utcnow()
+    row = {'id': uuidutils.generate_uuid(),
+           'req_api_end': 0,
+           'rtn_bytes': 0,
+           'tid': '',
+           'created_at': now,
+           'updated_at': now}
+    row.update(session_state)
+    # a failed authentication has no user, the column is not nullable and
+    # one bad row would fail the whole batch.
+    if row.get('username') is None:
+        row['username'] = ''
+    return row
+
+
+def get_sessions_in_range(db_session, start=None, end=None, username=None,
+                          limit=None, marker=None):
+    """Returns one page of sessions created in [start, end), oldest first.
+
+    Pages are keyed on (created_at, id): pass the id of the last session
+    of a page as marker to get the next one. A page holds at most
+    max_query_sessions sessions.
+    """
+    limit = min(limit or CONF.session_audit.max_query_sessions,
+                CONF.session_audit.max_query_sessions)
+    query = db_session.query(Session)
+    if username:
+        query = query.filter(Session.username == username)
+    if start:
+        query = query.filter(Session.created_at >= start)
+    if end:
+        query = query.filter(Session.created_at < end)
+    if marker:
+        marker_obj = db_session.query(Session).filter(
+            Session.id == marker).first()
+        if marker_obj is None:
+            raise net_esc.SessionNotFound(session_id=marker)
+        query = query.filter(sa.or_(
+            Session.created_at > marker_obj.created_at,
+            sa.and_(Session.created_at == marker_obj.created_at,
+                    Session.id > marker_obj.id)))
+    return query.order_by(Session.created_at, Session.id).limit(limit).all()
+
+
+def _purge_batches(engine, table, before, batch_size, archive_table=None):
+    """Deletes the rows of table created before a date, batch by batch.
+
+    Every batch is selected by primary key and, when archive_table is given,
+    copied there and deleted in its own short transaction, so no lock is
+    held across the whole purge.
+    """
+    columns = [c.name for c in table.c]
+    purged = 0
+    while True:
+        with engine.begin() as conn:
+            ids = [row[0] for row in conn.execute(
+                sa.select([table.c.id]).where(
+                    table.c.created_at < before).order_by(
+                    table.c.created_at).limit(batch_size))]
+            if not ids:
+                return purged
+            if archive_table is not None:
+                conn.execute(archive_table.insert().from_select(
+                    columns, sa.select([table.c[name] for name in columns])
+                    .where(table.c.id.in_(ids))))
+            conn.execute(table.delete().where(table.c.id.in_(ids)))
+        purged += len(ids)
+        LOG.debug('Purged %(count)d rows from %(table)s',
+                  {'count': purged, 'table': table.name})
+
+
+def purge_sessions(engine, retention_days, batch_size=1000, archive=True,
+                   archive_retention_days=0):
+    """Moves sessions older than retention_days to sessions_archive.
+
+    With archive off they are deleted instead. Archived sessions older than
+    archive_retention_days are deleted, 0 keeps them forever.
+
+    :returns: (number of sessions purged, number of archived rows deleted)
+    """
+    now = timeutils.utcnow()
+    before = now - datetime.timedelta(days=retention_days)
+    purged = _purge_batches(
+        engine, Session.__table__, before, batch_size,
+        SessionArchive.__table__ if archive else None)
+    archive_purged = 0
+    if archive_retention_days:
+        archive_before = now - datetime.timedelta(days=archive_retention_days)
+        archive_purged = _purge_batches(engine, SessionArchive.__table__,
+                                        archive_before, batch_size)
+    return purged, archive_purged
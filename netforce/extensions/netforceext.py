@@ -16,17 +16,26 @@
 
 
 from netforce.api.v2 import attributes as netforce_attr
-from netforce.common import netforce_exceptions as netforce_exc
 from netforce.plugins.common import netforce_constants
+from netforce.services import idempotency
 
 from neutron.api import api_common
 from neutron.api import extensions
 from neutron.api.v2 import attributes as attr
 from neutron.api.v2 import base
 from neutron.api.v2 import resource as resource_creator
+from neutron.common import exceptions as n_exc
 from neutron import manager
+from neutron import policy
 from neutron import wsgi
+from oslo_config import cfg
+from oslo_serialization import jsonutils
 import urlparse
+import webob
+import webob.dec
+import webob.exc
+
+cfg.CONF.import_group('async_jobs', 'netforce.services.job_manager')
 
 # Resource names and their collections
 SUBNETS = 'subnets'
@@ -59,6 +68,27 @@ BUBBLE = 'bubble'
 VRFS = 'vrfs'
 VRF = 'vrf'
 
+JOBS = 'jobs'
+JOB = 'job'
+
+# Newline delimited JSON, one resource per line, used by streamed lists.
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+STREAM_PARAM = 'stream'
+
+# Requests run as a background job when asked for with the async query
+# parameter or a Prefer: respond-async header (RFC 7240).
+ASYNC_PARAM = 'async'
+PREFER_ASYNC = 'respond-async'
+ASYNC_ACTIONS = {
+    PORT: ('update',),
+    VLAN: ('create',),
+    SUBNET: ('create',),
+}
+
+# Creates, updates and actions sent with an Idempotency-Key header are
+# run once and their response replayed to the retries with the same key.
+IDEMPOTENT_METHODS = ('POST', 'PUT')
+
 # Defining resource payloads
 RESOURCE_ATTRIBUTE_MAP = {
     SUBNETS: {
@@ -132,6 +162,13 @@ RESOURCE_ATTRIBUTE_MAP = {
             'default': 0,
             'is_visible': True,
             'convert_to': attr.convert_to_int,
+        },
+        'reservation_id': {
+            'allow_post': True,
+            'allow_put': False,
+            'default': None,
+            'validate': {'type:uuid_or_none': None},
+            'is_visible': False
         }
     },
 
@@ -524,6 +561,109 @@ RESOURCE_ATTRIBUTE_MAP = {
              'required_by_policy': True,
              'is_visible': True
         }
+    },
+    VLANPORTASSOCIATIONS: {
+        'id': {
+            'allow_post': False,
+            'allow_put': False,
+            'validate': {'type:uuid': None},
+            'is_visible': True,
+            'primary_key': True
+        },
+        'vlan_id': {
+            'allow_post': False,
+            'allow_put': False,
+            'validate': {'type:uuid': None},
+            'is_visible': True
+        },
+        'port_id': {
+            'allow_post': False,
+            'allow_put': False,
+            'validate': {'type:uuid': None},
+            'is_visible': True
+        },
+        'is_native_vlan': {
+            'allow_post': False,
+            'allow_put': False,
+            'convert_to': attr.convert_to_boolean,
+            'is_visible': True
+        },
+        'status': {
+            'allow_post': False,
+            'allow_put': False,
+            'is_visible': True
+        },
+        'status_description': {
+            'allow_post': False,
+            'allow_put': False,
+            'is_visible': True
+        },
+        'tenant_id': {
+            'allow_post': False,
+            'allow_put': False,
+            'required_by_policy': True,
+            'is_visible': True
+        }
+    },
+    JOBS: {
+        'id': {
+            'allow_post': False,
+            'allow_put': False,
+            'validate': {'type:uuid': None},
+            'is_visible': True,
+            'primary_key': True
+        },
+        'tenant_id': {
+            'allow_post': False,
+            'allow_put': False,
+            'required_by_policy': True,
+            'is_visible': True
+        },
+        'resource': {
+            'allow_post': False,
+            'allow_put': False,
+            'is_visible': True
+        },
+        'action': {
+            'allow_post': False,
+            'allow_put': False,
+            'is_visible': True
+        },
+        'resource_id': {
+            'allow_post': False,
+            'allow_put': False,
+            'is_visible': True
+        },
+        'status': {
+            'allow_post': False,
+            'allow_put': False,
+            'is_visible': True
+        },
+        'status_description': {
+            'allow_post': False,
+            'allow_put': False,
+            'is_visible': True
+        },
+        'result': {
+            'allow_post': False,
+            'allow_put': False,
+            'is_visible': True
+        },
+        'error': {
+            'allow_post': False,
+            'allow_put': False,
+            'is_visible': True
+        },
+        'created_at': {
+            'allow_post': False,
+            'allow_put': False,
+            'is_visible': True
+        },
+        'updated_at': {
+            'allow_post': False,
+            'allow_put': False,
+            'is_visible': True
+        }
     }
 }
 
@@ -542,19 +682,7 @@ class NetForceController(base.Controller, wsgi.Controller):
         # TODO(aginwala): Make sure to enforce policy enforcement in future.
         body = kwargs.get('body')
         kwargs.pop('body', None)
-        url = request.url
-        params = urlparse.parse_qs(urlparse.urlparse(url).query,
-                                   keep_blank_values=True)
-        if params:
-            if 'skip_device' in params:
-                kwargs.update({"skip_device": True})
-            # Note: patch_primary_junos_subnets is for temporary to patch
-            # all junos TORs:
-            if 'patch_primary_junos_subnets' in params:
-                kwargs.update({"patch_primary_junos_subnets": True})
-            if 'one_subnet_only' in params:
-                kwargs.update(
-                    {"one_subnet_only": params['one_subnet_only'][0]})
+        kwargs.update(self._get_create_params(request))
         # Creates a new instance of the requested entity.
         # Over-riding upstream neutron stable/juno base.py
         body = base.Controller.prepare_request_body(
@@ -585,19 +713,12 @@ class NetForceController(base.Controller, wsgi.Controller):
         # TODO(aginwala): Make sure to enforce policy enforcement in future.
         dsid = kwargs.pop('id', None)
         body = kwargs.pop('body', None)
-        url = request.url
-        params = urlparse.parse_qs(urlparse.urlparse(url).query,
-                                   keep_blank_values=True)
-        if params:
-            if 'skip_mac_check' in params:
-                kwargs.update({"check_mac": False})
-            if 'skip_cms_check' in params:
-                kwargs.update({"check_cms": False})
+        kwargs.update(self._get_update_params(request))
         try:
             payload = body.copy()
         except AttributeError:
             msg = "Invalid format: %s" % request.body
-            raise netforce_exc.BadRequest(resource='body', msg=msg)
+            raise n_exc.BadRequest(resource='body', msg=msg)
         payload['id'] = dsid
         body = base.Controller.prepare_request_body(
             request.context, body, False, self._resource, self._attr_info,
@@ -609,6 +730,191 @@ class NetForceController(base.Controller, wsgi.Controller):
         result = {self._resource: self._view(request.context, obj)}
         return result
 
+    def _get_create_params(self, request):
+        kwargs = {}
+        params = urlparse.parse_qs(urlparse.urlparse(request.url).query,
+                                   keep_blank_values=True)
+        if params:
+            if 'skip_device' in params:
+                kwargs.update({"skip_device": True})
+            # Note: patch_primary_junos_subnets is for temporary to patch
+            # all junos TORs:
+            if 'patch_primary_junos_subnets' in params:
+                kwargs.update({"patch_primary_junos_subnets": True})
+            if 'one_subnet_only' in params:
+                kwargs.update(
+                    {"one_subnet_only": params['one_subnet_only'][0]})
+            if 'discover_ports' in params:
+                kwargs.update({"discover_ports": True})
+        return kwargs
+
+    def _get_update_params(self, request):
+        kwargs = {}
+        params = urlparse.parse_qs(urlparse.urlparse(request.url).query,
+                                   keep_blank_values=True)
+        if params:
+            if 'skip_mac_check' in params:
+                kwargs.update({"check_mac": False})
+            if 'skip_cms_check' in params:
+                kwargs.update({"check_cms": False})
+        return kwargs
+
+    def bulk_create(self, request, **kwargs):
+        """Creates many devices in one request, answers a result per device.
+
+        The body is {"devices": [{<device attributes>}, ...]} and the
+        attributes are validated as for a single create.
+        """
+        body = kwargs.pop('body', None)
+        try:
+            items = body[self._collection]
+            if not isinstance(items, list):
+                raise TypeError()
+        except (KeyError, TypeError):
+            msg = "Invalid format: %s" % request.body
+            raise n_exc.BadRequest(resource='body', msg=msg)
+        creates = [base.Controller.prepare_request_body(
+            request.context, {self._resource: item}, True, self._resource,
+            self._attr_info) for item in items]
+        kwargs.update(self._get_create_params(request))
+        obj_creator = getattr(self._plugin,
+                              '%s_%s' % (self.CREATE, self._collection))
+        return {self._collection: obj_creator(request.context, creates,
+                                              **kwargs)}
+
+    def bulk_update(self, request, **kwargs):
+        """Updates many ports in one request, answers a result per port.
+
+        The body is {"ports": [{"id": <port id>, <port attributes>}, ...]}
+        and the attributes are validated as for a single update.
+        """
+        body = kwargs.pop('body', None)
+        try:
+            items = body[self._collection]
+            if not isinstance(items, list):
+                raise TypeError()
+        except (KeyError, TypeError):
+            msg = "Invalid format: %s" % request.body
+            raise n_exc.BadRequest(resource='body', msg=msg)
+        updates = []
+        for item in items:
+            try:
+                dsid = item.pop('id')
+            except (AttributeError, KeyError):
+                msg = "Every %s needs an id: %s" % (self._resource, item)
+                raise n_exc.BadRequest(resource='body', msg=msg)
+            updates.append((dsid, base.Controller.prepare_request_body(
+                request.context, {self._resource: item}, False,
+                self._resource, self._attr_info)))
+        kwargs.update(self._get_update_params(request))
+        obj_updater = getattr(self._plugin,
+                              '%s_%s' % (self.UPDATE, self._collection))
+        return {self._collection: obj_updater(request.context, updates,
+                                              **kwargs)}
+
+    def find_mac(self, request, **kwargs):
+        """Returns the ports a mac address was last seen on.
+
+        The mac is given as the mac query parameter and looked up in the
+        mac index, without reading any device.
+        """
+        params = urlparse.parse_qs(urlparse.urlparse(request.url).query)
+        if not params.get('mac'):
+            msg = "The mac query parameter is required"
+            raise n_exc.BadRequest(resource='mac', msg=msg)
+        return {'macs': self._plugin.find_mac_address(request.context,
+                                                      params['mac'][0])}
+
+    def allocate(self, request, **kwargs):
+        """Reserves the first free block of a prefix length for a subnet.
+
+        The body is {"subnet": {"prefixlen": 24, "bubble_id": <optional>,
+        "vpc_id": <optional>}}, the answer the reserved block to create
+        the subnet with, passing its id as the reservation_id of the subnet.
+        """
+        body = kwargs.pop('body', None)
+        try:
+            allocation = body[SUBNET]
+            if not isinstance(allocation, dict):
+                raise TypeError()
+        except (KeyError, TypeError):
+            msg = "Invalid format: %s" % request.body
+            raise n_exc.BadRequest(resource='body', msg=msg)
+        return {SUBNET: self._plugin.allocate_subnet(request.context,
+                                                     allocation)}
+
+    def check_block(self, request, **kwargs):
+        """Tells whether a block is free in a vrf of a bubble.
+
+        The cidr, bubble_id and optional vrf query parameters are checked
+        against the last route snapshot, without reading any device.
+        """
+        params = urlparse.parse_qs(urlparse.urlparse(request.url).query)
+        for param in ('cidr', 'bubble_id'):
+            if not params.get(param):
+                msg = "The %s query parameter is required" % param
+                raise n_exc.BadRequest(resource=SUBNET, msg=msg)
+        vrf_name = params.get('vrf', [None])[0]
+        return {SUBNET: self._plugin.check_subnet_block(
+            request.context, params['bubble_id'][0], params['cidr'][0],
+            vrf_name=vrf_name)}
+
+    def check_ports(self, request, id, **kwargs):
+        """Returns the ports of a device that drifted from their record."""
+        return {PORTS: self._plugin.check_device_ports(request.context, id)}
+
+    def discover_ports(self, request, id, **kwargs):
+        """Records the ports found on a device, returns the counts."""
+        return {PORTS: self._plugin.discover_device_ports(request.context,
+                                                          id)}
+
+    def drift(self, request, id, **kwargs):
+        """Returns the drift report of a device from the last sweep."""
+        return {'drift': self._plugin.get_device_drift(request.context, id)}
+
+    def run_idempotent(self, request, key, handler):
+        """Runs a create or update once per Idempotency-Key.
+
+        Retries of the request with the same key are answered the recorded
+        response, or wait for the request while it is in progress.
+        """
+        return idempotency.run(self._plugin, request, key, handler)
+
+    def supports_async(self, action):
+        return action in ASYNC_ACTIONS.get(self._resource, ())
+
+    def submit(self, request, action, **kwargs):
+        """Validates a create or update request and queues it as a job.
+
+        Only the request body is validated and, for an update, the target
+        looked up before answering 202 with the job. The device work is
+        done by the plugin's job workers; the outcome is read back from
+        the jobs resource.
+        """
+        dsid = kwargs.pop('id', None)
+        try:
+            body = jsonutils.loads(request.body)
+        except ValueError:
+            msg = "Invalid format: %s" % request.body
+            raise n_exc.BadRequest(resource='body', msg=msg)
+        is_create = action == self.CREATE
+        body = base.Controller.prepare_request_body(
+            request.context, body, is_create, self._resource,
+            self._attr_info, allow_bulk=self._allow_bulk)
+        if is_create:
+            params = self._get_create_params(request)
+        else:
+            # 404 now rather than a failed job later.
+            self._item(request, dsid, do_authz=False, field_list=['id'])
+            params = self._get_update_params(request)
+        job = self._plugin.submit_job(request.context, self._resource,
+                                      action, body, resource_id=dsid,
+                                      **params)
+        return webob.Response(request=request, status=202,
+                              content_type='application/json',
+                              charset='UTF-8',
+                              body=jsonutils.dumps({JOB: job}))
+
     def delete(self, request, **kwargs):
         """Deletes the specified entity."""
         # TODO(aginwala): Make sure to enforce policy enforcement in future.
@@ -621,31 +927,150 @@ class NetForceController(base.Controller, wsgi.Controller):
         """Returns a list of the requested entity."""
         return self._items(request, True, None)
 
+    def stream(self, request):
+        """Returns the requested entities as newline delimited JSON.
+
+        Unlike index, nothing is accumulated: rows come from the plugin's
+        iter_<collection> generator when it has one and each row is
+        serialized and written as soon as it is read.
+        """
+        original_fields, fields_to_add = self._do_field_list(
+            api_common.list_args(request, 'fields'))
+        filters = api_common.get_filters(request, self._attr_info,
+                                         ['fields', STREAM_PARAM])
+        obj_getter = getattr(self._plugin, 'iter_%s' % self._collection,
+                             None)
+        if not obj_getter:
+            obj_getter = getattr(self._plugin,
+                                 self._plugin_handlers[self.LIST])
+        obj_list = obj_getter(request.context, filters=filters,
+                              fields=original_fields)
+        context = request.context
+        show_action = self._plugin_handlers[self.SHOW]
+
+        def _serialize():
+            for obj in obj_list:
+                if not policy.check(context, show_action, obj,
+                                    plugin=self._plugin):
+                    continue
+                yield jsonutils.dumps(
+                    self._view(context, obj,
+                               fields_to_strip=fields_to_add)) + '\n'
+
+        return webob.Response(request=request,
+                              content_type=NDJSON_CONTENT_TYPE,
+                              charset='UTF-8',
+                              app_iter=_serialize())
+
+
+def _is_stream_request(request):
+    if STREAM_PARAM in request.GET:
+        return True
+    return NDJSON_CONTENT_TYPE in request.headers.get('Accept', '')
+
+
+def _is_async_request(request):
+    if not cfg.CONF.async_jobs.enabled:
+        return False
+    if ASYNC_PARAM in request.GET:
+        return True
+    return PREFER_ASYNC in request.headers.get('Prefer', '')
+
+
+def netforce_resource(controller, faults=None):
+    """Neutron resource that can also stream lists and queue jobs.
+
+    The neutron resource serializes whatever the controller returns in one
+    go with a fixed status, so two kinds of request are routed to the
+    controller here instead: list requests asking for NDJSON (the stream
+    query parameter or an application/x-ndjson Accept header) go to its
+    stream method, and creates or updates asking to run asynchronously go
+    to its submit method, which answers 202 with a job. Everything else is
+    handed to the neutron resource unchanged.
+    """
+    faults = faults or {}
+    api_resource = resource_creator.Resource(controller, faults=faults)
+
+    @webob.dec.wsgify(RequestClass=wsgi.Request)
+    def resource(request):
+        route_args = request.environ.get('wsgiorg.routing_args')
+        args = dict(route_args[1]) if route_args else {}
+        action = args.pop('action', None)
+        args.pop('controller', None)
+        args.pop('format', None)
+
+        def _dispatch():
+            try:
+                if action == 'index' and _is_stream_request(request):
+                    return controller.stream(request)
+                if (controller.supports_async(action) and
+                        _is_async_request(request)):
+                    return controller.submit(request, action, **args)
+            except webob.exc.HTTPException:
+                raise
+            except Exception as ex:
+                for fault in faults:
+                    if isinstance(ex, fault):
+                        raise faults[fault](explanation=unicode(ex))
+                raise webob.exc.HTTPInternalServerError(
+                    explanation=unicode(ex))
+            return request.get_response(api_resource)
+
+        key = request.headers.get(idempotency.HEADER)
+        if key and request.method in IDEMPOTENT_METHODS:
+            return controller.run_idempotent(request, key, _dispatch)
+        return _dispatch()
+
+    return resource
+
+
+class ReadOnlyController(NetForceController):
+    """Controller of the resources that are only listed and shown.
+
+    Jobs are made by asynchronous requests and vlan port associations by
+    the port updates.
+    """
+
+    def create(self, request, **kwargs):
+        raise webob.exc.HTTPMethodNotAllowed()
+
+    def update(self, request, **kwargs):
+        raise webob.exc.HTTPMethodNotAllowed()
+
+    def delete(self, request, **kwargs):
+        raise webob.exc.HTTPMethodNotAllowed()
+
 
 def create_port_resource():
-    controller = resource_creator.\
-        Resource(NetForceController(PORT, PORTS,
-                                    RESOURCE_ATTRIBUTE_MAP[PORTS]),
-                 faults=base.FAULT_MAP)
+    controller = netforce_resource(
+        NetForceController(PORT, PORTS,
+                           RESOURCE_ATTRIBUTE_MAP[PORTS]),
+        faults=base.FAULT_MAP)
     resource = extensions.\
         ResourceExtension(PORTS,
                           controller,
                           path_prefix=netforce_constants.
                           COMMON_PREFIXES[netforce_constants.NETFORCE],
+                          collection_actions={'bulk_update': 'PUT',
+                                              'find_mac': 'GET'},
                           attr_map=RESOURCE_ATTRIBUTE_MAP.get(PORTS))
     return resource
 
 
 def create_device_resource():
-    controller = resource_creator.\
-        Resource(NetForceController(DEVICE, DEVICES,
-                                    RESOURCE_ATTRIBUTE_MAP[DEVICES]),
-                 faults=base.FAULT_MAP)
+    controller = netforce_resource(
+        NetForceController(DEVICE, DEVICES,
+                           RESOURCE_ATTRIBUTE_MAP[DEVICES]),
+        faults=base.FAULT_MAP)
     resource = extensions.\
         ResourceExtension(DEVICES,
                           controller,
                           path_prefix=netforce_constants.COMMON_PREFIXES[
                                                 netforce_constants.NETFORCE],
+                          collection_actions={'bulk_create': 'POST'},
+                          member_actions={'check_ports': 'GET',
+                                          'discover_ports': 'PUT',
+                                          'drift': 'GET'},
                           attr_map=RESOURCE_ATTRIBUTE_MAP.get(DEVICES))
     return resource
 
@@ -665,10 +1090,10 @@ def create_device_type_resource():
 
 
 def create_vlan_resource():
-    controller = resource_creator.\
-        Resource(NetForceController(VLAN, VLANS,
-                                    RESOURCE_ATTRIBUTE_MAP[VLANS]),
-                 faults=base.FAULT_MAP)
+    controller = netforce_resource(
+        NetForceController(VLAN, VLANS,
+                           RESOURCE_ATTRIBUTE_MAP[VLANS]),
+        faults=base.FAULT_MAP)
     resource = extensions.\
         ResourceExtension(VLANS,
                           controller,
@@ -707,13 +1132,10 @@ def create_bg_resource():
 
 
 def create_vlanportassociation_resource():
-    controller = resource_creator.\
-        Resource(NetForceController(VLANPORTASSOCIATION,
-                                    VLANPORTASSOCIATIONS,
-                                    RESOURCE_ATTRIBUTE_MAP[
-                                                         VLANPORTASSOCIATIONS]
-                                    ),
-                 faults=base.FAULT_MAP)
+    controller = netforce_resource(
+        ReadOnlyController(VLANPORTASSOCIATION, VLANPORTASSOCIATIONS,
+                           RESOURCE_ATTRIBUTE_MAP[VLANPORTASSOCIATIONS]),
+        faults=base.FAULT_MAP)
     resource = extensions.\
         ResourceExtension(VLANPORTASSOCIATIONS,
                           controller,
@@ -725,13 +1147,15 @@ def create_vlanportassociation_resource():
 
 
 def create_subnet_resource():
-    controller = resource_creator. \
-        Resource(NetForceController(SUBNET, SUBNETS,
-                                    RESOURCE_ATTRIBUTE_MAP[SUBNETS]),
-                 faults=base.FAULT_MAP)
+    controller = netforce_resource(
+        NetForceController(SUBNET, SUBNETS,
+                           RESOURCE_ATTRIBUTE_MAP[SUBNETS]),
+        faults=base.FAULT_MAP)
     resource = extensions. \
         ResourceExtension(SUBNETS, controller, path_prefix=netforce_constants.
                           COMMON_PREFIXES[netforce_constants.NETFORCE],
+                          collection_actions={'allocate': 'POST',
+                                              'check_block': 'GET'},
                           attr_map=RESOURCE_ATTRIBUTE_MAP.get(SUBNETS))
     return resource
 
@@ -760,6 +1184,18 @@ def create_vrf_resource():
     return resource
 
 
+def create_job_resource():
+    controller = resource_creator. \
+        Resource(ReadOnlyController(JOB, JOBS,
+                                    RESOURCE_ATTRIBUTE_MAP[JOBS]),
+                 faults=base.FAULT_MAP)
+    resource = extensions. \
+        ResourceExtension(JOBS, controller, path_prefix=netforce_constants.
+                          COMMON_PREFIXES[netforce_constants.NETFORCE],
+                          attr_map=RESOURCE_ATTRIBUTE_MAP.get(JOBS))
+    return resource
+
+
 class Netforceext(extensions.ExtensionDescriptor):
     """Netforce extension."""
 
@@ -791,9 +1227,11 @@ class Netforceext(extensions.ExtensionDescriptor):
         resources.append(create_device_resource())
         resources.append(create_device_type_resource())
         resources.append(create_vlan_resource())
+        resources.append(create_vlanportassociation_resource())
         resources.append(create_bg_resource())
         resources.append(create_vpc_resource())
         resources.append(create_subnet_resource())
         resources.append(create_bubble_resource())
         resources.append(create_vrf_resource())
+        resources.append(create_job_resource())
         return resources
@@ -43,3 +43,17 @@ VALIDATION_TYPE_POST = 'post'
 
 DISABLE_PORT = 'shutdown'
 ENABLE_PORT = 'noshutdown'
+
+# Status of the asynchronous jobs
+JOB_PENDING = 'PENDING'
+JOB_RUNNING = 'RUNNING'
+JOB_COMPLETED = 'COMPLETED'
+JOB_FAILED = 'FAILED'
+
+# Outcome of checking a device in a reconciliation sweep
+RECONCILE_COMPLETED = 'COMPLETED'
+RECONCILE_FAILED = 'FAILED'
+
+# State of a request recorded under an Idempotency-Key
+IDEMPOTENCY_IN_PROGRESS = 'IN_PROGRESS'
+IDEMPOTENCY_COMPLETED = 'COMPLETED'
@@ -0,0 +1,169 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import eventlet
+from eventlet import event
+from oslo_config import cfg
+from oslo_log import log as logging
+
+from netforce.common import lockutils
+
+LOG = logging.getLogger(__name__)
+
+CONF = cfg.CONF
+device_queue_conf = [
+    cfg.BoolOpt('enabled', default=False,
+                help='queue port updates per device, merge the updates '
+                     'queued for the same port and push each batch over '
+                     'one device session'),
+    cfg.FloatOpt('batch_window', default=0.5,
+                 help='seconds an idle device queue waits for more updates '
+                      'before running a batch'),
+    cfg.IntOpt('max_batch_size', default=96,
+               help='maximum number of port changes run in one batch'),
+]
+CONF.register_opts(device_queue_conf, group='device_queue')
+
+
+class PendingChange(object):
+    """Desired state of a port and the requests waiting for it."""
+
+    def __init__(self, context, port_id, body, kwargs):
+        self.context = context
+        self.port_id = port_id
+        self.body = body
+        self.kwargs = kwargs
+        self.done = event.Event()
+
+    def merge(self, context, body, kwargs):
+        """Folds a later update of the same port into this change.
+
+        Returns False when the two can not be pushed as one update, i.e.
+        they were made with different options or together they would flip
+        vlans and enable/disable the port at the same time.
+        """
+        if kwargs != self.kwargs:
+            return False
+        merged = dict(self.body)
+        merged.update(body)
+        if merged.get('vlans') and 'admin_status' in merged:
+            return False
+        self.context = context
+        self.body = merged
+        return True
+
+
+class DeviceSession(object):
+    """Device driver proxy that keeps one connection open for a batch.
+
+    open is only passed on to the driver the first time and close is a no
+    op, the connection is closed by release once the batch is done.
+    """
+
+    def __init__(self, driver):
+        self._driver = driver
+        self._opened = False
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def open(self):
+        if not self._opened:
+            self._driver.open()
+            self._opened = True
+
+    def close(self):
+        pass
+
+    def release(self):
+        if self._opened:
+            self._opened = False
+            self._driver.close()
+
+
+class DeviceWorkQueue(object):
+    """Serializes port updates per device and coalesces them.
+
+    Updates are queued per device and run in order by one green thread per
+    device with queued work. An update of a port that already has a
+    change waiting is merged into it, so only the latest desired state is
+    pushed and every request merged into the change gets its result.
+    """
+
+    def __init__(self, batch_window, max_batch_size):
+        self._batch_window = batch_window
+        self._max_batch_size = max_batch_size
+        self._pending = {}
+        self._workers = {}
+
+    def submit(self, device_id, context, port_id, body, kwargs, run_batch):
+        """Queues an update and waits for the outcome of its change.
+
+        run_batch(device_id, changes) is called from the device's worker
+        and must send a result or an exception to every change's done
+        event.
+        """
+        pending = self._pending.setdefault(device_id, [])
+        change = None
+        for queued in reversed(pending):
+            if queued.port_id == port_id:
+                if queued.merge(context, body, kwargs):
+                    change = queued
+                break
+        if change is None:
+            change = PendingChange(context, port_id, body, kwargs)
+            pending.append(change)
+        if device_id not in self._workers:
+            self._workers[device_id] = eventlet.spawn(self._run, device_id,
+                                                      run_batch)
+        return change.done.wait()
+
+    def _run(self, device_id, run_batch):
+        try:
+            # give a wave of updates the time to queue up, and merge.
+            eventlet.sleep(self._batch_window)
+            while self._pending.get(device_id):
+                pending = self._pending[device_id]
+                batch = pending[:self._max_batch_size]
+                del pending[:self._max_batch_size]
+                LOG.debug('Running %(count)d port changes on device '
+                          '%(device)s', {'count': len(batch),
+                                         'device': device_id})
+                try:
+                    run_batch(device_id, batch)
+                except Exception as ex:
+                    LOG.exception('Port changes on device %s failed',
+                                  device_id)
+                    for change in batch:
+                        if not change.done.ready():
+                            change.done.send_exception(ex)
+        finally:
+            self._pending.pop(device_id, None)
+            del self._workers[device_id]
+            # the locks of the batches were taken with a coordinator local
+            # to this green thread.
+            lockutils.stop_coordinator()
+
+
+_device_queue = None
+
+
+def get_device_queue():
+    global _device_queue
+    if _device_queue is None:
+        _device_queue = DeviceWorkQueue(CONF.device_queue.batch_window,
+                                        CONF.device_queue.max_batch_size)
+    return _device_queue
@@ -0,0 +1,139 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import datetime
+import hashlib
+import time
+
+import eventlet
+from oslo_config import cfg
+from oslo_log import log as logging
+import webob.exc
+
+from netforce.plugins.common import netforce_constants
+from neutron import context as n_context
+
+LOG = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LEN = 255
+
+CONF = cfg.CONF
+idempotency_conf = [
+    cfg.IntOpt('ttl', default=86400,
+               help='seconds for which the response to a request sent '
+                    'with an Idempotency-Key is replayed to its retries'),
+    cfg.IntOpt('in_progress_timeout', default=600,
+               help='seconds after which a request still in progress is '
+                    'taken as lost, e.g. with its API process, and its key '
+                    'can be used again'),
+    cfg.IntOpt('wait_timeout', default=60,
+               help='seconds a retry waits for the request in progress '
+                    'with the same key before answering 409'),
+    cfg.FloatOpt('poll_interval', default=0.5,
+                 help='seconds between the checks of a retry waiting for '
+                      'the request in progress with the same key'),
+]
+CONF.register_opts(idempotency_conf, group='idempotency')
+
+
+def _request_hash(request):
+    digest = hashlib.sha256()
+    for part in (request.method, request.path_qs, request.body):
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _replay(request, record):
+    response = webob.Response(request=request,
+                              status=record.response_status,
+                              body=record.response_body or '')
+    if record.content_type:
+        response.headers['Content-Type'] = record.content_type
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def run(plugin, request, key, handler):
+    """Runs a request once per Idempotency-Key and replays its response.
+
+    The first request with a key claims it and runs handler. Its response
+    is recorded for ttl seconds and answered to the retries with the same
+    key and request, a retry of a request still in progress waits for it
+    instead of running the device work a second time. Server errors are
+    not recorded so that the retries run the request again.
+    """
+    if len(key) > MAX_KEY_LEN:
+        return webob.exc.HTTPBadRequest(
+            explanation='%s is longer than %d characters' %
+                        (HEADER, MAX_KEY_LEN))
+    tenant_id = request.context.tenant_id or ''
+    request_hash = _request_hash(request)
+    now = datetime.datetime.now()
+    record = plugin.claim_idempotency_key(
+        n_context.get_admin_context(), key, tenant_id, request_hash, now,
+        now + datetime.timedelta(seconds=CONF.idempotency.in_progress_timeout))
+    if record is not None:
+        return _answer_retry(plugin, request, key, tenant_id, request_hash,
+                             record)
+
+    try:
+        try:
+            response = handler()
+        except webob.exc.HTTPException as ex:
+            response = ex
+    except Exception:
+        plugin.delete_idempotency_key(n_context.get_admin_context(), key,
+                                      tenant_id)
+        raise
+    if response.status_int >= 500:
+        plugin.delete_idempotency_key(n_context.get_admin_context(), key,
+                                      tenant_id)
+        return response
+    plugin.complete_idempotency_key(
+        n_context.get_admin_context(), key, tenant_id,
+        response.status_int, response.body,
+        response.headers.get('Content-Type'),
+        datetime.datetime.now() + datetime.timedelta(
+            seconds=CONF.idempotency.ttl))
+    return response
+
+
+def _answer_retry(plugin, request, key, tenant_id, request_hash, record):
+    if record.request_hash != request_hash:
+        return webob.exc.HTTPUnprocessableEntity(
+            explanation='%s %s was used for another request' %
+                        (HEADER, key))
+    deadline = time.time() + CONF.idempotency.wait_timeout
+    while record.status != netforce_constants.IDEMPOTENCY_COMPLETED:
+        if time.time() >= deadline:
+            return webob.exc.HTTPConflict(
+                explanation='The request with %s %s is still in progress' %
+                            (HEADER, key))
+        eventlet.sleep(CONF.idempotency.poll_interval)
+        record = plugin.get_idempotency_key(n_context.get_admin_context(),
+                                            key, tenant_id)
+        if record is None:
+            # the original failed and gave its key up; the client sends
+            # the request again rather than each waiting retry running it.
+            return webob.exc.HTTPConflict(
+                explanation='The request with %s %s failed, retry it' %
+                            (HEADER, key))
+    LOG.info('Replaying the response to the request with %s %s',
+             HEADER, key)
+    return _replay(request, record)
@@ -0,0 +1,129 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import atexit
+
+import eventlet
+from eventlet import queue
+from oslo_config import cfg
+from oslo_log import log as logging
+
+from netforce.common import netforce_exceptions as netforce_exc
+
+LOG = logging.getLogger(__name__)
+
+CONF = cfg.CONF
+async_jobs_conf = [
+    cfg.BoolOpt('enabled', default=False,
+                help='run port updates, vlan and subnet creation as '
+                     'background jobs when the request asks for it with '
+                     'the async query parameter or a Prefer: '
+                     'respond-async header'),
+    cfg.IntOpt('workers', default=8,
+               help='number of jobs that run at the same time in an API '
+                    'process'),
+    cfg.IntOpt('queue_size', default=256,
+               help='number of accepted jobs that can wait for a worker, '
+                    'further jobs are refused until the queue drains'),
+    cfg.IntOpt('running_timeout', default=3600,
+               help='seconds after which a RUNNING job is taken for one '
+                    'whose API process stopped, and failed when an API '
+                    'process starts'),
+]
+CONF.register_opts(async_jobs_conf, group='async_jobs')
+
+_STOP = object()
+
+
+class JobManager(object):
+    """Runs queued calls on a fixed number of green threads.
+
+    The queue is bounded so that a burst of requests is refused with
+    JobQueueFull instead of piling up in memory. Calls still queued when
+    the manager is stopped are not run; their jobs stay PENDING and are
+    queued again by the recovery of the next API process to start.
+    """
+
+    def __init__(self, workers, queue_size):
+        self._workers = workers
+        self._queue = queue.Queue(queue_size)
+        self._threads = []
+
+    def start(self):
+        if not self._threads:
+            self._threads = [eventlet.spawn(self._run)
+                             for _ in range(self._workers)]
+
+    def stop(self):
+        """Drops the queued calls and waits for the running ones."""
+        threads, self._threads = self._threads, []
+        dropped = 0
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+            dropped += 1
+        if dropped:
+            LOG.info('Left %d queued jobs for recovery', dropped)
+        for _ in threads:
+            self._queue.put(_STOP)
+        for thread in threads:
+            thread.wait()
+
+    def join(self):
+        """Waits until every queued call has run."""
+        self._queue.join()
+
+    def submit(self, func, *args, **kwargs):
+        self.start()
+        try:
+            self._queue.put_nowait((func, args, kwargs))
+        except queue.Full:
+            raise netforce_exc.JobQueueFull(count=self._queue.qsize())
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            func, args, kwargs = item
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                LOG.exception('Job %s raised an unhandled error', func)
+            finally:
+                self._queue.task_done()
+
+
+_job_manager = None
+
+
+def get_job_manager():
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager(CONF.async_jobs.workers,
+                                  CONF.async_jobs.queue_size)
+        atexit.register(_job_manager.stop)
+    return _job_manager
+
+
+def start_recovery(plugin):
+    """Fails the stale RUNNING jobs and queues the PENDING ones again."""
+    if CONF.async_jobs.enabled:
+        eventlet.spawn(plugin.recover_jobs)
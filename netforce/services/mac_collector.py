@@ -0,0 +1,68 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+from oslo_config import cfg
+
+from netforce.common import periodic
+
+COLLECT_LOCK = 'netforce-mac-collection'
+
+CONF = cfg.CONF
+mac_index_conf = [
+    cfg.IntOpt('interval', default=0,
+               help='seconds between the collections of the mac tables of '
+                    'all the devices into the mac index, 0 disables them'),
+    cfg.IntOpt('concurrency', default=32,
+               help='number of devices whose mac table is read at the same '
+                    'time'),
+    cfg.IntOpt('device_timeout', default=60,
+               help='seconds after which reading the mac table of a device '
+                    'is given up'),
+    cfg.IntOpt('max_age', default=900,
+               help='seconds for which a mac address in the index is '
+                    'trusted when validating the server of a port, older '
+                    'entries are checked on the device. 0 always checks on '
+                    'the device'),
+]
+CONF.register_opts(mac_index_conf, group='mac_index')
+
+
+class MacCollector(periodic.Collector):
+    """Reads the mac tables of all the devices into the mac index.
+
+    Devices are read concurrently, each within a timeout; a device that
+    can not be read keeps its previous entries, which age out of use by
+    their last_seen time.
+    """
+
+    name = 'Mac collection'
+    lock_name = COLLECT_LOCK
+    item_desc = 'the mac table of device %s'
+    summary = ('Indexed %(total)d mac addresses of %(count)d devices, '
+               '%(failed)d could not be read')
+
+    def _get_item_ids(self, context):
+        return self._plugin.get_device_ids(context)
+
+    def _collect_item(self, context, device_id):
+        return self._plugin.collect_device_macs(context, device_id)
+
+
+def start_periodic(plugin):
+    """Collects the mac tables every interval seconds in the background."""
+    conf = CONF.mac_index
+    collector = MacCollector(plugin, conf.concurrency, conf.device_timeout)
+    return collector.start(conf.interval)
@@ -15,6 +15,10 @@
 #    limitations under the License.
 
 
+import collections
+import contextlib
+import datetime
+import eventlet
 import ipaddr
 from napalm_base import get_network_driver
 from napalm_baseebay import ebay_exceptions
@@ -22,11 +26,21 @@ import netaddr
 
 from netforce.api.v2 import attributes
 from netforce.api_client import exceptions as ticket_exceptions
-from netforce.api_client import ticket_api_client
+from netforce.common import local
+from netforce.common import lockutils
 from netforce.common import netforce_exceptions as netforce_exc
+from netforce.common import route_table
+from netforce.common import subnet_allocator
+from netforce.common import vlan_bitmap
 from netforce.db import netforce_db
 from netforce.plugins.common import netforce_constants
+from netforce.services import device_queue
+from netforce.services import job_manager
+from netforce.services import mac_collector
 from netforce.services.netforce_view import NetForceViewMixin
+from netforce.services import reconciliation
+from netforce.services import route_collector
+from netforce.services import ticket_outbox
 from netforce.services.ticket_workflow import PortEnableticketWorkflow
 from netforce.services.ticket_workflow import PortFlipticketWorkflow
 from netforce.services.ticket_workflow import SubnetticketWorkflow
@@ -34,12 +48,13 @@ from netforce.services.transaction_manager import transaction
 
 from neutron.api.v2 import base
 from neutron.common import exceptions
+from neutron import context as n_context
 from neutron.plugins.common import constants
 
 import os
 from oslo_config import cfg
-from oslo_db import api as oslo_db_api
 from oslo_log import log as logging
+from oslo_serialization import jsonutils
 import random
 import subprocess
 import webob
@@ -50,6 +65,15 @@ LOG = logging.getLogger(__name__)
 LOW_LIMIT_VLAN_TAG = 2
 UPPER_LIMIT_VLAN_TAG = 100
 
+# routes that overlap any subnet, e.g. the default route, and are not
+# taken as the subnet being configured on the bubble.
+IGNORED_OVERLAP_ROUTES = ('0.0.0.0/0', '10.0.0.0/8')
+
+DEVICE_LOCK_PREFIX = 'netforce-device-'
+PORT_LOCK_PREFIX = 'netforce-port-'
+VLAN_ALLOCATION_LOCK_PREFIX = 'netforce-vlan-allocation-'
+SUBNET_ALLOCATION_LOCK = 'netforce-subnet-allocation'
+
 CONF = cfg.CONF
 plugin_conf = [
             cfg.BoolOpt('account_in_privileged_mode',
@@ -61,7 +85,23 @@ plugin_conf = [
                         help='whether to enable vlan operations support.'),
             cfg.BoolOpt('enable_subnet',
                         default=True,
-                        help='whether to enable subnet operations support.')
+                        help='whether to enable subnet operations support.'),
+            cfg.IntOpt('bulk_update_max_devices',
+                       default=8,
+                       help='number of devices a bulk port update changes '
+                            'in parallel.'),
+            cfg.BoolOpt('discover_ports_on_create',
+                        default=False,
+                        help='record the ports found on a device when the '
+                             'device is created.'),
+            cfg.IntOpt('discover_ports_max_devices',
+                       default=16,
+                       help='number of devices whose ports a bulk device '
+                            'creation discovers in parallel.'),
+            cfg.IntOpt('bulk_create_max_devices',
+                       default=100,
+                       help='number of devices a bulk device creation can '
+                            'create at most.')
         ]
 CONF.register_opts(plugin_conf)
 
@@ -79,7 +119,12 @@ subnet_conf = [
             cfg.ListOpt('allowed_vpcs',
                        default=['fake-vpc1'],
                        help='List of vpcs for which ticketroute should be'
-                            ' enabled.')
+                            ' enabled.'),
+            cfg.IntOpt('subnet_reservation_ttl',
+                       default=600,
+                       help='seconds for which a block handed out by the'
+                            ' subnet allocator is kept from other'
+                            ' allocations and creations.')
         ]
 CONF.register_opts(subnet_conf)
 
@@ -104,12 +149,13 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
         self.netforce_model = super(NetForcePlugin, self)
         self._extend_fault_map()
         self.username, self.password = self._get_credentials()
+        for service in (reconciliation, mac_collector, route_collector,
+                        ticket_outbox):
+            service.start_periodic(self)
+        job_manager.start_recovery(self)
 
     def _get_ticket_client(self):
-        ticket_client = ticket_api_client.ticketApiClient(
-            cfg.CONF.ticket_service_url, cfg.CONF.ticket_api_user,
-            cfg.CONF.ticket_api_password, cfg.CONF.ticket_plan_start_time_zone)
-        return ticket_client
+        return self.get_ticket_client()
 
     def _extend_fault_map(self):
         """Extend the Fault Map for Netforce exceptions.
@@ -154,8 +200,17 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
             }
         # in any case send config_lock as False
         opt_args['config_lock'] = False
-        return driver(management_ip, device_user, device_pass,
-                      optional_args=opt_args)
+        # within a batch of queued port changes the device connection is
+        # shared by all the changes.
+        sessions = getattr(local.strong_store, 'device_sessions', None)
+        if sessions is None:
+            return driver(management_ip, device_user, device_pass,
+                          optional_args=opt_args)
+        if management_ip not in sessions:
+            sessions[management_ip] = device_queue.DeviceSession(
+                driver(management_ip, device_user, device_pass,
+                       optional_args=opt_args))
+        return sessions[management_ip]
 
     def _validate_vlan_tag(self, tag):
         validate_non_negative = attributes._validate_non_negative(tag)
@@ -239,7 +294,6 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
                                                 device_db.password,
                                                 device_db.os_type)
 
-        port_names_in_db = dict((p.name, p.id) for p in device_db.ports)
         interfaces = {}
         try:
             device_driver.open()
@@ -250,31 +304,29 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
         finally:
             device_driver.close()
 
-        for iif_name in interfaces:
-            is_enabled = interfaces[iif_name]['is_enabled']
-            if iif_name in port_names_in_db.keys():
-                port = {
-                    'admin_status': constants.ACTIVE if is_enabled else
-                    netforce_constants.SUSPENDED,
-                }
-                port['status'] = constants.ACTIVE
-                port['status_description'] = \
-                    netforce_constants.ACTIVE_STATUS_DESCRIPTION
-                self.netforce_model.update_port(context,
-                                                port_names_in_db[iif_name],
-                                                port)
-            else:
-                port = {
-                    'name': iif_name,
-                    'description': 'port for %s' % (iif_name),
-                    'admin_status': constants.ACTIVE if is_enabled else
-                    netforce_constants.SUSPENDED,
-                    'switch_port_mode': netforce_constants.ACCESS_MODE,
-                    'device_id': device_db.id,
-                    'tenant_id': device_db.tenant_id
-                }
-                port_db = self.netforce_model.create_port(context, port)
-                device_db.ports.append(port_db)
+        admin_states = dict(
+            (iif_name, constants.ACTIVE if iif['is_enabled'] else
+             netforce_constants.SUSPENDED)
+            for iif_name, iif in interfaces.iteritems())
+        added, updated = self.netforce_model.upsert_device_ports(
+            context, device_db, admin_states)
+        LOG.info('Discovered %(count)d ports on device %(device)s, '
+                 '%(added)d added and %(updated)d updated',
+                 {'count': len(admin_states), 'device': device_db.name,
+                  'added': added, 'updated': updated})
+        return added, updated
+
+    def discover_device_ports(self, context, device_id):
+        """Refreshes the ports of a device from the device.
+
+        Safe to run again at any time, only new ports and changed admin
+        states are written.
+        """
+        with lockutils.lock_all([DEVICE_LOCK_PREFIX + device_id]):
+            device_db = self.netforce_model.get_device_db(context, device_id)
+            added, updated = self._discover_ports_on_device(context,
+                                                            device_db)
+        return {'added': added, 'updated': updated}
 
     # CRUD on devices.
     def create_device(self, context, device, **kwargs):
@@ -287,14 +339,80 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
 
         with context.session.begin(subtransactions=True):
             device_db = self.netforce_model.create_device(context, device)
-            # We do not need to discover ports on the device.
-            # In future, we can get the port details from the
-            # device and compare the ones from CMS when doing create port.
-            # It's not a problem for now.
-            #self._discover_ports_on_device(context, device_db)
+
+        # the device is kept when its discovery fails, the discover_ports
+        # action can be run again once the device is reachable.
+        if kwargs.get('discover_ports', CONF.discover_ports_on_create):
+            self.discover_device_ports(context, device_db.id)
 
         return self.netforce_model.get_device(context, device_db.id)
 
+    def create_devices(self, context, devices, **kwargs):
+        """Onboards many devices at once and returns a result per device.
+
+        devices is a list of {'device': {...}}. The device types and
+        bubbles of all the devices are looked up with one query each and
+        the devices are added in one transaction, so either all or none of
+        them are created. Their ports are then discovered, when asked for,
+        on up to discover_ports_max_devices devices at the same time; a
+        device whose discovery fails is reported as failed but kept. At
+        most bulk_create_max_devices devices are taken in one request.
+        """
+        if len(devices) > CONF.bulk_create_max_devices:
+            msg = ('At most %d devices can be created in one request' %
+                   CONF.bulk_create_max_devices)
+            raise exceptions.BadRequest(resource='device', msg=msg)
+        devices = [dict(device['device']) for device in devices]
+        type_ids = self.netforce_model.get_devicetype_ids_by_type(
+            context, set(device['type'] for device in devices))
+        bubble_ids = set(device['bubble_id'] for device in devices
+                         if device.get('bubble_id'))
+        if bubble_ids:
+            self.netforce_model.check_bubbles_exist(context, bubble_ids)
+        for device in devices:
+            device['device_type_id'] = type_ids[device.pop('type')]
+        with context.session.begin(subtransactions=True):
+            device_ids = [device_db.id for device_db in
+                          self.netforce_model.create_devices(context,
+                                                             devices)]
+
+        if not kwargs.get('discover_ports', CONF.discover_ports_on_create):
+            created = dict((device['id'], device) for device in
+                           self.netforce_model.get_devices(
+                               context, filters={'id': device_ids}))
+            return [self._make_bulk_device_result(created[device_id])
+                    for device_id in device_ids]
+        pool = eventlet.GreenPool(CONF.discover_ports_max_devices)
+        return list(pool.imap(self._discover_new_device_ports,
+                              [context] * len(device_ids), device_ids))
+
+    def _discover_new_device_ports(self, context, device_id):
+        # the devices are discovered in parallel, each needs its own session.
+        device_context = n_context.Context.from_dict(context.to_dict())
+        try:
+            device_db = self.netforce_model.get_device_db(device_context,
+                                                          device_id)
+            with device_context.session.begin(subtransactions=True):
+                self._discover_ports_on_device(device_context, device_db)
+        except Exception as ex:
+            LOG.exception('Discovering ports of device %s failed', device_id)
+            return self._make_bulk_device_result(
+                self.netforce_model.get_device(device_context, device_id),
+                error=ex)
+        return self._make_bulk_device_result(
+            self.netforce_model.get_device(device_context, device_id))
+
+    def _make_bulk_device_result(self, device, error=None):
+        if error is None:
+            return {'id': device['id'],
+                    'status': netforce_constants.JOB_COMPLETED,
+                    'device': device}
+        return {'id': device['id'],
+                'status': netforce_constants.JOB_FAILED,
+                'device': device,
+                'error': unicode(error),
+                'error_type': error.__class__.__name__}
+
     # CRUD on device_types
     def create_devicetype(self, context, devicetype, **kwargs):
         devicetype = devicetype['devicetype']
@@ -377,19 +495,16 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
             device_driver.close()
         return ticket_num
 
-    @oslo_db_api.wrap_db_retry(retry_on_deadlock=True)
     def _rollback_vlanport_db(self, context, port_id, port):
         # If there is exception, rollback the db change
         vlans = None
         if 'vlans' in port['current_port_data']:
             vlans = port['current_port_data'].pop('vlans', None)
+        bindings = [(vlan['vlan']['id'], vlan['vlan']['is_native_vlan'])
+                    for vlan in vlans or []]
         with context.session.begin(subtransactions=True):
-            self.delete_vlanportbinding(context, port_id)
-            if vlans:
-                for vlan in vlans:
-                    self.netforce_model.create_vlanportassociation(
-                        context, vlan['vlan']['id'],
-                        port_id, vlan['vlan']['is_native_vlan'])
+            self.netforce_model.replace_vlanportassociations(
+                context, port_id, bindings)
             self.netforce_model.update_port(context, port_id,
                                             port['current_port_data'])
 
@@ -416,9 +531,7 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
         # It is possible that within the same vlan payload, one can pass tags
         # id, vpc_name too. However, if tag is there we just use it.
         vlans = port['vlans']
-
-        # flush old association
-        self.delete_vlanportbinding(context, port_id)
+        bindings = []
 
         for vlan in vlans:
             vlan_data = vlan['vlan']
@@ -465,9 +578,13 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
                 vlan_id = vlan_db['id']
             else:
                 raise exceptions.NotFound(tag=vlan_db)
-            # create vlan and port association
-            self.netforce_model.create_vlanportassociation(context, vlan_id,
-                                                           port_id, is_native)
+            bindings.append((vlan_id, is_native))
+
+        # replace the old associations in one go.
+        deleted_vlan_binding = self.netforce_model.\
+            replace_vlanportassociations(context, port_id, bindings)
+        LOG.debug("Replaced %s vlan bindings for the port with %s" %
+                  (deleted_vlan_binding, len(bindings)))
 
     def _enable_disable_port(self, context, port_id, set_availability):
 
@@ -530,8 +647,229 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
             device_driver.close()
         return ticket_num
 
-    @oslo_db_api.wrap_db_retry(retry_on_deadlock=True)
+    def _get_port_lock_names(self, context, port_id):
+        device_id = self.netforce_model.get_port_device_id(context, port_id)
+        return [DEVICE_LOCK_PREFIX + device_id, PORT_LOCK_PREFIX + port_id]
+
     def update_port(self, context, port_id, port, **kwargs):
+        if CONF.device_queue.enabled:
+            device_id = self.netforce_model.get_port_device_id(context,
+                                                               port_id)
+            return device_queue.get_device_queue().submit(
+                device_id, context, port_id, port['port'], kwargs,
+                self._run_port_changes)
+        # Changes are serialized per device and per port rather than retried
+        # on deadlock, since a retry re-runs the device work as well. The
+        # locks are taken before the port is read so the read is current.
+        with lockutils.lock_all(self._get_port_lock_names(context, port_id)):
+            return self._update_port(context, port_id, port, **kwargs)
+
+    def update_ports(self, context, updates, **kwargs):
+        """Updates many ports at once and returns a result per port.
+
+        updates is a list of (port_id, {'port': {...}}). All the ports are
+        looked up and their payloads checked first; a port failing the
+        checks gets an error result without stopping the others. The
+        changes are then grouped by device and each device's changes run
+        as one batch, under its locks and over one device connection, with
+        up to bulk_update_max_devices devices changed at the same time.
+        """
+        results = collections.OrderedDict()
+        device_updates = collections.OrderedDict()
+        with context.session.begin(subtransactions=True):
+            device_ids = self.netforce_model.get_port_device_ids(
+                context, [port_id for port_id, _ in updates])
+        for port_id, port in updates:
+            port = port['port']
+            try:
+                if port_id in results:
+                    raise exceptions.BadRequest(
+                        resource='port',
+                        msg='port %s is listed more than once' % port_id)
+                if port_id not in device_ids:
+                    raise exceptions.PortNotFound(port_id=port_id)
+                message = self._validate_vlans(port)
+                if message:
+                    raise exceptions.BadRequest(resource='port', msg=message)
+                if port.get('vlans') and 'admin_status' in port:
+                    raise netforce_exc.\
+                        PortFlipAndPortEnableDisableNotSupportedAtSameTime(
+                            operation="Flip Vlan and enable/disable port ")
+            except exceptions.NeutronException as ex:
+                results.setdefault(port_id,
+                                   self._make_bulk_port_result(port_id,
+                                                               error=ex))
+                continue
+            results[port_id] = None
+            device_updates.setdefault(device_ids[port_id], []).append(
+                (port_id, port))
+
+        pool = eventlet.GreenPool(CONF.bulk_update_max_devices)
+        threads = [pool.spawn(self._run_bulk_port_changes, context,
+                              device_id, device_port_updates, kwargs)
+                   for device_id, device_port_updates in
+                   device_updates.items()]
+        for thread in threads:
+            for change in thread.wait():
+                try:
+                    results[change.port_id] = self._make_bulk_port_result(
+                        change.port_id, port=change.done.wait())
+                except Exception as ex:
+                    results[change.port_id] = self._make_bulk_port_result(
+                        change.port_id, error=ex)
+        return list(results.values())
+
+    def _run_bulk_port_changes(self, context, device_id, updates, kwargs):
+        # the devices are changed in parallel, each needs its own session.
+        device_context = n_context.Context.from_dict(context.to_dict())
+        changes = [device_queue.PendingChange(device_context, port_id, port,
+                                              kwargs)
+                   for port_id, port in updates]
+        try:
+            self._run_port_changes(device_id, changes)
+        except Exception as ex:
+            LOG.exception('Bulk port update of device %s failed', device_id)
+            for change in changes:
+                if not change.done.ready():
+                    change.done.send_exception(ex)
+        finally:
+            lockutils.stop_coordinator()
+        return changes
+
+    def _make_bulk_port_result(self, port_id, port=None, error=None):
+        if error is None:
+            return {'id': port_id,
+                    'status': netforce_constants.JOB_COMPLETED,
+                    'port': port}
+        return {'id': port_id,
+                'status': netforce_constants.JOB_FAILED,
+                'error': unicode(error),
+                'error_type': error.__class__.__name__}
+
+    def _run_port_changes(self, device_id, changes):
+        """Runs a batch of queued port changes of one device.
+
+        The device and port locks are held for the whole batch and the
+        changes share one connection to the device, which is reopened after
+        a change fails in case the failure left it unusable.
+        """
+        names = [DEVICE_LOCK_PREFIX + device_id]
+        names.extend(PORT_LOCK_PREFIX + c.port_id for c in changes)
+        sessions = {}
+        local.strong_store.device_sessions = sessions
+        try:
+            with lockutils.lock_all(names):
+                for change in changes:
+                    try:
+                        result = self._update_port(
+                            change.context, change.port_id,
+                            {'port': dict(change.body)}, **change.kwargs)
+                    except Exception as ex:
+                        change.done.send_exception(ex)
+                        for session in sessions.values():
+                            session.release()
+                    else:
+                        change.done.send(result)
+        finally:
+            del local.strong_store.device_sessions
+            for session in sessions.values():
+                session.release()
+
+    def submit_job(self, context, resource, action, body, resource_id=None,
+                   **kwargs):
+        """Records a create or update request as a job and queues it.
+
+        The request body has already been validated by the caller. The job
+        runs the same plugin method a synchronous request would, with its
+        own context and DB session, and the outcome is stored on the job.
+        The request is stored with the job so that the job can be queued
+        again if the API process stops before running it.
+        """
+        job_context = n_context.Context.from_dict(context.to_dict())
+        request = {'body': body, 'params': kwargs,
+                   'context': self._get_job_context_dict(context)}
+        job_db = self.netforce_model.create_job(context, {
+            'tenant_id': context.tenant_id,
+            'resource': resource,
+            'action': action,
+            'resource_id': resource_id,
+            'request': jsonutils.dumps(request),
+            'status_description': 'Queued'})
+        try:
+            self._queue_job(job_context, job_db, body, kwargs)
+        except netforce_exc.JobQueueFull as ex:
+            self.netforce_model.update_job(context, job_db.id, {
+                'status': netforce_constants.JOB_FAILED,
+                'status_description': ex.__class__.__name__,
+                'error': unicode(ex)})
+            raise
+        return self.make_job_dict(job_db)
+
+    def _get_job_context_dict(self, context):
+        # the token expires long before a recovered job runs, leave it out.
+        return dict((k, v) for k, v in context.to_dict().items()
+                    if k not in ('auth_token', 'timestamp'))
+
+    def _queue_job(self, context, job_db, body, params):
+        handler = getattr(self, '%s_%s' % (job_db.action, job_db.resource))
+        args = (job_db.resource_id,) if job_db.resource_id else ()
+        kwargs = dict(params)
+        kwargs[job_db.resource] = body
+        job_manager.get_job_manager().submit(
+            self._run_job, context, job_db.id, handler, args, kwargs)
+
+    def recover_jobs(self):
+        """Fails the stale RUNNING jobs and queues the PENDING ones again.
+
+        Run when an API process starts. A job is RUNNING for longer than
+        [async_jobs] running_timeout only when the process that ran it
+        stopped, and a PENDING job may have been queued in a process that
+        stopped; one that is still queued elsewhere is run only once, by
+        whichever process claims it first.
+        """
+        admin_context = n_context.get_admin_context()
+        before = datetime.datetime.now() - datetime.timedelta(
+            seconds=CONF.async_jobs.running_timeout)
+        failed = self.netforce_model.fail_stale_jobs(admin_context, before, {
+            'status_description': 'Interrupted',
+            'error': 'The API process running the job stopped'})
+        if failed:
+            LOG.warning('Failed %d jobs left RUNNING by a stopped API '
+                        'process', failed)
+        for job_db in self.netforce_model.get_pending_jobs(admin_context):
+            request = jsonutils.loads(job_db.request)
+            job_context = n_context.Context.from_dict(request['context'])
+            try:
+                self._queue_job(job_context, job_db, request['body'],
+                                request['params'])
+            except netforce_exc.JobQueueFull:
+                LOG.warning('Job queue is full, the remaining PENDING jobs '
+                            'are left for the next recovery')
+                return
+
+    def _run_job(self, context, job_id, handler, args, kwargs):
+        # job bookkeeping uses its own session, the one of the job context
+        # may be unusable after a failure.
+        admin_context = n_context.get_admin_context()
+        if not self.netforce_model.claim_job(admin_context, job_id):
+            LOG.debug('Job %s was run by another worker', job_id)
+            return
+        try:
+            result = handler(context, *args, **kwargs)
+        except Exception as ex:
+            LOG.exception('Job %s failed', job_id)
+            self.netforce_model.update_job(admin_context, job_id, {
+                'status': netforce_constants.JOB_FAILED,
+                'status_description': ex.__class__.__name__,
+                'error': unicode(ex)})
+            return
+        self.netforce_model.update_job(admin_context, job_id, {
+            'status': netforce_constants.JOB_COMPLETED,
+            'status_description': netforce_constants.
+            ACTIVE_STATUS_DESCRIPTION,
+            'result': jsonutils.dumps(result)})
+
+    def _update_port(self, context, port_id, port, **kwargs):
 
         port = port['port']
         ma1 = port.pop('mac_address', None)
@@ -561,6 +899,9 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
         old_admin_status = current_port_db.admin_status
 
         def _check_mac(mac, interface_name, native_vlan=None):
+            if self._is_mac_indexed_on_port(context, port_id, mac,
+                                            native_vlan):
+                return
             try:
                 device_driver.open()
                 macs = device_driver.get_mac_addresses_on_interface(
@@ -658,6 +999,169 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
             port_dict['ticket'] = ticket_num
         return port_dict
 
+    def _normalize_mac(self, mac):
+        # the devices and the users write macs in different formats, the
+        # index keeps them as aa:bb:cc:dd:ee:ff.
+        try:
+            return str(netaddr.EUI(mac, dialect=netaddr.mac_unix_expanded))
+        except (netaddr.AddrFormatError, TypeError):
+            return None
+
+    def _is_mac_indexed_on_port(self, context, port_id, mac, vlan=None):
+        # a mac recently collected from the device saves reading its mac
+        # table; one that is not in the index is still checked on the
+        # device as it could have been learned since.
+        if CONF.mac_index.max_age <= 0:
+            return False
+        seen_since = datetime.datetime.now() - datetime.timedelta(
+            seconds=CONF.mac_index.max_age)
+        macs = self.netforce_model.get_port_macs(context, port_id,
+                                                 seen_since)
+        mac = self._normalize_mac(mac)
+        if not mac:
+            return False
+        return any(indexed_mac == mac and (not vlan or indexed_vlan == vlan)
+                   for indexed_mac, indexed_vlan in macs)
+
+    def collect_device_macs(self, context, device_id):
+        """Reads the mac table of a device into the mac index.
+
+        Only the mac addresses learned on the ports netforce knows of are
+        kept. Returns the number of indexed mac addresses.
+        """
+        device_db = self.netforce_model.get_device_db(context, device_id)
+        port_ids = dict((port_db.name, port_db.id)
+                        for port_db in device_db.ports)
+        device_driver = self._get_device_driver(device_db.management_ip,
+                                                device_db.username,
+                                                device_db.password,
+                                                device_db.os_type)
+        seen_at = datetime.datetime.now()
+        try:
+            device_driver.open()
+            mac_table = device_driver.get_mac_address_table()
+        except Exception as ex:
+            raise netforce_exc.DeviceError(device_error=ex.message)
+        finally:
+            device_driver.close()
+
+        entries = []
+        for entry in mac_table or []:
+            mac = self._normalize_mac(entry['mac_address'])
+            if mac and entry['interface'] in port_ids:
+                entries.append((mac, port_ids[entry['interface']],
+                                int(entry['vlan'])))
+        return self.netforce_model.replace_device_macs(context, device_id,
+                                                       entries, seen_at)
+
+    def find_mac_address(self, context, mac):
+        """Returns the ports a mac address was last seen on."""
+        normalized_mac = self._normalize_mac(mac)
+        if not normalized_mac:
+            raise exceptions.InvalidInput(
+                error_message='%s is not a valid mac address' % mac)
+        return self.netforce_model.find_mac(context, normalized_mac)
+
+    def collect_bubble_routes(self, context, bubble_id):
+        """Reads the routes of the vrfs of a bubble into route snapshots.
+
+        The routes are read on the first bubble device that can be read,
+        and a snapshot is only added for the vrfs whose routes changed.
+        Returns the number of routes read.
+        """
+        device_type_db = self.netforce_model.get_devicetype_by_type(
+            context, netforce_constants.SWITCH_TYPE_DISTRIBUTION)
+        bubble_device_db_list = self.netforce_model.\
+            get_devices_by_type_and_bubble_id(context, device_type_db['id'],
+                                              bubble_id)
+        if not bubble_device_db_list:
+            raise netforce_exc.NoBubbleDevicesConfigured()
+        vrfs = self.netforce_model.get_vrfs(
+            context, filters={'bubble_id': [bubble_id]}, fields=['name'])
+        vrf_names = [None] + [vrf['name'] for vrf in vrfs]
+
+        collected_at = datetime.datetime.now()
+        bubble_device, routes = self._read_bubble_routes(
+            bubble_device_db_list, vrf_names)
+        count = 0
+        for vrf_name in vrf_names:
+            table = route_table.RouteTable.from_cidrs(routes[vrf_name])
+            previous = self.netforce_model.get_latest_route_snapshot(
+                context, bubble_id, vrf_name)
+            if previous and previous.content_hash != table.content_hash:
+                added, removed = table.diff(
+                    route_table.RouteTable.from_bytes(previous.blob.routes))
+                LOG.info('Routes of vrf %s in bubble %s changed since %s, '
+                         'added %s, removed %s' %
+                         (vrf_name or 'default', bubble_id,
+                          previous.collected_at, added, removed))
+            self.netforce_model.save_route_snapshot(
+                context, bubble_id, vrf_name, bubble_device.id,
+                table.content_hash, table.to_bytes(), len(table),
+                collected_at)
+            count += len(table)
+        return count
+
+    def _read_bubble_routes(self, bubble_device_db_list, vrf_names):
+        # any bubble device has the routes of the bubble, the next one is
+        # tried when a device can not be read.
+        error = None
+        for bubble_device in bubble_device_db_list:
+            device_driver = self._get_device_driver(
+                bubble_device.management_ip, bubble_device.username,
+                bubble_device.password, bubble_device.os_type)
+            try:
+                device_driver.open()
+                return bubble_device, dict(
+                    (vrf_name, device_driver.get_routes(vrf_name))
+                    for vrf_name in vrf_names)
+            except Exception as ex:
+                LOG.warning('Reading the routes on bubble device %s failed:'
+                            ' %s' % (bubble_device.management_ip, ex))
+                error = ex
+            finally:
+                device_driver.close()
+        raise netforce_exc.DeviceError(device_error=error.message)
+
+    def _get_recent_route_table(self, context, bubble_id, vrf_name):
+        # returns (snapshot, route table) when the routes of the vrf were
+        # collected within max_age, (None, None) otherwise.
+        if CONF.route_snapshots.max_age <= 0:
+            return None, None
+        snapshot = self.netforce_model.get_latest_route_snapshot(
+            context, bubble_id, vrf_name)
+        collected_since = datetime.datetime.now() - datetime.timedelta(
+            seconds=CONF.route_snapshots.max_age)
+        if not snapshot or snapshot.collected_at < collected_since:
+            return None, None
+        return snapshot, route_table.RouteTable.from_bytes(
+            snapshot.blob.routes)
+
+    def check_subnet_block(self, context, bubble_id, cidr, vrf_name=None):
+        """Tells whether a block is free in a vrf of a bubble.
+
+        Checked against the last route snapshot of the vrf, without
+        reading any device.
+        """
+        self._validate_cidr_format(cidr)
+        if netaddr.IPNetwork(cidr).version != 4:
+            raise exceptions.InvalidInput(
+                error_message='Route snapshots only have IPv4 routes')
+        snapshot = self.netforce_model.get_latest_route_snapshot(
+            context, bubble_id, vrf_name)
+        if not snapshot:
+            raise netforce_exc.RouteSnapshotNotFound(
+                bubble_id=bubble_id, vrf_name=vrf_name or 'default')
+        table = route_table.RouteTable.from_bytes(snapshot.blob.routes)
+        overlapping = [route for route in table.overlaps(cidr)
+                       if route not in IGNORED_OVERLAP_ROUTES]
+        return {'cidr': cidr,
+                'bubble_id': bubble_id,
+                'vrf_name': vrf_name,
+                'free': not overlapping,
+                'overlapping_routes': overlapping,
+                'collected_at': snapshot.collected_at}
+
     def _find_vlan_by_vpc_and_bg(self, context, vpc, bridge_group):
         vlans_on_bg = bridge_group.vlans
         for vlan in vlans_on_bg:
@@ -673,28 +1177,39 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
 
     def _check_duplicate_vlans_on_bridge_group(
             self, context, bridge_group, requested_vlan_dict):
-        vlans_on_bg = bridge_group.vlans
+        vlans_by_name = dict((vlan.name, vlan) for vlan in bridge_group.vlans)
+        vlans_by_tag = dict((vlan.tag, vlan) for vlan in bridge_group.vlans)
         bg_name = bridge_group.name
+        requested_tag = requested_vlan_dict.get('tag')
         # check if vlan exists for a bg and has same name and tag.
-        # If there is mismatch, return error.
-        for vlan in vlans_on_bg:
-            if vlan.name == requested_vlan_dict['name'] and \
-                            vlan.tag == requested_vlan_dict['tag']:
-                bg_name = bridge_group.name
+        # If there is mismatch, return error. A vlan requested without a
+        # tag is the one of the same name, whatever its tag.
+        vlan = vlans_by_name.get(requested_vlan_dict['name'])
+        if vlan:
+            if requested_tag is None or vlan.tag == requested_tag:
                 LOG.warn('Vlan %s is already configured for BG %s with tag %s'
                          % (vlan.name, bg_name, vlan.tag))
                 vlan_dict = self.netforce_model.get_vlan(context, vlan.id)
                 return vlan_dict
-            elif vlan.name == requested_vlan_dict['name'] and vlan.tag !=\
-                    requested_vlan_dict['tag']:
-                raise netforce_exc.ConfiguredVlanConflictsWithRequested(
-                    current=vlan.tag, requested=requested_vlan_dict['tag'],
-                    key=bg_name)
-            elif vlan.name != requested_vlan_dict['name'] and vlan.tag == \
-                    requested_vlan_dict['tag']:
-                raise netforce_exc.ConfiguredVlanConflictsWithRequested(
-                    current=vlan.name, requested=requested_vlan_dict['name'],
-                    key=bg_name)
+            raise netforce_exc.ConfiguredVlanConflictsWithRequested(
+                current=vlan.tag, requested=requested_tag, key=bg_name)
+        vlan = vlans_by_tag.get(requested_tag)
+        if vlan:
+            raise netforce_exc.ConfiguredVlanConflictsWithRequested(
+                current=vlan.name, requested=requested_vlan_dict['name'],
+                key=bg_name)
+
+    def _allocate_vlan_tag(self, bridge_group):
+        # the lowest tag of the range not used on the bridge group.
+        used_tags = vlan_bitmap.VlanBitmap(
+            vlan.tag for vlan in bridge_group.vlans)
+        tag = used_tags.first_free(LOW_LIMIT_VLAN_TAG, UPPER_LIMIT_VLAN_TAG)
+        if tag is None:
+            raise netforce_exc.NoFreeVlanTag(
+                low=LOW_LIMIT_VLAN_TAG, high=UPPER_LIMIT_VLAN_TAG,
+                bridge_group=bridge_group.name)
+        LOG.info('Allocated tag %s on BG %s' % (tag, bridge_group.name))
+        return tag
 
     def _check_vlan_mismatch(self, vlan_db, vlan_req):
         for k, v in vlan_db.iteritems():
@@ -722,18 +1237,24 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
             if not vpc_db:
                 raise netforce_exc.VPCNotConfigured(vpc=vpc_name)
 
-            vlan_dict = self._find_vlan_by_vpc_and_bg(
-                context, vpc_db, bridgegroup)
-
-        else:
-            vlan_dict = self._check_duplicate_vlans_on_bridge_group(
-                context, bridgegroup, requested_vlan_dict)
-        if vlan_dict:
-            return vlan_dict
-        # create vlans on each device associated to the bg
-        with context.session.begin(subtransactions=True):
-            vlan_db = self.netforce_model.create_vlan_by_bg_and_vpc(
-                context, vlan, bridgegroup, vpc_db)
+        # checking and allocating the tag under the lock of the bg keeps
+        # concurrent creations from picking the same tag.
+        with lockutils.lock(VLAN_ALLOCATION_LOCK_PREFIX + bridgegroup.id):
+            context.session.expire(bridgegroup, ['vlans'])
+            if vpc_db:
+                vlan_dict = self._find_vlan_by_vpc_and_bg(
+                    context, vpc_db, bridgegroup)
+            else:
+                vlan_dict = self._check_duplicate_vlans_on_bridge_group(
+                    context, bridgegroup, requested_vlan_dict)
+            if vlan_dict:
+                return vlan_dict
+            if vlan.get('tag') is None:
+                vlan['tag'] = self._allocate_vlan_tag(bridgegroup)
+            # create vlans on each device associated to the bg
+            with context.session.begin(subtransactions=True):
+                vlan_db = self.netforce_model.create_vlan_by_bg_and_vpc(
+                    context, vlan, bridgegroup, vpc_db)
         return self.make_vlan_dict(vlan_db)
 
     #TODO(kugandhi). To be implemented as part of a separate ticket
@@ -784,6 +1305,110 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
                     return s
         return None
 
+    def _get_overlapping_reservation(self, context, cidr,
+                                     reservation_id=None):
+        # only the reservation_id of the caller makes its block its own.
+        ipnetwork_a = netaddr.IPNetwork(cidr)
+        for reserved_id, reserved_cidr in \
+                self.netforce_model.get_subnet_reservations(
+                    context, datetime.datetime.now()):
+            ipnetwork_b = netaddr.IPNetwork(reserved_cidr)
+            if reserved_id == reservation_id and ipnetwork_a == ipnetwork_b:
+                continue
+            if ipnetwork_a.first <= ipnetwork_b.last and \
+                    ipnetwork_b.first <= ipnetwork_a.last:
+                return reserved_cidr
+        return None
+
+    @contextlib.contextmanager
+    def _hold_subnet_block(self, context, cidr, reservation_id,
+                           check_reservations=True):
+        """Holds the block of a subnet while the subnet is created.
+
+        The reservations are checked and the block held under the
+        allocation lock, so allocate_subnet can not hand out an overlapping
+        block meanwhile. The reservation of the block is only taken with
+        its reservation_id; without one the block is reserved for the time
+        of the creation and released if the creation fails. Nothing is
+        checked or held when check_reservations is off.
+        """
+        if not check_reservations:
+            yield
+            return
+        with lockutils.lock(SUBNET_ALLOCATION_LOCK):
+            now = datetime.datetime.now()
+            reserved_cidr = self._get_overlapping_reservation(
+                context, cidr, reservation_id)
+            if reserved_cidr:
+                raise netforce_exc.SubnetAlreadyReserved(
+                    cidr=cidr, reserved_cidr=reserved_cidr)
+            expires_at = now + datetime.timedelta(
+                seconds=CONF.subnet_reservation_ttl)
+            held = not self.netforce_model.extend_subnet_reservation(
+                context, reservation_id, cidr, now, expires_at)
+            if held:
+                self.netforce_model.reserve_subnet(context, cidr, None, None,
+                                                   now, expires_at)
+        created = False
+        try:
+            yield
+            created = True
+        finally:
+            if held and not created:
+                self.netforce_model.delete_subnet_reservation(
+                    n_context.get_admin_context(), cidr)
+
+    def allocate_subnet(self, context, allocation):
+        """Reserves the first free block of a prefix length for a subnet.
+
+        The block is under allowed_subnet and clear of the subnets, of the
+        other reservations and, when the bubble has a recent route
+        snapshot, of the routes of the bubble. It is reserved for
+        subnet_reservation_ttl seconds, until a subnet is created with it
+        and the id of the reservation as reservation_id.
+        """
+        try:
+            prefixlen = int(allocation['prefixlen'])
+        except (KeyError, TypeError, ValueError):
+            raise exceptions.InvalidInput(
+                error_message='prefixlen must be an integer')
+        bubble_id = allocation.get('bubble_id')
+        vpc_id = allocation.get('vpc_id')
+        allowed = cfg.CONF.allowed_subnet
+        allowed_network = netaddr.IPNetwork(allowed)
+
+        with lockutils.lock(SUBNET_ALLOCATION_LOCK):
+            now = datetime.datetime.now()
+            used = self.netforce_model.get_subnet_cidrs(context)
+            used += self.netforce_model.get_reserved_subnet_cidrs(context,
+                                                                  now)
+            allocator = subnet_allocator.SubnetAllocator(allowed, used)
+            if bubble_id:
+                vrf_name = None
+                if vpc_id:
+                    vrf_name = self._get_vrf_name(context, bubble_id, vpc_id)
+                _, table = self._get_recent_route_table(context, bubble_id,
+                                                        vrf_name)
+                for route in table or []:
+                    # aggregates covering all of allowed_subnet do not
+                    # make a block taken.
+                    if route not in IGNORED_OVERLAP_ROUTES and \
+                            allowed_network not in netaddr.IPNetwork(route):
+                        allocator.add(route)
+            try:
+                cidr = allocator.allocate(prefixlen)
+            except ValueError as ex:
+                raise exceptions.InvalidInput(error_message=str(ex))
+            if not cidr:
+                raise netforce_exc.NoFreeSubnet(prefixlen=prefixlen,
+                                                allowed=allowed)
+            expires_at = now + datetime.timedelta(
+                seconds=CONF.subnet_reservation_ttl)
+            reservation_db = self.netforce_model.reserve_subnet(
+                context, cidr, bubble_id, vpc_id, now, expires_at)
+        LOG.info('Reserved subnet %s until %s' % (cidr, expires_at))
+        return self.make_subnet_reservation_dict(reservation_db)
+
     def _validate_subnet_is_allowed(self, cidr):
         allowed = cfg.CONF.allowed_subnet
         IPNetwork = netaddr.IPNetwork
@@ -826,6 +1451,7 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
         patch_primary = kwargs.get('patch_primary_junos_subnets')
         one_subnet_only = kwargs.get('one_subnet_only')
         subnet = subnet['subnet']
+        reservation_id = subnet.pop('reservation_id', None)
         self._validate_cidr_format(subnet['cidr'])
         reserve_ip_count = CONF.reserve_ip_count
         if 'reserve_ip_count' in subnet:
@@ -862,10 +1488,14 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
                     vlan=subnet_db['vlan_id'],
                     id=subnet_db['id'])
 
-        with context.session.begin(subtransactions=True):
+        with self._hold_subnet_block(context, subnet['cidr'], reservation_id,
+                                     not patch_primary and not skip_device), \
+                context.session.begin(subtransactions=True):
 
             subnet_db = self.netforce_model.create_subnet(context,
                                                           subnet)
+            self.netforce_model.delete_subnet_reservation(context,
+                                                          subnet_db.cidr)
 
             subnet_dict = self.netforce_model.get_subnet(context,
                                                          subnet_db.id)
@@ -988,6 +1618,23 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
 
     def _validate_subnet_push(self, context, device, subnet_cidr,
                               validation_type, vlan):
+        # a recent route snapshot of the bubble saves reading its routes
+        # before the push; that the subnet reached the bubble after the
+        # push is always read on a bubble device.
+        if validation_type == netforce_constants.VALIDATION_TYPE_PRE and \
+                netaddr.IPNetwork(subnet_cidr).version == 4:
+            vrf_name = self._get_vrf_name(context, device.bubble_id,
+                                          vlan.vpc_id)
+            snapshot, table = self._get_recent_route_table(
+                context, device.bubble_id, vrf_name)
+            if snapshot and snapshot.device_id:
+                snapshot_device = self.netforce_model.get_device_db(
+                    context, snapshot.device_id)
+                self._check_cidr_overlap_on_bubble(
+                    subnet_cidr, table.overlaps(subnet_cidr),
+                    snapshot_device.management_ip, validation_type)
+                return
+
         device_type_db = self.netforce_model.get_devicetype_by_type(
             context, netforce_constants.SWITCH_TYPE_DISTRIBUTION)
 
@@ -1014,14 +1661,8 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
                                bubble_device.username,
                                bubble_device.password,
                                bubble_device.os_type)
-        # get the vrf_name
-        vrf_db = self.netforce_model.get_vrf_by_bubble_id_and_vpc_id(
-            context, bubble_device.bubble_id, vlan.vpc_id)
-        # TODO(aginwala): Make sure to have correct validation in case vrf is
-        # not onboarded in netforce even-though bubble has vrfs.
-        vrf_name = None
-        if vrf_db:
-            vrf_name = vrf_db[0]['name']
+        vrf_name = self._get_vrf_name(context, bubble_device.bubble_id,
+                                      vlan.vpc_id)
         # check bubble device for cidr.
         try:
             bubble_device_driver.open()
@@ -1036,6 +1677,15 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
                                            bubble_device.management_ip,
                                            validation_type)
 
+    def _get_vrf_name(self, context, bubble_id, vpc_id):
+        vrf_db = self.netforce_model.get_vrf_by_bubble_id_and_vpc_id(
+            context, bubble_id, vpc_id)
+        # TODO(aginwala): Make sure to have correct validation in case vrf is
+        # not onboarded in netforce even-though bubble has vrfs.
+        if vrf_db:
+            return vrf_db[0]['name']
+        return None
+
     def _validate_ticket_route(self, bubble_device_name_list, gw_ip,
                               subnet_cidr, validation_type, device_name):
         # Pre-validation for ticketroute should resolve to any of the bubble
@@ -1087,8 +1737,8 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
                 # The default route in Internet Protocol Version 4 (IPv4) is
                 # designated as the zero-address 0.0.0.0/0. Hence, We need to
                 # ignore it since it will always overlap with any subnet CIDR.
-                if cidr == '0.0.0.0/0' or not net1.overlaps(net2)\
-                        or cidr == '10.0.0.0/8':
+                if cidr in IGNORED_OVERLAP_ROUTES or \
+                        not net1.overlaps(net2):
                     continue
                 elif validation_type == \
                         netforce_constants.VALIDATION_TYPE_PRE:
@@ -1215,6 +1865,8 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
 
     def get_port(self, context, port_id, fields=None):
         # this method is used to check wiri data of port.
+        if not fields or 'check_device' not in fields:
+            return self.netforce_model.get_port(context, port_id, fields)
         current_port_db = self.netforce_model.get_port_db(context, port_id)
         port_dict = self.make_port_dict(current_port_db, fields=None)
 
@@ -1256,10 +1908,8 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
                 vlan_tags = port_vlan_data['trunk_vlans']
             if port_vlan_data.get('switch_port_mode', None):
                 device_switch_port_mode = port_vlan_data['switch_port_mode']
-            if not isinstance(vlan_tags, list):
-                vlan_tags = vlan_tags.split(',')
-            vlan_tags = self._parse_vlan_range(vlan_tags)
-            vlan_tags = sorted(vlan_tags)
+            # "2-4,10" or ['2-4', '10'] => [2, 3, 4, 10]
+            vlan_tags = list(vlan_bitmap.VlanBitmap.from_ranges(vlan_tags))
             device_port_vlan_dict = self._make_get_port_dict(
                 port_id, port_name, native_vlan, vlan_tags,
                 device_switch_port_mode, status, description,
@@ -1271,18 +1921,185 @@ class NetForcePlugin(netforce_db.NetforceDbMixin, NetForceViewMixin,
         # if wiri is not set, return the wisb data
         return port_dict
 
-    def _parse_vlan_range(self, vlan_members):
-        # Iterate the members and parse '-' and get the range of vlan members.
-        # e.g. vlan members = ['51-60']. Convert it to ['51', '52'..]
-        all_members = []
-        for mem in vlan_members:
-            if '-' in mem:
-                vlan_range = mem.split('-')
-                for i in range(int(vlan_range[0]), int(vlan_range[1]) + 1):
-                    all_members.append(int(i))
+    def check_device_ports(self, context, device_id):
+        """Compares the wisb and the wiri of all the ports of a device.
+
+        The device is read once with bulk commands instead of once per port,
+        and only the ports whose state on the device differs from the
+        recorded one are returned, each with its device_data and the names
+        of the attributes that differ.
+        """
+        device_db = self.netforce_model.get_device_db(context, device_id)
+        device_driver = self._get_device_driver(device_db.management_ip,
+                                                device_db.username,
+                                                device_db.password,
+                                                device_db.os_type)
+        try:
+            device_driver.open()
+            ports_snapshot = device_driver.get_ports_snapshot()
+        except Exception as ex:
+            raise netforce_exc.DeviceError(device_error=ex.message)
+        finally:
+            device_driver.close()
+        return self._diff_ports(device_db.ports, ports_snapshot)
+
+    def _diff_ports(self, ports_db, ports_snapshot):
+        mismatches = []
+        for port_db in ports_db:
+            wisb = self._make_port_state(port_db)
+            port_data = ports_snapshot.get(port_db.name)
+            wiri = self._make_device_port_state(port_data) \
+                if port_data else None
+            if wiri is None:
+                # no interface of that name on the device.
+                differs = ['name']
             else:
-                all_members.append(int(mem))
-        return all_members
+                differs = sorted(key for key in wisb
+                                 if wisb[key] != wiri[key])
+            if differs:
+                mismatches.append({
+                    'id': port_db.id,
+                    'name': port_db.name,
+                    'wisb': wisb,
+                    'device_data': wiri,
+                    'mismatches': differs
+                })
+        return mismatches
+
+    def reconcile_device(self, context, device_id):
+        """Reads a device once and returns how it drifted from the db.
+
+        Ports are compared as in check_device_ports, the vlans of the
+        bridge group of the device with the vlans configured on it, and the
+        gateways of the subnets of those vlans with the addresses of the
+        vlan interfaces. Each drift is a dict ready for the drift report.
+        """
+        device_db = self.netforce_model.get_device_db(context, device_id)
+        bridgegroup = device_db.bridgegroup
+        vlans = bridgegroup.vlans if bridgegroup else []
+        device_driver = self._get_device_driver(device_db.management_ip,
+                                                device_db.username,
+                                                device_db.password,
+                                                device_db.os_type)
+        vlan_addrs = {}
+        try:
+            device_driver.open()
+            ports_snapshot = device_driver.get_ports_snapshot()
+            vlan_states = device_driver.get_vlan_states() if vlans else {}
+            for vlan_db in vlans:
+                if not vlan_db.subnets:
+                    continue
+                interface_name = device_driver.get_vlan_interface_name(
+                    vlan_db.tag)
+                try:
+                    vlan_addrs[vlan_db.tag] = \
+                        device_driver.get_ip_addrs_on_interface(
+                            interface_name)
+                except ebay_exceptions.EntityDoesNotExistsException:
+                    vlan_addrs[vlan_db.tag] = []
+        except Exception as ex:
+            raise netforce_exc.DeviceError(device_error=ex.message)
+        finally:
+            device_driver.close()
+
+        drifts = [self._make_drift('port', port['name'], port['wisb'],
+                                   port['device_data'], port['mismatches'])
+                  for port in self._diff_ports(device_db.ports,
+                                               ports_snapshot)]
+        for vlan_db in vlans:
+            wisb = {'tag': vlan_db.tag, 'admin_status': vlan_db.admin_status}
+            status = vlan_states.get(vlan_db.tag)
+            if status is None:
+                drifts.append(self._make_drift('vlan', vlan_db.tag, wisb,
+                                               None, ['tag']))
+                continue
+            wiri = {'tag': vlan_db.tag,
+                    'admin_status': netforce_constants.SUSPENDED
+                    if status == 'suspend' else constants.ACTIVE}
+            if wisb != wiri:
+                drifts.append(self._make_drift('vlan', vlan_db.tag, wisb,
+                                               wiri, ['admin_status']))
+        for vlan_db in vlans:
+            addrs = vlan_addrs.get(vlan_db.tag)
+            if addrs is None:
+                continue
+            for subnet_db in vlan_db.subnets:
+                gw_ip_mask = '%s/%s' % (
+                    subnet_db.gateway_ip,
+                    netaddr.IPNetwork(subnet_db.cidr).prefixlen)
+                if gw_ip_mask not in addrs:
+                    drifts.append(self._make_drift(
+                        'subnet', subnet_db.cidr,
+                        {'vlan': vlan_db.tag, 'gateway': gw_ip_mask},
+                        {'vlan': vlan_db.tag, 'addresses': addrs},
+                        ['gateway']))
+        return drifts
+
+    def _make_drift(self, resource, name, wisb, wiri, mismatches):
+        return {
+            'resource': resource,
+            'name': str(name),
+            'expected': jsonutils.dumps(wisb),
+            'actual': jsonutils.dumps(wiri) if wiri is not None else None,
+            'mismatches': ','.join(mismatches)
+        }
+
+    def get_device_drift(self, context, device_id):
+        """Returns the drift report of a device from the last sweep."""
+        self.netforce_model.get_device_db(context, device_id)
+        reconciliation_db = self.netforce_model.get_device_reconciliation_db(
+            context, device_id)
+        if not reconciliation_db:
+            return {'device_id': device_id, 'sweep_id': None, 'status': None,
+                    'error': None, 'checked_at': None, 'drifts': []}
+        return {
+            'device_id': device_id,
+            'sweep_id': reconciliation_db.sweep_id,
+            'status': reconciliation_db.status,
+            'error': reconciliation_db.error,
+            'checked_at': reconciliation_db.checked_at,
+            'drifts': self.netforce_model.get_drift_reports(
+                context, filters={'device_id': [device_id]})
+        }
+
+    def _make_port_state(self, port_db):
+        vlan_tags = vlan_bitmap.VlanBitmap()
+        native_vlan = None
+        for vlan_port_assc in port_db.vlans:
+            vlan_tags.add(vlan_port_assc.vlan.tag)
+            if vlan_port_assc.is_native_vlan:
+                native_vlan = str(vlan_port_assc.vlan.tag)
+        is_trunk = port_db.switch_port_mode == netforce_constants.TRUNK_MODE
+        return {
+            'admin_status': port_db.admin_status,
+            'switch_port_mode': port_db.switch_port_mode,
+            'vlans': vlan_tags.to_ranges(),
+            'native_vlan': native_vlan if is_trunk else None,
+            'label': port_db.label or None
+        }
+
+    def _make_device_port_state(self, port_data):
+        mode = port_data.get('switch_port_mode') or ''
+        # e.g. EOS reports access ports as static access.
+        if netforce_constants.TRUNK_MODE in mode:
+            mode = netforce_constants.TRUNK_MODE
+        elif netforce_constants.ACCESS_MODE in mode:
+            mode = netforce_constants.ACCESS_MODE
+        vlan_tags = port_data.get('trunk_vlans') or \
+            port_data.get('access_vlan') or []
+        vlan_tags = vlan_bitmap.VlanBitmap.from_ranges(vlan_tags,
+                                                       ignore_invalid=True)
+        is_trunk = mode == netforce_constants.TRUNK_MODE
+        native_vlan = port_data.get('native_vlan')
+        return {
+            'admin_status': constants.ACTIVE if port_data['is_enabled']
+            else netforce_constants.SUSPENDED,
+            'switch_port_mode': mode or None,
+            'vlans': vlan_tags.to_ranges(),
+            'native_vlan': str(native_vlan) if is_trunk and native_vlan
+            else None,
+            'label': port_data.get('description') or None
+        }
 
     def create_bubble(self, context, bubble, **kwargs):
         bubble_db = self.netforce_model.create_bubble(
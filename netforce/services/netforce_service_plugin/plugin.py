@@ -98,6 +98,10 @@ class NetForceServicePlugin(service_base.ServicePluginBase):
                                 fields=None):
         pass
 
+    @abc.abstractmethod
+    def get_vlanportassociations(self, context, filters=None, fields=None):
+        pass
+
     @abc.abstractmethod
     def delete_vlanportassociation(self, context, vlanportassociation_id):
         pass
@@ -218,3 +222,11 @@ class NetForceServicePlugin(service_base.ServicePluginBase):
     @abc.abstractmethod
     def delete_bubble(self, context, bubble_id):
         pass
+
+    @abc.abstractmethod
+    def get_job(self, context, job_id, fields=None):
+        pass
+
+    @abc.abstractmethod
+    def get_jobs(self, context, filters=None, fields=None):
+        pass
@@ -15,12 +15,46 @@
 #    limitations under the License.
 
 
+import netaddr
+from oslo_serialization import jsonutils
+
+
 class NetForceViewMixin(object):
     """
         This class is mixin function to define the view payload for each
         resource. The view method name should be make_<resourcename>_dict
 
     """
+    # View fields of each resource that are copied as is from the column of
+    # the same name. A fields= projection made only of these is answered
+    # by selecting the columns, without building the ORM objects.
+    SCALAR_FIELDS = {
+        'bridgegroup': ('id', 'name', 'description', 'status',
+                        'status_description', 'tenant_id'),
+        'vpc': ('id', 'name', 'description', 'label', 'status',
+                'status_description', 'tenant_id'),
+        'vlan': ('id', 'name', 'tag', 'status', 'status_description',
+                 'tenant_id', 'bridge_group_id', 'vpc_id'),
+        'port': ('id', 'name', 'admin_status', 'switch_port_mode',
+                 'description', 'status', 'status_description', 'tenant_id'),
+        'devicetype': ('id', 'name', 'type', 'status', 'status_description',
+                       'tenant_id'),
+        'device': ('id', 'name', 'description', 'management_ip', 'username',
+                   'status', 'status_description', 'os_type', 'tenant_id',
+                   'bubble_id'),
+        'vlanportassociation': ('id', 'vlan_id', 'port_id', 'status',
+                                'status_description', 'is_native_vlan',
+                                'tenant_id'),
+        'subnet': ('id', 'tenant_id', 'name', 'cidr', 'gateway_ip',
+                   'broadcast_ip', 'netmask', 'vlan_id', 'status'),
+        'bubble': ('id', 'name', 'tenant_id'),
+        'vrf': ('id', 'name', 'tenant_id', 'description', 'bubble_id',
+                'vpc_id'),
+        'job': ('id', 'tenant_id', 'resource', 'action', 'resource_id',
+                'status', 'status_description', 'error', 'created_at',
+                'updated_at'),
+    }
+
     def make_bridgegroup_dict(self, bg, fields=None):
         res = {
             'id': bg.id,
@@ -55,9 +89,10 @@ class NetForceViewMixin(object):
             'bridge_group_id': vlan_db.bridge_group_id,
             'vpc_id': vlan_db.vpc_id
         }
-        if vlan_db.bridgegroup:
+        if (not fields or 'bridge_group_name' in fields) and \
+                vlan_db.bridgegroup:
             res['bridge_group_name'] = vlan_db.bridgegroup.name
-        if vlan_db.vpc:
+        if (not fields or 'vpc_name' in fields) and vlan_db.vpc:
             res['vpc_name'] = vlan_db.vpc.name
         return self._fields(res, fields)
 
@@ -72,7 +107,9 @@ class NetForceViewMixin(object):
             'status_description': port_db.status_description,
             'tenant_id': port_db.tenant_id
         }
-        if port_db.vlans and len(port_db.vlans) > 0:
+        # vlans are a relationship, only load them when they are asked for.
+        if (not fields or 'vlans' in fields) and \
+                port_db.vlans and len(port_db.vlans) > 0:
             res['vlans'] = []
             for vlan_port_assc in port_db.vlans:
                 res['vlans'].append({
@@ -108,15 +145,17 @@ class NetForceViewMixin(object):
             'name': device_db.name,
             'description': device_db.description,
             'management_ip': device_db.management_ip,
-            'type': device_db.device_type.type,
             'username': device_db.username,
-            'ports': [p.id for p in device_db.ports],
             'status': device_db.status,
             'status_description': device_db.status_description,
             'os_type': device_db.os_type,
             'tenant_id': device_db.tenant_id,
             'bubble_id': device_db.bubble_id
         }
+        if not fields or 'type' in fields:
+            res['type'] = device_db.device_type.type
+        if not fields or 'ports' in fields:
+            res['ports'] = [p.id for p in device_db.ports]
         return self._fields(res, fields)
 
     def make_vlanportassociation_dict(self, vlan_port_association_db,
@@ -146,6 +185,20 @@ class NetForceViewMixin(object):
         }
         return self._fields(res, fields)
 
+    def make_subnet_reservation_dict(self, reservation_db, fields=None):
+        network = netaddr.IPNetwork(reservation_db.cidr)
+        res = {
+            'id': reservation_db.id,
+            'cidr': reservation_db.cidr,
+            'gateway_ip': str(netaddr.IPAddress(network.first + 1)),
+            'broadcast_ip': str(netaddr.IPAddress(network.last)),
+            'netmask': str(network.netmask),
+            'bubble_id': reservation_db.bubble_id,
+            'vpc_id': reservation_db.vpc_id,
+            'expires_at': reservation_db.expires_at
+        }
+        return self._fields(res, fields)
+
     def _make_get_port_dict(self, port_id, port_name, native_vlan, vlan_tags,
                             mode, status, description, tenant_id, port_db,
                             fields):
@@ -196,3 +249,37 @@ class NetForceViewMixin(object):
 
         }
         return self._fields(res, fields)
+
+    def make_job_dict(self, job_db, fields=None):
+        res = {
+            'id': job_db.id,
+            'tenant_id': job_db.tenant_id,
+            'resource': job_db.resource,
+            'action': job_db.action,
+            'resource_id': job_db.resource_id,
+            'status': job_db.status,
+            'status_description': job_db.status_description,
+            'result': jsonutils.loads(job_db.result) if job_db.result
+            else None,
+            'error': job_db.error,
+            'created_at': job_db.created_at,
+            'updated_at': job_db.updated_at
+        }
+        return self._fields(res, fields)
+
+    def make_drift_report_dict(self, drift_db, fields=None):
+        res = {
+            'id': drift_db.id,
+            'device_id': drift_db.device_id,
+            'sweep_id': drift_db.sweep_id,
+            'resource': drift_db.resource,
+            'name': drift_db.name,
+            'expected': jsonutils.loads(drift_db.expected)
+            if drift_db.expected else None,
+            'actual': jsonutils.loads(drift_db.actual)
+            if drift_db.actual else None,
+            'mismatches': drift_db.mismatches.split(',')
+            if drift_db.mismatches else [],
+            'created_at': drift_db.created_at
+        }
+        return self._fields(res, fields)
@@ -0,0 +1,176 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import datetime
+import sys
+
+import eventlet
+from oslo_config import cfg
+from oslo_log import log as logging
+
+from netforce.common import lockutils
+from netforce.common import netforce_exceptions as netforce_exc
+from netforce.common import periodic
+from netforce.plugins.common import netforce_constants
+from neutron.common import config as common_config
+from neutron import context as n_context
+from neutron import manager
+from neutron.openstack.common import uuidutils
+
+LOG = logging.getLogger(__name__)
+
+RECONCILE_LOCK = 'netforce-reconciliation'
+
+CONF = cfg.CONF
+reconciliation_conf = [
+    cfg.IntOpt('concurrency', default=32,
+               help='number of devices read at the same time in a '
+                    'reconciliation sweep'),
+    cfg.IntOpt('device_timeout', default=120,
+               help='seconds after which reading a device is given up and '
+                    'the device is recorded as failed in the sweep'),
+    cfg.IntOpt('interval', default=0,
+               help='seconds between the periodic reconciliation runs of '
+                    'an API process, 0 disables them'),
+    cfg.IntOpt('max_devices', default=0,
+               help='number of devices checked per run, the next run '
+                    'resumes the sweep where it stopped. 0 checks all the '
+                    'devices left in the sweep'),
+]
+CONF.register_opts(reconciliation_conf, group='reconciliation')
+
+reconciliation_cli_opts = [
+    cfg.BoolOpt('resume', default=False,
+                help='continue the last sweep instead of starting a new '
+                     'one'),
+]
+
+
+class Reconciler(periodic.PeriodicTask):
+    """Compares the devices with the db and records the drift.
+
+    A sweep checks every device once. Each checked device is checkpointed
+    with the id of the sweep, so a sweep that was interrupted, or run a
+    few devices at a time, is resumed by skipping the devices it already
+    checked. Devices are read concurrently, each within a timeout, so one
+    unreachable switch does not hold up the sweep.
+    """
+
+    name = 'Reconciliation sweep'
+    lock_name = RECONCILE_LOCK
+
+    def __init__(self, plugin, concurrency, device_timeout):
+        super(Reconciler, self).__init__(plugin)
+        self._concurrency = concurrency
+        self._device_timeout = device_timeout
+
+    def _run(self, resume=False, limit=None):
+        """Runs one sweep, or the next part of it when resuming."""
+        context = n_context.get_admin_context()
+        sweep_id = None
+        device_ids = []
+        if resume:
+            sweep_id = self._plugin.get_last_reconcile_sweep_id(context)
+        if sweep_id:
+            device_ids = self._plugin.get_devices_to_reconcile(
+                context, sweep_id, limit=limit)
+        if not device_ids:
+            # nothing left in the last sweep, start a new one.
+            sweep_id = uuidutils.generate_uuid()
+            device_ids = self._plugin.get_devices_to_reconcile(
+                context, sweep_id, limit=limit)
+
+        LOG.info('Reconciliation sweep %(sweep)s checking %(count)d '
+                 'devices', {'sweep': sweep_id, 'count': len(device_ids)})
+        summary = {'sweep_id': sweep_id, 'checked': 0, 'failed': 0,
+                   'drifted': 0, 'drifts': 0}
+        pool = eventlet.GreenPool(self._concurrency)
+        for drift_count in pool.imap(self._check_device,
+                                     [sweep_id] * len(device_ids),
+                                     device_ids):
+            if drift_count is None:
+                summary['failed'] += 1
+                continue
+            summary['checked'] += 1
+            if drift_count:
+                summary['drifted'] += 1
+                summary['drifts'] += drift_count
+        LOG.info('Reconciliation sweep %(sweep_id)s checked %(checked)d '
+                 'devices, %(drifted)d drifted with %(drifts)d drifts and '
+                 '%(failed)d could not be read', summary)
+        return summary
+
+    def _check_device(self, sweep_id, device_id):
+        """Returns the number of drifts of the device, None on failure."""
+        context = n_context.get_admin_context()
+        checked_at = datetime.datetime.now()
+        drifts = None
+        error = None
+        try:
+            with eventlet.Timeout(self._device_timeout, False):
+                drifts = self._plugin.reconcile_device(context, device_id)
+            if drifts is None:
+                error = 'reading the device timed out after %s seconds' % (
+                    self._device_timeout)
+        except Exception as ex:
+            error = ex.message or str(ex)
+
+        if error:
+            LOG.warning('Reconciling device %(device)s failed: %(error)s',
+                        {'device': device_id, 'error': error})
+        try:
+            self._plugin.save_reconciliation(
+                context, device_id, sweep_id, checked_at,
+                netforce_constants.RECONCILE_FAILED if error
+                else netforce_constants.RECONCILE_COMPLETED,
+                error=error, drifts=drifts)
+        except Exception:
+            LOG.exception('Saving the reconciliation of device %s failed',
+                          device_id)
+            return None
+        return None if error else len(drifts)
+
+
+def start_periodic(plugin):
+    """Runs the sweep every interval seconds in the background.
+
+    Every run resumes the current sweep, checking at most max_devices
+    devices, so a large fleet is covered over a few runs.
+    """
+    conf = CONF.reconciliation
+    reconciler = Reconciler(plugin, conf.concurrency, conf.device_timeout)
+    return reconciler.start(conf.interval, resume=True,
+                            limit=conf.max_devices or None)
+
+
+def main():
+    eventlet.monkey_patch()
+    CONF.register_cli_opts(reconciliation_cli_opts)
+    common_config.init(sys.argv[1:])
+    common_config.setup_logging()
+    # the sweep is run right here, not in the background of the plugin.
+    CONF.set_override('interval', 0, group='reconciliation')
+    conf = CONF.reconciliation
+    reconciler = Reconciler(manager.NeutronManager.get_plugin(),
+                            conf.concurrency, conf.device_timeout)
+    try:
+        reconciler.run(resume=CONF.resume, limit=conf.max_devices or None)
+    except netforce_exc.AcquireDistributedLockFailed:
+        LOG.error('Another reconciliation sweep is running')
+        return 1
+    finally:
+        lockutils.stop_coordinator()
+    return 0
@@ -0,0 +1,68 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+from oslo_config import cfg
+
+from netforce.common import periodic
+
+COLLECT_LOCK = 'netforce-route-collection'
+
+CONF = cfg.CONF
+route_snapshots_conf = [
+    cfg.IntOpt('interval', default=0,
+               help='seconds between the collections of the routes of all '
+                    'the bubbles into route snapshots, 0 disables them'),
+    cfg.IntOpt('concurrency', default=8,
+               help='number of bubbles whose routes are read at the same '
+                    'time'),
+    cfg.IntOpt('bubble_timeout', default=300,
+               help='seconds after which reading the routes of a bubble is '
+                    'given up'),
+    cfg.IntOpt('max_age', default=900,
+               help='seconds for which a route snapshot is trusted to check '
+                    'a new subnet for overlaps before it is pushed, older '
+                    'snapshots are not used and the routes are read on a '
+                    'bubble device. 0 always reads them on the device'),
+]
+CONF.register_opts(route_snapshots_conf, group='route_snapshots')
+
+
+class RouteCollector(periodic.Collector):
+    """Reads the routes of all the bubbles into route snapshots.
+
+    Bubbles are read concurrently, each within a timeout; a bubble that
+    can not be read keeps its previous snapshots, which stop being used
+    for validation once older than max_age.
+    """
+
+    name = 'Route collection'
+    lock_name = COLLECT_LOCK
+    item_desc = 'the routes of bubble %s'
+    summary = ('Collected %(total)d routes of %(count)d bubbles, '
+               '%(failed)d could not be read')
+
+    def _get_item_ids(self, context):
+        return self._plugin.get_bubble_ids(context)
+
+    def _collect_item(self, context, bubble_id):
+        return self._plugin.collect_bubble_routes(context, bubble_id)
+
+
+def start_periodic(plugin):
+    """Collects the routes of the bubbles every interval seconds."""
+    conf = CONF.route_snapshots
+    collector = RouteCollector(plugin, conf.concurrency, conf.bubble_timeout)
+    return collector.start(conf.interval)
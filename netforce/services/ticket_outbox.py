@@ -0,0 +1,121 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import datetime
+
+from oslo_config import cfg
+from oslo_log import log as logging
+from oslo_serialization import jsonutils
+
+from netforce.common import periodic
+from neutron import context as n_context
+
+LOG = logging.getLogger(__name__)
+
+DRAIN_LOCK = 'netforce-ticket-outbox'
+
+CONF = cfg.CONF
+ticket_outbox_conf = [
+    cfg.BoolOpt('enabled', default=True,
+                help='queue CR status updates in the ticket outbox and send '
+                     'them in the background instead of during the '
+                     'request'),
+    cfg.IntOpt('interval', default=5,
+               help='seconds between the drains of the ticket outbox'),
+    cfg.IntOpt('batch_size', default=50,
+               help='number of CR updates sent by a drain'),
+    cfg.IntOpt('max_attempts', default=10,
+               help='number of times a CR update is sent before it is '
+                    'given up'),
+    cfg.IntOpt('backoff', default=5,
+               help='seconds before a failed CR update is sent again, '
+                    'doubled after each failure'),
+    cfg.IntOpt('max_backoff', default=600,
+               help='longest wait between two sends of a CR update'),
+]
+CONF.register_opts(ticket_outbox_conf, group='ticket_outbox')
+
+
+class TicketOutbox(periodic.PeriodicTask):
+    """Sends the queued CR updates to the ticket service.
+
+    A failed update is retried with exponential backoff up to
+    max_attempts; the updates of a ticket queued after it wait for it, so
+    that a CR is never completed before it is marked ready to start. When
+    an update is given up, the later updates of its ticket are dropped
+    with it.
+    """
+
+    name = 'Ticket outbox drain'
+    lock_name = DRAIN_LOCK
+
+    def __init__(self, plugin, batch_size, max_attempts, backoff,
+                 max_backoff):
+        super(TicketOutbox, self).__init__(plugin)
+        self._batch_size = batch_size
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+
+    def _run(self):
+        """Sends the due updates, returns the number sent."""
+        context = n_context.get_admin_context()
+        now = datetime.datetime.now()
+        sent = 0
+        for update_db in self._plugin.get_due_ticket_updates(
+                context, now, self._batch_size):
+            if self._send(context, update_db, now):
+                sent += 1
+        return sent
+
+    def _send(self, context, update_db, now):
+        try:
+            self._plugin.send_cr_update(update_db.ticket_num,
+                                        jsonutils.loads(update_db.payload))
+        except Exception as ex:
+            attempts = update_db.attempts + 1
+            if attempts >= self._max_attempts:
+                LOG.error('Giving up CR update %(payload)s of %(ticket)s '
+                          'and the updates queued after it, after '
+                          '%(attempts)d attempts: %(error)s',
+                          {'payload': update_db.payload,
+                           'ticket': update_db.ticket_num,
+                           'attempts': attempts, 'error': ex})
+                self._plugin.delete_ticket_updates(context,
+                                                   update_db.ticket_num)
+                return False
+            delay = min(self._backoff * 2 ** (attempts - 1),
+                        self._max_backoff)
+            LOG.warning('CR update of %(ticket)s failed, retrying in '
+                        '%(delay)d seconds: %(error)s',
+                        {'ticket': update_db.ticket_num, 'delay': delay,
+                         'error': ex})
+            self._plugin.reschedule_ticket_update(
+                context, update_db.id, attempts,
+                now + datetime.timedelta(seconds=delay), unicode(ex))
+            return False
+        self._plugin.delete_ticket_update(context, update_db.id)
+        return True
+
+
+def start_periodic(plugin):
+    """Drains the ticket outbox every interval seconds."""
+    conf = CONF.ticket_outbox
+    if not conf.enabled:
+        return None
+    outbox = TicketOutbox(plugin, conf.batch_size, conf.max_attempts,
+                          conf.backoff, conf.max_backoff)
+    return outbox.start(conf.interval)
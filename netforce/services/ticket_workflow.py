@@ -15,14 +15,19 @@
 #    limitations under the License.
 
 
+import datetime
+
 from netforce.api_client import ticket_api_client
 from neutron.common import exceptions
+from neutron import context as n_context
 from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_serialization import jsonutils
 LOG = logging.getLogger(__name__)
 
 
 CONF = cfg.CONF
+CONF.import_group('ticket_outbox', 'netforce.services.ticket_outbox')
 CR_TYPE_VLAN = "VLAN"
 CR_TYPE_PORT = "Port"
 CR_TYPE_SUBTYPE_MAP = {CR_TYPE_PORT: "Port_Modify_Auto",
@@ -35,8 +40,12 @@ def create_and_mark_cr_inprogress(auto_cr):
 
     def create_cr(*args, **kwargs):
         ticket_data = auto_cr(*args, **kwargs)
+        # the plugin the CR is made for queues the updates in its outbox.
+        workflow = ticket_work_flow
+        if args and isinstance(args[0], ticketWorkFlow):
+            workflow = args[0]
         try:
-            ticket_client = ticket_work_flow.get_ticket_client()
+            ticket_client = workflow.get_ticket_client()
             ticket_resp = ticket_client.create_ticket(
                 ticket_data['verification_plan'],
                 ticket_data['busines_justification'],
@@ -55,35 +64,65 @@ def create_and_mark_cr_inprogress(auto_cr):
         # Take the CR to ReadyToStart after create
         # Also no need to error out in case of update.
         ticket_status = "ReadyToStart"
-        ticket_work_flow.update_cr(ticket_num, ticket_status,
-                                 commands=None, close_code=None)
+        workflow.update_cr(ticket_num, ticket_status,
+                           commands=None, close_code=None)
 
         return ticket_num
     return create_cr
 
 
+# clients by service url and credentials, shared by all the CR operations.
+_ticket_clients = {}
+
+
 class ticketWorkFlow(object):
 
     def get_ticket_client(self):
-        ticket_client = ticket_api_client.ticketApiClient(
-            cfg.CONF.ticket_service_url, cfg.CONF.ticket_api_user,
-            cfg.CONF.ticket_api_password)
+        key = (cfg.CONF.ticket_service_url, cfg.CONF.ticket_api_user,
+               cfg.CONF.ticket_api_password)
+        ticket_client = _ticket_clients.get(key)
+        if ticket_client is None:
+            ticket_client = _ticket_clients.setdefault(
+                key, ticket_api_client.ticketApiClient(*key))
         return ticket_client
 
     def update_cr(self, ticket_num, ticket_status, commands, close_code):
-        ticket_client = self.get_ticket_client()
         ticket_dict = self._make_update_ticket_dict(ticket_status, commands,
                                                     close_code)
+        # With a db the update is queued in the ticket outbox and sent in
+        # the background, the request does not wait on the ticket service.
+        if CONF.ticket_outbox.enabled and \
+                hasattr(self, 'enqueue_ticket_update'):
+            try:
+                self.enqueue_ticket_update(n_context.get_admin_context(),
+                                           ticket_num,
+                                           jsonutils.dumps(ticket_dict),
+                                           datetime.datetime.now())
+                LOG.debug("Queued update of CR %s to %s" %
+                          (ticket_num, ticket_status))
+                return True
+            except Exception as ex:
+                LOG.warn("Unable to queue update of CR %s due to %s, "
+                         "sending it now" % (ticket_num, ex))
         try:
-            updated = ticket_client.update_ticket(ticket_num, ticket_dict)
-            if updated['success']:
-                LOG.debug("Auto CR %s is %s " % (ticket_num, ticket_status))
+            self.send_cr_update(ticket_num, ticket_dict)
+            LOG.debug("Auto CR %s is %s " % (ticket_num, ticket_status))
             return True
         except Exception as ex:
             # Dont break the device operations even if update CR fails.
             LOG.warn("Unable to update CR %s due to %s" % (ticket_num, ex))
             return False
 
+    def send_cr_update(self, ticket_num, ticket_dict):
+        """Sends a CR update, raises if the ticket service refuses it."""
+        updated = self.get_ticket_client().update_ticket(ticket_num,
+                                                         ticket_dict)
+        if not updated.get('success'):
+            raise exceptions.BadRequest(
+                resource='ticket',
+                msg="CR %s update was not accepted: %s" % (ticket_num,
+                                                           updated))
+
     def complete_cr(self, ticket_num, msg):
         close_code = 'Completed as Planned'
         ticket_status = "Complete"
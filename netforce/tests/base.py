@@ -20,7 +20,10 @@ import fixtures
 from neutron.db import api as db_api
 from neutron.tests import base
 from neutron import wsgi
+from oslo_config import cfg
 
+from netforce.common import cache
+from netforce.common import lockutils
 from netforce.db.netforce_model import BASEV2
 
 
@@ -37,6 +40,7 @@ class NetforceSqlTestFixture(fixtures.Fixture):
                     conn.execute(table.delete())
 
         self.addCleanup(clear_tables)
+        self.addCleanup(cache.clear_reference_cache)
 
 
 class NetforceSqlTestCase(base.BaseTestCase):
@@ -44,6 +48,15 @@ class NetforceSqlTestCase(base.BaseTestCase):
     def setUp(self):
         super(NetforceSqlTestCase, self).setUp()
         self.useFixture(NetforceSqlTestFixture())
+        # plugin operations take distributed locks, use file locks instead
+        # of etcd in unit tests.
+        lock_dir = self.useFixture(fixtures.TempDir()).path
+        self.config(backend_url='file://%s' % lock_dir, group='dist_lock')
+        self.addCleanup(lockutils.stop_coordinator)
+        # updates stay in the ticket outbox, no drain runs in the background.
+        cfg.CONF.import_group('ticket_outbox',
+                              'netforce.services.ticket_outbox')
+        self.config(interval=0, group='ticket_outbox')
 
 
 class NetforceWebTestCase(NetforceSqlTestCase):
@@ -16,16 +16,23 @@
 
 import collections
 import contextlib
+import datetime
 import mock
 from netforce.common import netforce_exceptions
 from netforce.extensions import netforceext as netforce_v2_ctl
+from netforce.services import idempotency
+from netforce.services import job_manager
 from netforce.tests import base
 from netforce.tests.unit.api import fakes
 from netforce.tests.unit.api.v2 import fake_netforceplugin
 from neutron.common import exceptions as ex
+from neutron import context
 from neutron.plugins.common import constants
+from oslo_config import cfg
+from oslo_serialization import jsonutils
 from sqlalchemy.orm import exc as orm_exc
 import testscenarios
+import webob
 
 load_tests = testscenarios.load_tests_apply_scenarios
 
@@ -235,6 +242,21 @@ class TestNetforceController(base.NetforceSqlTestCase):
     def test_create_port(self):
         self._create_and_assert_test_port()
 
+    def test_stream_ports(self):
+        port_dict = self._create_and_assert_test_port()
+        req = fakes.HTTPRequest.blank('/ports?stream&fields=name')
+        req.context.is_admin = True
+        with mock.patch.object(netforce_v2_ctl.policy, 'check') as check:
+            check.return_value = True
+            resp = self.port_controller.stream(req)
+            lines = ''.join(resp.app_iter).splitlines()
+        self.assertEqual(netforce_v2_ctl.NDJSON_CONTENT_TYPE,
+                         resp.content_type)
+        ports = [jsonutils.loads(line) for line in lines]
+        self.assertEqual([{'name': port_dict['port']['name']},
+                          {'name': port_dict['port2']['port']['name']}],
+                         sorted(ports, key=lambda p: p['name']))
+
     def test_update_port_enable_matching_mac(self):
         port_dict = self._create_and_assert_test_port()
 
@@ -332,6 +354,519 @@ class TestNetforceController(base.NetforceSqlTestCase):
                     req, id=port_dict['port']['id'], body=body)
                 self.assertIs(True, 'vlans' in resp_dict['port'])
 
+    def test_submit_update_port(self):
+        port_dict = self._create_and_assert_test_port()
+        manager = job_manager.get_job_manager()
+        self.addCleanup(manager.stop)
+
+        with mock.patch.object(self.port_controller._plugin,
+                               '_get_device_driver') as device_driver:
+            with mock.patch.object(self.port_controller._plugin,
+                                   'create_port_flip_cr'):
+                device_driver.return_value = mock.Mock()
+                req = fakes.HTTPRequest.blank(
+                    '/ports/%s.json?async' % (port_dict['port']['id']))
+                req.context.tenant_id = port_dict['port']['tenant_id']
+                req.body = jsonutils.dumps({
+                    'port': {
+                        'switch_port_mode': 'access',
+                        'vlans': [{"vlan": {"tag": "2"}}]
+                    }
+                })
+                resp = self.port_controller.submit(
+                    req, 'update', id=port_dict['port']['id'])
+                self.assertEqual(202, resp.status_int)
+                job = jsonutils.loads(resp.body)['job']
+                self.assertEqual('PENDING', job['status'])
+                # runs the queued job before returning.
+                manager.join()
+
+        job = self.port_controller._plugin.get_job(
+            context.get_admin_context(), job['id'])
+        self.assertEqual('COMPLETED', job['status'])
+        self.assertEqual(port_dict['port']['id'], job['result']['id'])
+        self.assertIs(True, 'vlans' in job['result'])
+
+    def test_recover_jobs(self):
+        port_dict = self._create_and_assert_test_port()
+        port_id = port_dict['port']['id']
+        plugin = self.port_controller._plugin
+        manager = job_manager.get_job_manager()
+        self.addCleanup(manager.stop)
+        admin_context = context.get_admin_context()
+        job = {'tenant_id': port_dict['port']['tenant_id'],
+               'resource': 'port',
+               'action': 'update',
+               'resource_id': port_id}
+
+        # left RUNNING and PENDING by an API process that stopped.
+        running_id = plugin.create_job(admin_context, dict(
+            job, request='{}')).id
+        plugin.update_job(admin_context, running_id, {
+            'status': 'RUNNING',
+            'updated_at': datetime.datetime.now() - datetime.timedelta(
+                seconds=cfg.CONF.async_jobs.running_timeout + 60)})
+        request = {'body': {'label': 'server-1'},
+                   'params': {},
+                   'context': {'user_id': None, 'is_admin': True,
+                               'tenant_id': job['tenant_id']}}
+        pending_id = plugin.create_job(admin_context, dict(
+            job, request=jsonutils.dumps(request))).id
+
+        with mock.patch.object(plugin, '_get_device_driver') as driver:
+            driver.return_value = mock.Mock()
+            plugin.recover_jobs()
+            manager.join()
+
+        running = plugin.get_job(admin_context, running_id)
+        self.assertEqual('FAILED', running['status'])
+        self.assertEqual('Interrupted', running['status_description'])
+        pending = plugin.get_job(admin_context, pending_id)
+        self.assertEqual('COMPLETED', pending['status'])
+        self.assertEqual('server-1', pending['result']['label'])
+        # a job is run once however many times it is queued.
+        self.assertFalse(plugin.claim_job(admin_context, pending_id))
+
+    def test_bulk_update_ports(self):
+        port_dict = self._create_and_assert_test_port()
+        port_ids = [port_dict['port']['id'], port_dict['port2']['port']['id']]
+        device_driver_mock = mock.Mock()
+
+        with mock.patch.object(self.port_controller._plugin,
+                               '_get_device_driver') as device_driver:
+            device_driver.return_value = device_driver_mock
+            req = fakes.HTTPRequest.blank('/ports/bulk_update.json')
+            req.context.tenant_id = port_dict['port']['tenant_id']
+            body = {
+                'ports': [
+                    {'id': port_ids[0], 'label': 'server-1'},
+                    {'id': port_ids[1], 'label': 'server-2'},
+                    {'id': 'fake-port-id', 'label': 'server-3'}
+                ]
+            }
+            resp_dict = self.port_controller.bulk_update(req, body=body)
+
+        results = resp_dict['ports']
+        self.assertEqual(port_ids + ['fake-port-id'],
+                         [result['id'] for result in results])
+        self.assertEqual(['COMPLETED', 'COMPLETED', 'FAILED'],
+                         [result['status'] for result in results])
+        self.assertEqual('PortNotFound', results[2]['error_type'])
+        # both ports are on the same device, so one connection is opened.
+        self.assertEqual(1, device_driver_mock.open.call_count)
+        device_driver_mock.close.assert_called_once_with()
+        self.assertEqual(2, device_driver_mock.update_interface_label.
+                         call_count)
+
+    def test_bulk_update_ports_malformed_body(self):
+        req = fakes.HTTPRequest.blank('/ports/bulk_update.json')
+        req.context.is_admin = True
+        for body in (None, {'port': {}}, {'ports': {'label': 'server-1'}},
+                     {'ports': [{'label': 'server-1'}]}, {'ports': ['id']}):
+            self.assertRaises(ex.BadRequest,
+                              self.port_controller.bulk_update, req,
+                              body=body)
+
+    def test_bulk_create_devices(self):
+        port_dict = self._create_and_assert_test_port()
+        plugin = self.device_controller._plugin
+        admin_context = context.get_admin_context()
+        bubble_id = plugin.get_device(
+            admin_context, plugin.get_port_device_id(
+                admin_context, port_dict['port']['id']))['bubble_id']
+        devices = [{'name': 'pod1-tor%d' % i,
+                    'description': 'pod1 tor',
+                    'management_ip': '10.10.12.%d' % i,
+                    'username': 'arista',
+                    'password': 'arista',
+                    'type': 'TOR',
+                    'os_type': 'eos',
+                    'tenant_id': '1232',
+                    'bubble_id': bubble_id} for i in range(1, 3)]
+        good_driver = mock.Mock()
+        good_driver.get_interfaces.return_value = {
+            'Ethernet1': {'is_enabled': True},
+            'Ethernet2': {'is_enabled': False}
+        }
+        bad_driver = mock.Mock()
+        bad_driver.open.side_effect = Exception('unreachable')
+
+        with mock.patch.object(plugin, '_get_device_driver') as \
+                device_driver:
+            device_driver.side_effect = lambda ip, *args: \
+                good_driver if ip == '10.10.12.1' else bad_driver
+            req = fakes.HTTPRequest.blank(
+                '/devices/bulk_create.json?discover_ports')
+            req.context.is_admin = True
+            resp_dict = self.device_controller.bulk_create(
+                req, body={'devices': devices})
+
+        results = resp_dict['devices']
+        self.assertEqual(['pod1-tor1', 'pod1-tor2'],
+                         [result['device']['name'] for result in results])
+        self.assertEqual(['COMPLETED', 'FAILED'],
+                         [result['status'] for result in results])
+        self.assertEqual('DeviceGetInterfacesError',
+                         results[1]['error_type'])
+        self.assertEqual(2, len(results[0]['device']['ports']))
+        self.assertEqual(0, len(results[1]['device']['ports']))
+
+        # one unknown device type fails the whole request.
+        devices = [dict(devices[0], name='pod2-tor1',
+                        management_ip='10.10.13.1'),
+                   dict(devices[0], name='pod2-tor2',
+                        management_ip='10.10.13.2', type='SPINE')]
+        req = fakes.HTTPRequest.blank('/devices/bulk_create.json')
+        req.context.is_admin = True
+        self.assertRaises(netforce_exceptions.DeviceTypeNotFound,
+                          self.device_controller.bulk_create, req,
+                          body={'devices': devices})
+        self.assertEqual([], plugin.get_devices(
+            admin_context, filters={'name': ['pod2-tor1']}))
+
+    def test_bulk_create_devices_malformed_body(self):
+        req = fakes.HTTPRequest.blank('/devices/bulk_create.json')
+        req.context.is_admin = True
+        for body in (None, {'device': {}}, {'devices': {'name': 'tor1'}}):
+            self.assertRaises(ex.BadRequest,
+                              self.device_controller.bulk_create, req,
+                              body=body)
+
+        self.config(bulk_create_max_devices=1)
+        devices = [{'name': 'pod1-tor%d' % i,
+                    'description': 'pod1 tor',
+                    'management_ip': '10.10.12.%d' % i,
+                    'username': 'arista',
+                    'password': 'arista',
+                    'type': 'TOR',
+                    'os_type': 'eos',
+                    'tenant_id': '1232'} for i in range(1, 3)]
+        self.assertRaises(ex.BadRequest,
+                          self.device_controller.bulk_create, req,
+                          body={'devices': devices})
+
+    def test_create_device_keeps_device_when_discovery_fails(self):
+        self._create_and_assert_test_port()
+        plugin = self.device_controller._plugin
+        bad_driver = mock.Mock()
+        bad_driver.open.side_effect = Exception('unreachable')
+        req = fakes.HTTPRequest.blank('/devices.json?discover_ports')
+        req.context.is_admin = True
+        body = {'device': {'name': 'pod1-tor9',
+                           'description': 'pod1 tor',
+                           'management_ip': '10.10.12.9',
+                           'username': 'arista',
+                           'password': 'arista',
+                           'type': 'TOR',
+                           'os_type': 'eos',
+                           'tenant_id': '1232'}}
+
+        with mock.patch.object(plugin, '_get_device_driver') as \
+                device_driver:
+            device_driver.return_value = bad_driver
+            self.assertRaises(netforce_exceptions.DeviceGetInterfacesError,
+                              self.device_controller.create, req, body=body)
+
+        self.assertEqual(1, len(plugin.get_devices(
+            context.get_admin_context(), filters={'name': ['pod1-tor9']})))
+
+    def test_mac_index(self):
+        port_dict = self._create_and_assert_test_port()
+        plugin = self.port_controller._plugin
+        admin_context = context.get_admin_context()
+        port_id = port_dict['port']['id']
+        device_id = plugin.get_port_device_id(admin_context, port_id)
+        device_driver_mock = mock.Mock()
+        device_driver_mock.get_mac_address_table.return_value = [
+            {'mac_address': '1C:C1:DE:18:9A:42', 'vlan': 2,
+             'interface': 'eth1'},
+            {'mac_address': '1C:C1:DE:18:9A:44', 'vlan': 2,
+             'interface': 'uplink1'}
+        ]
+
+        with mock.patch.object(plugin, '_get_device_driver') as \
+                device_driver:
+            device_driver.return_value = device_driver_mock
+            self.assertEqual(1, plugin.collect_device_macs(admin_context,
+                                                           device_id))
+
+        req = fakes.HTTPRequest.blank(
+            '/ports/find_mac.json?mac=1cc1.de18.9a42')
+        req.context.is_admin = True
+        macs = self.port_controller.find_mac(req)['macs']
+        self.assertEqual(1, len(macs))
+        self.assertEqual('eth1', macs[0]['port_name'])
+        self.assertEqual('1c:c1:de:18:9a:42', macs[0]['mac_address'])
+        self.assertTrue(plugin._is_mac_indexed_on_port(
+            admin_context, port_id, '1cc1.de18.9a42', 2))
+        self.assertFalse(plugin._is_mac_indexed_on_port(
+            admin_context, port_id, '1cc1.de18.9a42', 3))
+        self.assertFalse(plugin._is_mac_indexed_on_port(
+            admin_context, port_id, '1cc1.de18.9a44'))
+
+        req = fakes.HTTPRequest.blank('/ports/find_mac.json')
+        req.context.is_admin = True
+        self.assertRaises(ex.BadRequest, self.port_controller.find_mac, req)
+
+    def test_route_snapshot_check_block(self):
+        port_dict = self._create_and_assert_test_port()
+        plugin = self.subnet_controller._plugin
+        admin_context = context.get_admin_context()
+        device_db = plugin.get_device_db(
+            admin_context,
+            plugin.get_port_device_id(admin_context, port_dict['port']['id']))
+        bubble_id = device_db.bubble_id
+
+        devicetype_req = fakes.HTTPRequest.blank('/devicetypes')
+        devicetype_req.context.is_admin = True
+        body = {
+            "devicetype": {
+                "name": "ED Switch",
+                "type": "DISTRIBUTION",
+                "tenant_id": "1232"
+            }
+        }
+        self.devicetype_controller.create(devicetype_req, body=body)
+        device_req = fakes.HTTPRequest.blank('/devices')
+        device_req.context.is_admin = True
+        body = {
+            "device": {
+                "name": "test-bubble-device",
+                "description": "test bubble device",
+                "management_ip": "8.8.8.8",
+                "username": "test",
+                "password": "test",
+                "type": "DISTRIBUTION",
+                "bridge_group_id": device_db.bridge_group_id,
+                "os_type": "junos",
+                "tenant_id": "1232",
+                "bubble_id": bubble_id
+            }
+        }
+        self.device_controller.create(device_req, body=body)
+
+        device_driver_mock = mock.Mock()
+        device_driver_mock.get_routes.return_value = [
+            '0.0.0.0/0', '10.8.0.0/22', '10.9.1.0/24', '2001:db8::/64']
+        with mock.patch.object(plugin, '_get_device_driver') as \
+                device_driver:
+            device_driver.return_value = device_driver_mock
+            self.assertEqual(3, plugin.collect_bubble_routes(admin_context,
+                                                             bubble_id))
+            # unchanged routes only move the snapshot forward.
+            self.assertEqual(3, plugin.collect_bubble_routes(admin_context,
+                                                             bubble_id))
+        snapshot = plugin.get_latest_route_snapshot(admin_context, bubble_id)
+        self.assertEqual(3, snapshot.blob.route_count)
+
+        req = fakes.HTTPRequest.blank(
+            '/subnets/check_block.json?cidr=10.8.1.0/24&bubble_id=%s' %
+            bubble_id)
+        req.context.is_admin = True
+        block = self.subnet_controller.check_block(req)['subnet']
+        self.assertFalse(block['free'])
+        self.assertEqual(['10.8.0.0/22'], block['overlapping_routes'])
+
+        req = fakes.HTTPRequest.blank(
+            '/subnets/check_block.json?cidr=10.9.2.0/24&bubble_id=%s' %
+            bubble_id)
+        req.context.is_admin = True
+        self.assertTrue(self.subnet_controller.check_block(req)['subnet'][
+            'free'])
+
+        req = fakes.HTTPRequest.blank(
+            '/subnets/check_block.json?cidr=10.9.2.0/24&bubble_id=%s'
+            '&vrf=fake-vrf' % bubble_id)
+        req.context.is_admin = True
+        self.assertRaises(netforce_exceptions.RouteSnapshotNotFound,
+                          self.subnet_controller.check_block, req)
+
+        for query in ('cidr=10.9.2.0/24', 'bubble_id=%s' % bubble_id):
+            req = fakes.HTTPRequest.blank(
+                '/subnets/check_block.json?%s' % query)
+            req.context.is_admin = True
+            self.assertRaises(ex.BadRequest,
+                              self.subnet_controller.check_block, req)
+
+    def test_allocate_subnet(self):
+        plugin = self.subnet_controller._plugin
+        req = fakes.HTTPRequest.blank('/subnets/allocate.json')
+        req.context.is_admin = True
+        body = {'subnet': {'prefixlen': 24}}
+        subnet = self.subnet_controller.allocate(req, body=body)['subnet']
+        self.assertEqual('10.0.0.0/24', subnet['cidr'])
+        self.assertEqual('10.0.0.1', subnet['gateway_ip'])
+        self.assertEqual('10.0.0.255', subnet['broadcast_ip'])
+        self.assertEqual('255.255.255.0', subnet['netmask'])
+
+        # the reserved block is not handed out twice.
+        subnet = self.subnet_controller.allocate(req, body=body)['subnet']
+        self.assertEqual('10.0.1.0/24', subnet['cidr'])
+        self.assertEqual('10.0.1.0/24', plugin._get_overlapping_reservation(
+            req.context, '10.0.1.0/25', subnet['id']))
+        self.assertIsNone(plugin._get_overlapping_reservation(
+            req.context, '10.0.1.0/24', subnet['id']))
+        # the block is only taken with its reservation id.
+        self.assertEqual('10.0.1.0/24', plugin._get_overlapping_reservation(
+            req.context, '10.0.1.0/24'))
+        hold = plugin._hold_subnet_block(req.context, '10.0.1.0/24', None)
+        self.assertRaises(netforce_exceptions.SubnetAlreadyReserved,
+                          hold.__enter__)
+        with plugin._hold_subnet_block(req.context, '10.0.1.0/24',
+                                       subnet['id']):
+            pass
+
+        # a block held for a creation is released when the creation fails.
+        def _create_subnet():
+            with plugin._hold_subnet_block(req.context, '10.0.9.0/24', None):
+                self.assertEqual('10.0.9.0/24',
+                                 plugin._get_overlapping_reservation(
+                                     req.context, '10.0.9.0/25'))
+                raise ValueError()
+        self.assertRaises(ValueError, _create_subnet)
+        self.assertIsNone(plugin._get_overlapping_reservation(
+            req.context, '10.0.9.0/25'))
+
+        self.assertRaises(ex.InvalidInput, self.subnet_controller.allocate,
+                          req, body={'subnet': {'prefixlen': 4}})
+        self.assertRaises(ex.BadRequest,
+                          self.subnet_controller.allocate, req,
+                          body={'subnet': 24})
+
+    def test_create_vlan_allocates_tag(self):
+        self._create_and_assert_test_port()
+        vlan_req = fakes.HTTPRequest.blank('/vlans')
+        vlan_req.context.is_admin = True
+        body = {
+            "vlan": {
+                "name": "test-vlan-auto",
+                "bridge_group_name": "test-bg",
+                "admin_status": "ACTIVE",
+                "tenant_id": "1232"
+            }
+        }
+        vlan_dict = self.vlan_controller.create(vlan_req, body=body)
+        # tag 2 is taken by test-vlan-1.
+        self.assertEqual(3, vlan_dict['vlan']['tag'])
+
+        # the same vlan is answered again without allocating a tag.
+        vlan_req = fakes.HTTPRequest.blank('/vlans')
+        vlan_req.context.is_admin = True
+        self.assertEqual(vlan_dict['vlan']['id'], self.vlan_controller.create(
+            vlan_req, body=body)['vlan']['id'])
+
+        vlan_req = fakes.HTTPRequest.blank('/vlans')
+        vlan_req.context.is_admin = True
+        body['vlan']['name'] = 'test-vlan-other'
+        body['vlan']['tag'] = 3
+        self.assertRaises(
+            netforce_exceptions.ConfiguredVlanConflictsWithRequested,
+            self.vlan_controller.create, vlan_req, body=body)
+
+    def test_idempotency_key(self):
+        plugin = self.vlan_controller._plugin
+
+        def _request(body):
+            req = fakes.HTTPRequest.blank('/vlans.json', method='POST')
+            req.body = body
+            req.context.is_admin = True
+            return req
+
+        handler = mock.Mock(return_value=webob.Response(
+            status=201, body='{"vlan": {"tag": 3}}',
+            content_type='application/json'))
+        body = '{"vlan": {"name": "test-vlan"}}'
+        response = idempotency.run(plugin, _request(body), 'key-1', handler)
+        self.assertEqual(201, response.status_int)
+
+        # the retry is answered the recorded response.
+        response = idempotency.run(plugin, _request(body), 'key-1', handler)
+        self.assertEqual(1, handler.call_count)
+        self.assertEqual(201, response.status_int)
+        self.assertEqual('{"vlan": {"tag": 3}}', response.body)
+        self.assertEqual('true',
+                         response.headers[idempotency.REPLAYED_HEADER])
+
+        # the key of another request is refused.
+        response = idempotency.run(plugin, _request('{}'), 'key-1', handler)
+        self.assertEqual(422, response.status_int)
+        self.assertEqual(1, handler.call_count)
+
+        # server errors are not recorded, the retry runs again.
+        handler.return_value = webob.exc.HTTPInternalServerError()
+        idempotency.run(plugin, _request(body), 'key-2', handler)
+        self.assertIsNone(plugin.get_idempotency_key(
+            context.get_admin_context(), 'key-2', 'fake_tenant'))
+        idempotency.run(plugin, _request(body), 'key-2', handler)
+        self.assertEqual(3, handler.call_count)
+
+    def test_check_device_ports(self):
+        port_dict = self._create_and_assert_test_port()
+        req = fakes.HTTPRequest.blank('/devices/check_ports.json')
+        req.context.is_admin = True
+        device_id = self.device_controller._plugin.get_port_device_id(
+            req.context, port_dict['port']['id'])
+        device_driver_mock = mock.Mock()
+        device_driver_mock.get_ports_snapshot.return_value = {
+            'eth1': {'is_enabled': False, 'description': None,
+                     'switch_port_mode': 'access'},
+            'eth2': {'is_enabled': False, 'description': None,
+                     'switch_port_mode': 'access'}
+        }
+
+        with mock.patch.object(self.device_controller._plugin,
+                               '_get_device_driver') as device_driver:
+            device_driver.return_value = device_driver_mock
+            resp_dict = self.device_controller.check_ports(req, device_id)
+
+        # eth1 is as recorded, eth2 got disabled on the device.
+        self.assertEqual(1, len(resp_dict['ports']))
+        mismatch = resp_dict['ports'][0]
+        self.assertEqual('eth2', mismatch['name'])
+        self.assertEqual(['admin_status'], mismatch['mismatches'])
+        self.assertEqual('SUSPENDED',
+                         mismatch['device_data']['admin_status'])
+        device_driver_mock.get_ports_snapshot.assert_called_once_with()
+        device_driver_mock.close.assert_called_once_with()
+
+    def test_device_drift_report(self):
+        port_dict = self._create_and_assert_test_port()
+        req = fakes.HTTPRequest.blank('/devices/drift.json')
+        req.context.is_admin = True
+        plugin = self.device_controller._plugin
+        device_id = plugin.get_port_device_id(
+            req.context, port_dict['port']['id'])
+        device_driver_mock = mock.Mock()
+        device_driver_mock.get_ports_snapshot.return_value = {
+            'eth1': {'is_enabled': False, 'description': None,
+                     'switch_port_mode': 'access'},
+            'eth2': {'is_enabled': False, 'description': None,
+                     'switch_port_mode': 'access'}
+        }
+
+        with mock.patch.object(plugin,
+                               '_get_device_driver') as device_driver:
+            device_driver.return_value = device_driver_mock
+            drifts = plugin.reconcile_device(req.context, device_id)
+        plugin.save_reconciliation(req.context, device_id, 'sweep1',
+                                   datetime.datetime.now(), 'COMPLETED',
+                                   drifts=drifts)
+        resp_dict = self.device_controller.drift(req, device_id)
+
+        drift = resp_dict['drift']
+        self.assertEqual('COMPLETED', drift['status'])
+        self.assertEqual(1, len(drift['drifts']))
+        self.assertEqual('port', drift['drifts'][0]['resource'])
+        self.assertEqual('eth2', drift['drifts'][0]['name'])
+        self.assertEqual(['admin_status'], drift['drifts'][0]['mismatches'])
+        self.assertEqual('SUSPENDED',
+                         drift['drifts'][0]['actual']['admin_status'])
+        self.assertEqual(
+            [device_id], plugin.get_devices_to_reconcile(req.context,
+                                                         'sweep2'))
+        self.assertEqual(
+            [], plugin.get_devices_to_reconcile(req.context, 'sweep1'))
+
     def test_update_port_for_vlan_flipping_failure_invalid_id(self):
 
         port_dict = self._create_and_assert_test_port()
@@ -0,0 +1,45 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import mock
+
+from netforce.api_client import ticket_api_client
+from neutron.tests import base
+
+
+class TestticketApiClient(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestticketApiClient, self).setUp()
+        self.addCleanup(ticket_api_client._pools.clear)
+        http_patcher = mock.patch.object(ticket_api_client.httplib2, 'Http')
+        self.http = http_patcher.start()
+        self.addCleanup(http_patcher.stop)
+
+    def test_connections_are_shared(self):
+        conn = self.http.return_value
+        conn.request.return_value = ({'status': '200'}, '{"success": true}')
+        for _ in range(3):
+            client = ticket_api_client.ticketApiClient(
+                'ticket-host', 'user', 'password', connect_timeout=2,
+                http_timeout=10)
+            self.assertEqual({'success': True},
+                             client.request('POST', 'updateTicket'))
+        # one keep-alive connection served the requests of all the clients.
+        self.http.assert_called_once_with(timeout=10)
+        self.assertEqual(3, conn.request.call_count)
+        connection_type = conn.request.call_args[1]['connection_type']
+        self.assertEqual(2, connection_type.connect_timeout)
@@ -0,0 +1,63 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+from netforce.common import cache
+from neutron.tests import base
+
+
+class FakeTimer(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestTTLCache, self).setUp()
+        self.timer = FakeTimer()
+        self.cache = cache.TTLCache(2, 10, timer=self.timer)
+
+    def test_get_set(self):
+        self.cache.set(('vpc', 'name', 'vpc1'), {'id': 'id1'})
+        self.assertEqual({'id': 'id1'},
+                         self.cache.get(('vpc', 'name', 'vpc1')))
+        self.assertIsNone(self.cache.get(('vpc', 'name', 'vpc2')))
+
+    def test_entry_expires(self):
+        self.cache.set(('vpc', 'name', 'vpc1'), {'id': 'id1'})
+        self.timer.now = 10
+        self.assertIsNone(self.cache.get(('vpc', 'name', 'vpc1')))
+        self.assertEqual(0, len(self.cache))
+
+    def test_least_recently_used_evicted(self):
+        self.cache.set(('vpc', 'name', 'vpc1'), 1)
+        self.cache.set(('vpc', 'name', 'vpc2'), 2)
+        self.cache.get(('vpc', 'name', 'vpc1'))
+        self.cache.set(('vpc', 'name', 'vpc3'), 3)
+        self.assertEqual(1, self.cache.get(('vpc', 'name', 'vpc1')))
+        self.assertIsNone(self.cache.get(('vpc', 'name', 'vpc2')))
+        self.assertEqual(3, self.cache.get(('vpc', 'name', 'vpc3')))
+
+    def test_invalidate_region(self):
+        self.cache.set(('vpc', 'name', 'vpc1'), 1)
+        self.cache.set(('bubble', 'name', 'bubble1'), 2)
+        self.cache.invalidate('vpc')
+        self.assertIsNone(self.cache.get(('vpc', 'name', 'vpc1')))
+        self.assertEqual(2, self.cache.get(('bubble', 'name', 'bubble1')))
@@ -0,0 +1,53 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import contextlib
+
+import mock
+from netforce.common import lockutils
+from neutron.tests import base
+
+
+class TestLockAll(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestLockAll, self).setUp()
+        self.events = []
+
+        @contextlib.contextmanager
+        def fake_lock(name, blocking=True):
+            self.events.append(('acquire', name))
+            yield
+            self.events.append(('release', name))
+
+        patcher = mock.patch.object(lockutils, 'lock', fake_lock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_locks_taken_in_sorted_order(self):
+        with lockutils.lock_all(['port-b', 'device-a', 'port-b']):
+            self.events.append(('body', None))
+        self.assertEqual([('acquire', 'device-a'),
+                          ('acquire', 'port-b'),
+                          ('body', None),
+                          ('release', 'port-b'),
+                          ('release', 'device-a')], self.events)
+
+    def test_lock_wait_recorded(self):
+        count = lockutils.get_lock_wait_stats()['count']
+        with lockutils.lock_all(['device-a']):
+            pass
+        self.assertEqual(count + 1, lockutils.get_lock_wait_stats()['count'])
@@ -0,0 +1,87 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import eventlet
+import mock
+
+from netforce.common import netforce_exceptions as netforce_exc
+from netforce.common import periodic
+from neutron.tests import base
+
+
+class StopLoop(BaseException):
+    """Ends the periodic loop, which keeps going on any Exception."""
+
+
+class FakeCollector(periodic.Collector):
+
+    name = 'Fake collection'
+    lock_name = 'fake-collection'
+    item_desc = 'item %s'
+    summary = '%(total)d records of %(count)d items, %(failed)d failed'
+
+    def _get_item_ids(self, context):
+        return self._plugin.get_item_ids(context)
+
+    def _collect_item(self, context, item_id):
+        if item_id == 'slow':
+            eventlet.sleep(1)
+        if item_id == 'broken':
+            raise Exception('unreachable')
+        return 2
+
+
+class TestCollector(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestCollector, self).setUp()
+        self.plugin = mock.Mock()
+        self.lock = mock.patch.object(periodic.lockutils, 'lock').start()
+        mock.patch.object(periodic.n_context, 'get_admin_context').start()
+        self.addCleanup(mock.patch.stopall)
+        self.collector = FakeCollector(self.plugin, 4, 0.1)
+
+    def test_run_holds_the_lock(self):
+        self.plugin.get_item_ids.return_value = ['a']
+
+        self.assertEqual(2, self.collector.run())
+
+        self.lock.assert_called_once_with('fake-collection', blocking=False)
+
+    def test_failed_items_do_not_stop_the_others(self):
+        self.plugin.get_item_ids.return_value = ['a', 'slow', 'broken', 'b']
+
+        self.assertEqual(4, self.collector.run())
+
+    def test_not_started_without_interval(self):
+        self.assertIsNone(self.collector.start(0))
+
+    def test_periodic_run_survives_failures(self):
+        runs = []
+
+        def run():
+            runs.append(None)
+            if len(runs) == 1:
+                raise netforce_exc.AcquireDistributedLockFailed(
+                    name='fake-collection')
+            if len(runs) == 2:
+                raise Exception('failed')
+            raise StopLoop()
+
+        with mock.patch.object(self.collector, 'run', side_effect=run):
+            self.assertRaises(StopLoop,
+                              self.collector.run_periodically, 0)
+        self.assertEqual(3, len(runs))
@@ -0,0 +1,59 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+from netforce.common import route_table
+from neutron.tests import base
+
+
+class TestRouteTable(base.BaseTestCase):
+
+    def test_from_cidrs(self):
+        table = route_table.RouteTable.from_cidrs(
+            ['10.1.0.0/16', '10.0.0.0/8', '2001:db8::/64', '10.0.0.0/8'])
+        self.assertEqual(['10.0.0.0/8', '10.1.0.0/16'], list(table))
+        self.assertEqual(2, len(table))
+
+    def test_to_bytes_from_bytes(self):
+        table = route_table.RouteTable.from_cidrs(
+            ['10.%d.%d.0/24' % (i // 256, i % 256) for i in range(1000)])
+        data = table.to_bytes()
+        self.assertLess(len(data), 5 * len(table))
+        self.assertEqual(table, route_table.RouteTable.from_bytes(data))
+        self.assertEqual(table.content_hash,
+                         route_table.RouteTable.from_bytes(data).content_hash)
+        self.assertNotEqual(table.content_hash,
+                            route_table.RouteTable().content_hash)
+
+    def test_overlaps(self):
+        table = route_table.RouteTable.from_cidrs(
+            ['0.0.0.0/0', '10.8.0.0/22', '10.8.4.0/24', '10.8.5.0/24',
+             '10.9.0.0/16'])
+        self.assertEqual(['0.0.0.0/0', '10.8.0.0/22'],
+                         table.overlaps('10.8.1.0/24'))
+        self.assertEqual(['0.0.0.0/0', '10.8.4.0/24', '10.8.5.0/24'],
+                         table.overlaps('10.8.4.0/23'))
+        self.assertEqual(['0.0.0.0/0', '10.8.0.0/22'],
+                         table.overlaps('10.8.0.0/22'))
+        self.assertEqual(['0.0.0.0/0'], table.overlaps('10.8.6.0/24'))
+
+    def test_diff(self):
+        current = route_table.RouteTable.from_cidrs(
+            ['10.8.0.0/22', '10.9.0.0/16'])
+        previous = route_table.RouteTable.from_cidrs(
+            ['10.8.0.0/22', '10.10.0.0/16'])
+        self.assertEqual((['10.9.0.0/16'], ['10.10.0.0/16']),
+                         current.diff(previous))
+        self.assertNotEqual(current, previous)
@@ -0,0 +1,46 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+from netforce.common import subnet_allocator
+from neutron.tests import base
+
+
+class TestSubnetAllocator(base.BaseTestCase):
+
+    def test_allocate_first_free_block(self):
+        allocator = subnet_allocator.SubnetAllocator(
+            '10.0.0.0/16', ['10.0.0.0/24', '10.0.1.0/25', '10.0.4.0/22'])
+        self.assertEqual('10.0.2.0/24', allocator.allocate(24))
+        self.assertEqual('10.0.8.0/23', allocator.allocate(23))
+        self.assertEqual('10.0.3.0/24', allocator.allocate(24))
+        self.assertEqual('10.0.1.128/25', allocator.allocate(25))
+
+    def test_allocate_ignores_blocks_outside(self):
+        allocator = subnet_allocator.SubnetAllocator(
+            '10.0.0.0/24', ['9.0.0.0/8', '10.0.1.0/24', '2001:db8::/64'])
+        self.assertEqual('10.0.0.0/24', allocator.allocate(24))
+
+    def test_allocate_full(self):
+        allocator = subnet_allocator.SubnetAllocator('10.0.0.0/23',
+                                                     ['10.0.1.0/24'])
+        self.assertEqual('10.0.0.0/24', allocator.allocate(24))
+        self.assertIsNone(allocator.allocate(24))
+        self.assertIsNone(allocator.allocate(30))
+
+    def test_allocate_invalid_prefixlen(self):
+        allocator = subnet_allocator.SubnetAllocator('10.0.0.0/16')
+        self.assertRaises(ValueError, allocator.allocate, 8)
+        self.assertRaises(ValueError, allocator.allocate, 33)
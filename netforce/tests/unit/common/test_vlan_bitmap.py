@@ -0,0 +1,78 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+from netforce.common import vlan_bitmap
+from neutron.tests import base
+
+
+class TestVlanBitmap(base.BaseTestCase):
+
+    def test_from_ranges(self):
+        expected = vlan_bitmap.VlanBitmap([2, 3, 4, 10])
+        self.assertEqual(expected,
+                         vlan_bitmap.VlanBitmap.from_ranges('2-4,10'))
+        self.assertEqual(expected,
+                         vlan_bitmap.VlanBitmap.from_ranges(['2-4', u'10']))
+        self.assertEqual([2, 3, 4, 10], list(expected))
+        self.assertEqual(4, len(expected))
+
+    def test_from_ranges_invalid_member(self):
+        self.assertRaises(ValueError,
+                          vlan_bitmap.VlanBitmap.from_ranges, 'ALL')
+        self.assertRaises(ValueError,
+                          vlan_bitmap.VlanBitmap.from_ranges, ['4096'])
+        self.assertRaises(ValueError,
+                          vlan_bitmap.VlanBitmap.from_ranges, ['10-2'])
+        bitmap = vlan_bitmap.VlanBitmap.from_ranges(['ALL', '5'],
+                                                    ignore_invalid=True)
+        self.assertEqual([5], list(bitmap))
+
+    def test_to_ranges(self):
+        bitmap = vlan_bitmap.VlanBitmap([10, 2, 3, 4, 12, 4094])
+        self.assertEqual('2-4,10,12,4094', bitmap.to_ranges())
+        self.assertEqual('2-4 10 12 4094', bitmap.to_ranges(' '))
+        self.assertEqual('', vlan_bitmap.VlanBitmap().to_ranges())
+        self.assertEqual('1-4094',
+                         vlan_bitmap.VlanBitmap.from_ranges(
+                             '1-4094').to_ranges())
+
+    def test_set_operations(self):
+        current = vlan_bitmap.VlanBitmap.from_ranges('2-4,10')
+        requested = vlan_bitmap.VlanBitmap.from_ranges('3-4,10-11')
+        to_add, to_remove = requested.diff(current)
+        self.assertEqual('11', to_add.to_ranges())
+        self.assertEqual('2', to_remove.to_ranges())
+        self.assertEqual('2-4,10-11', (current | requested).to_ranges())
+        self.assertEqual('3-4,10', (current & requested).to_ranges())
+        self.assertNotEqual(current, requested)
+        self.assertFalse(requested - requested)
+
+    def test_add_discard_contains(self):
+        bitmap = vlan_bitmap.VlanBitmap()
+        bitmap.add('20')
+        self.assertIn(20, bitmap)
+        self.assertIn('20', bitmap)
+        self.assertNotIn('ALL', bitmap)
+        bitmap.discard(20)
+        self.assertNotIn(20, bitmap)
+        self.assertRaises(ValueError, bitmap.add, 4096)
+
+    def test_first_free(self):
+        bitmap = vlan_bitmap.VlanBitmap.from_ranges('2-4,6')
+        self.assertEqual(0, bitmap.first_free())
+        self.assertEqual(5, bitmap.first_free(2, 100))
+        self.assertEqual(7, bitmap.first_free(6, 100))
+        self.assertIsNone(bitmap.first_free(2, 4))
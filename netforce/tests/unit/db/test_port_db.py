@@ -109,6 +109,71 @@ class TestPortDbMixin(TestPortDbBase):
         self.assertIsNotNone(port_db)
         self.assertEqual(1, len(port_db))
 
+    def test_get_ports_scalar_projection(self):
+        ports = self.plugin.get_ports(self.context, fields=['id', 'name'])
+        self.assertEqual([{'id': self.port_db.id, 'name': 'test-port'}],
+                         ports)
+
+    def test_get_port_relationship_projection(self):
+        port = self.plugin.get_port(self.context, self.port_db.id,
+                                    fields=['name', 'asset_id'])
+        self.assertEqual({'name': 'test-port', 'asset_id': 'ASSET1234'},
+                         port)
+
+    def test_get_port_projection_not_found(self):
+        self.assertRaises(n_exc.PortNotFound, self.plugin.get_port,
+                          self.context, 'fake-port-id', fields=['id'])
+
+    def test_upsert_device_ports(self):
+        admin_states = {
+            'test-port': netforce_constants.SUSPENDED,
+            'eth1': constants.ACTIVE,
+            'eth2': netforce_constants.SUSPENDED
+        }
+        self.assertEqual((2, 1), self.plugin.upsert_device_ports(
+            self.context, self.device_db, admin_states))
+        ports = dict((port_db.name, port_db.admin_status)
+                     for port_db in self.device_db.ports)
+        self.assertEqual(admin_states, ports)
+        self.assertEqual(netforce_constants.SUSPENDED,
+                         self.plugin.get_port_db(
+                             self.context, self.port_db.id).admin_status)
+        # discovering the same ports again writes nothing.
+        self.assertEqual((0, 0), self.plugin.upsert_device_ports(
+            self.context, self.device_db, admin_states))
+
+    def test_iter_ports_in_pages(self):
+        self.config(stream_batch_size=2)
+        self.plugin.upsert_device_ports(
+            self.context, self.device_db,
+            {'eth1': constants.ACTIVE, 'eth2': constants.ACTIVE})
+        bridgegroup_db = self.plugin.create_bridgegroup(
+            self.context, {'name': 'test-bg', 'description': 'test-bg'})
+        vlan_ids = []
+        for tag in (2, 3):
+            vlan_db = self.plugin.create_vlan_by_bg_and_vpc(
+                self.context, {'name': 'test-vlan-%s' % tag, 'tag': tag,
+                               'admin_status': constants.ACTIVE},
+                bridgegroup_db)
+            vlan_ids.append(vlan_db.id)
+        self.plugin.replace_vlanportassociations(
+            self.context, self.port_db.id,
+            [(vlan_ids[0], True), (vlan_ids[1], False)])
+
+        ports = list(self.plugin.iter_ports(self.context))
+        self.assertEqual(['eth1', 'eth2', 'test-port'],
+                         sorted(port['name'] for port in ports))
+        port = [p for p in ports if p['id'] == self.port_db.id][0]
+        self.assertEqual([(2, True), (3, False)],
+                         sorted((v['vlan']['tag'], v['vlan']['is_native_vlan'])
+                                for v in port['vlans']))
+
+        vlanportassociations = list(self.plugin.iter_vlanportassociations(
+            self.context, filters={'port_id': [self.port_db.id]},
+            fields=['vlan_id']))
+        self.assertEqual(sorted(vlan_ids),
+                         sorted(v['vlan_id'] for v in vlanportassociations))
+
     def test_port_db_update(self):
         self.plugin.\
             update_port(self.context, self.port_db.id,
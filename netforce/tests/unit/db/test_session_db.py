@@ -0,0 +1,165 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import datetime
+
+import mock
+from oslo_utils import timeutils
+import sqlalchemy as sa
+from sqlalchemy import orm
+
+from netforce.common import netforce_exceptions as netforce_exc
+from netforce.db import session_db
+from neutron.tests import base
+
+
+class TestSessionAuditWriter(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestSessionAuditWriter, self).setUp()
+        self.writer = session_db.SessionAuditWriter(
+            queue_size=2, batch_size=10, flush_interval=0.01,
+            drop_when_full=True)
+        self.db = mock.Mock()
+        self.writer._db = self.db
+        self.addCleanup(self.writer.stop)
+
+    def test_records_written_in_one_batch_on_stop(self):
+        row = session_db.make_session_row(req_id='req-1', username=None)
+        self.writer.create(row)
+        self.writer.end('req-1', req_api_end=2.0, http_rtn='200 OK')
+        self.writer.stop()
+
+        self.db.create_sessions.assert_called_once_with(mock.ANY, [row])
+        self.db.end_sessions.assert_called_once_with(
+            mock.ANY, [{'req_id': 'req-1', 'req_api_end': 2.0,
+                        'http_rtn': '200 OK', 'rtn_bytes': 0}])
+        self.assertEqual('', row['username'])
+
+    def test_failed_batch_written_one_by_one(self):
+        rows = [session_db.make_session_row(req_id=str(i)) for i in range(2)]
+
+        def _create_sessions(context, session_rows):
+            if len(session_rows) > 1 or session_rows[0]['req_id'] == '0':
+                raise ValueError()
+
+        self.db.create_sessions.side_effect = _create_sessions
+        for row in rows:
+            self.writer.create(row)
+        self.writer.stop()
+
+        # only the bad record is lost, the other is written on its own.
+        self.assertEqual([mock.call(mock.ANY, rows),
+                          mock.call(mock.ANY, [rows[0]]),
+                          mock.call(mock.ANY, [rows[1]])],
+                         self.db.create_sessions.call_args_list)
+
+    def test_records_dropped_when_queue_full(self):
+        # nothing is consumed until the writer thread gets to run.
+        for i in range(3):
+            self.writer.create(session_db.make_session_row(req_id=str(i)))
+        self.assertEqual(1, self.writer.dropped)
+        self.writer.stop()
+        rows = self.db.create_sessions.call_args[0][1]
+        self.assertEqual(['0', '1'], [row['req_id'] for row in rows])
+
+
+class TestPurgeSessions(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestPurgeSessions, self).setUp()
+        self.engine = sa.create_engine('sqlite://')
+        session_db.Session.__table__.create(self.engine)
+        session_db.SessionArchive.__table__.create(self.engine)
+        now = timeutils.utcnow()
+        rows = []
+        for days in (1, 10, 100, 200, 400):
+            created_at = now - datetime.timedelta(days=days)
+            rows.append(session_db.make_session_row(
+                req_id='req-%d' % days, created_at=created_at,
+                updated_at=created_at))
+        with self.engine.begin() as conn:
+            conn.execute(session_db.Session.__table__.insert(), rows)
+
+    def _req_ids(self, table):
+        with self.engine.begin() as conn:
+            return sorted(row[0] for row in conn.execute(
+                sa.select([table.c.req_id])))
+
+    def test_purge_archives_in_batches(self):
+        purged, archive_purged = session_db.purge_sessions(
+            self.engine, 30, batch_size=2, archive_retention_days=300)
+        self.assertEqual((3, 1), (purged, archive_purged))
+        self.assertEqual(['req-1', 'req-10'],
+                         self._req_ids(session_db.Session.__table__))
+        self.assertEqual(['req-100', 'req-200'],
+                         self._req_ids(session_db.SessionArchive.__table__))
+
+    def test_purge_without_archive(self):
+        purged, _ = session_db.purge_sessions(self.engine, 30,
+                                              archive=False)
+        self.assertEqual(3, purged)
+        self.assertEqual(
+            [], self._req_ids(session_db.SessionArchive.__table__))
+
+
+class TestGetSessionsInRange(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestGetSessionsInRange, self).setUp()
+        engine = sa.create_engine('sqlite://')
+        session_db.Session.__table__.create(engine)
+        self.now = datetime.datetime(2018, 1, 1)
+        rows = []
+        # two sessions created at the same time, ordered by their ids.
+        for i, minutes in enumerate((0, 10, 10, 20, 30)):
+            created_at = self.now + datetime.timedelta(minutes=minutes)
+            rows.append(session_db.make_session_row(
+                id='id-%d' % i, req_id='req-%d' % i,
+                username='alice' if i % 2 else 'bob',
+                created_at=created_at, updated_at=created_at))
+        with engine.begin() as conn:
+            conn.execute(session_db.Session.__table__.insert(), rows)
+        self.db_session = orm.sessionmaker(bind=engine)()
+        self.addCleanup(self.db_session.close)
+
+    def _req_ids(self, **kwargs):
+        return [session.req_id for session in
+                session_db.get_sessions_in_range(self.db_session, **kwargs)]
+
+    def test_range_includes_start_excludes_end(self):
+        self.assertEqual(
+            ['req-1', 'req-2', 'req-3'],
+            self._req_ids(start=self.now + datetime.timedelta(minutes=10),
+                          end=self.now + datetime.timedelta(minutes=30)))
+
+    def test_pages_follow_the_marker(self):
+        self.assertEqual(['req-0', 'req-1'], self._req_ids(limit=2))
+        self.assertEqual(['req-2', 'req-3'],
+                         self._req_ids(limit=2, marker='id-1'))
+        self.assertEqual(['req-4'], self._req_ids(limit=2, marker='id-3'))
+
+    def test_filtered_by_username(self):
+        self.assertEqual(['req-1', 'req-3'], self._req_ids(username='alice'))
+
+    def test_page_capped_at_max_query_sessions(self):
+        self.config(max_query_sessions=3, group='session_audit')
+        self.assertEqual(['req-0', 'req-1', 'req-2'],
+                         self._req_ids(limit=10))
+
+    def test_unknown_marker(self):
+        self.assertRaises(netforce_exc.SessionNotFound, self._req_ids,
+                          marker='missing')
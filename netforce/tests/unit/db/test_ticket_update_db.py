@@ -0,0 +1,80 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import datetime
+
+from neutron import context
+
+from netforce.db import netforce_db
+from netforce.tests import base
+
+
+class TestTicketUpdateDb(base.NetforceSqlTestCase):
+
+    def setUp(self):
+        super(TestTicketUpdateDb, self).setUp()
+        self.context = context.get_admin_context()
+        self.db = netforce_db.NetforceDbMixin()
+        self.now = datetime.datetime(2018, 1, 1)
+
+    def _enqueue(self, ticket_num, payload, minutes=0):
+        return self.db.enqueue_ticket_update(
+            self.context, ticket_num, payload,
+            self.now + datetime.timedelta(minutes=minutes))
+
+    def _due(self, minutes=10, limit=10):
+        return [(update_db.ticket_num, update_db.payload)
+                for update_db in self.db.get_due_ticket_updates(
+                    self.context,
+                    self.now + datetime.timedelta(minutes=minutes), limit)]
+
+    def test_oldest_update_of_each_ticket(self):
+        self._enqueue('CR1', 'ready', minutes=0)
+        self._enqueue('CR2', 'ready', minutes=1)
+        self._enqueue('CR1', 'complete', minutes=2)
+
+        self.assertEqual([('CR1', 'ready'), ('CR2', 'ready')], self._due())
+        self.assertEqual([('CR1', 'ready')], self._due(limit=1))
+
+    def test_backing_off_update_holds_the_ticket(self):
+        update_db = self._enqueue('CR1', 'ready', minutes=0)
+        self._enqueue('CR1', 'complete', minutes=1)
+        self._enqueue('CR2', 'ready', minutes=2)
+        self.db.reschedule_ticket_update(
+            self.context, update_db.id, 1,
+            self.now + datetime.timedelta(minutes=30), 'unavailable')
+
+        self.assertEqual([('CR2', 'ready')], self._due())
+
+    def test_updates_made_at_the_same_time(self):
+        first = self._enqueue('CR1', 'ready')
+        second = self._enqueue('CR1', 'complete')
+        if second.id < first.id:
+            first, second = second, first
+        self.db.reschedule_ticket_update(
+            self.context, first.id, 1,
+            self.now + datetime.timedelta(minutes=30), 'unavailable')
+
+        self.assertEqual([], self._due())
+
+    def test_delete_updates_of_a_ticket(self):
+        self._enqueue('CR1', 'ready', minutes=0)
+        self._enqueue('CR1', 'complete', minutes=1)
+        self._enqueue('CR2', 'ready', minutes=2)
+
+        self.db.delete_ticket_updates(self.context, 'CR1')
+
+        self.assertEqual([('CR2', 'ready')], self._due())
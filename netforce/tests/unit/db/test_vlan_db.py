@@ -213,3 +213,33 @@ class TestVlanDbMixin(TestVlanDbBase):
             ._get_vlanportassociations_by_vlan_id(self.context,
                                                   vlan_model.id)
         self.assertEqual(0, len(vlan_port_assc_2))
+
+    def test_replace_vlanportassociations(self):
+        vlan_ids = []
+        for tag in (2, 3):
+            vlan_model = self.vlan_db.create_vlan_by_bg_and_vpc(
+                self.context, {'name': 'test-vlan-%s' % tag,
+                               'tag': tag,
+                               'admin_status': constants.ACTIVE},
+                self.bridgegroup_from_db)
+            vlan_ids.append(vlan_model.id)
+        port_id = self.device_db.get_device_db(
+            self.context, self.device_id).ports[0].id
+
+        deleted = self.vlan_db.replace_vlanportassociations(
+            self.context, port_id,
+            [(vlan_ids[0], True), (vlan_ids[1], False),
+             (vlan_ids[1], False)])
+        self.assertEqual(0, deleted)
+        port_db = self.port_db.get_port_db(self.context, port_id)
+        self.assertEqual(
+            sorted([(vlan_ids[0], True), (vlan_ids[1], False)]),
+            sorted((v.vlan_id, v.is_native_vlan) for v in port_db.vlans))
+
+        deleted = self.vlan_db.replace_vlanportassociations(
+            self.context, port_id, [(vlan_ids[1], True)])
+        self.assertEqual(2, deleted)
+        port_db = self.port_db.get_port_db(self.context, port_id)
+        self.assertEqual([(vlan_ids[1], True)],
+                         [(v.vlan_id, v.is_native_vlan)
+                          for v in port_db.vlans])
@@ -451,3 +451,172 @@ class test_get_routes_aggregate_flat_network(EosTestSuite):
                 ret = self.driver.get_routes_aggregate()
                 expected = [u'10.174.128.0/18', u'10.20.125.0/25']
                 self.assertEqual(sorted(expected), sorted(ret))
+
+
+class test_update_trunk_vlans_pushes_delta(EosTestSuite):
+
+    def runTest(self):
+        current_config = {
+            'switch_port_mode': 'trunk',
+            'native_vlan': '2',
+            'trunk_vlans': '2-4,10'
+        }
+        port = {
+            "switch_port_mode": "trunk",
+            "vlans": [
+                {"vlan": {"tag": "2", "is_native": True}},
+                {"vlan": {"tag": "3", "is_native": False}},
+                {"vlan": {"tag": "10", "is_native": False}},
+                {"vlan": {"tag": "11", "is_native": False}}
+            ]
+        }
+        with mock.patch.object(self.driver, '_execute', create=True) \
+                as push_changes:
+            self.driver.update_switch_port_vlans_on_device(
+                'Ethernet1', port, current_config=current_config)
+            push_changes.assert_called_once_with(
+                config=['interface ethernet 1',
+                        'switchport trunk allowed vlan add 11',
+                        'switchport trunk allowed vlan remove 4'],
+                commit=True)
+
+
+class test_update_trunk_vlans_no_delta(EosTestSuite):
+
+    def runTest(self):
+        current_config = {
+            'switch_port_mode': 'trunk',
+            'native_vlan': '2',
+            'trunk_vlans': '2-3'
+        }
+        port = {
+            "switch_port_mode": "trunk",
+            "vlans": [
+                {"vlan": {"tag": "2", "is_native": True}},
+                {"vlan": {"tag": "3", "is_native": False}}
+            ]
+        }
+        with mock.patch.object(self.driver, '_execute', create=True) \
+                as push_changes:
+            self.assertIsNone(self.driver.update_switch_port_vlans_on_device(
+                'Ethernet1', port, current_config=current_config))
+            self.assertFalse(push_changes.called)
+
+
+class test_get_interface_snapshot(EosTestSuite):
+
+    def runTest(self):
+        with mock.patch.object(self.driver, '_exec_command') as exec_command:
+            with mock.patch.object(self.driver, '_check_if_connected'):
+                exec_command.return_value = \
+                    "interface Ethernet38\n" \
+                    "   description foo\n" \
+                    "   shutdown\n" \
+                    "  5 minutes input rate 830 Mbps (8.4% with framing " \
+                    "overhead), 69640 packets/sec\n" \
+                    "  5 minutes output rate 411 Mbps (4.2% with framing " \
+                    "overhead), 42739 packets/sec\n"
+                data = self.driver.get_interface_snapshot(
+                    'Ethernet38', with_traffic=True)
+                exec_command.assert_called_once_with(
+                    'show running-config interfaces Ethernet38\n'
+                    'show interfaces Ethernet38 | include rate')
+                expected = {
+                    'exists': True,
+                    'is_enabled': False,
+                    'running_config': ['interface Ethernet38',
+                                       'description foo', 'shutdown'],
+                    'traffic': (830000000, 411000000)
+                }
+                self.assertEqual(expected, data)
+
+
+class test_get_interface_snapshot_unparsed_rates(EosTestSuite):
+
+    def runTest(self):
+        with mock.patch.object(self.driver, '_exec_command') as exec_command:
+            with mock.patch.object(self.driver, '_check_if_connected'):
+                with mock.patch.object(self.driver,
+                                       'get_traffic_on_interface') \
+                        as get_traffic:
+                    exec_command.return_value = \
+                        "interface Ethernet38\n" \
+                        "   description foo\n" \
+                        "  Last 5 minutes input rate unavailable\n" \
+                        "  Last 5 minutes output rate unavailable\n"
+                    get_traffic.return_value = (830000000, 411000000)
+                    data = self.driver.get_interface_snapshot(
+                        'Ethernet38', with_traffic=True)
+                    get_traffic.assert_called_once_with('Ethernet38')
+                    self.assertEqual((830000000, 411000000),
+                                     data['traffic'])
+                    self.assertEqual(['interface Ethernet38',
+                                      'description foo'],
+                                     data['running_config'])
+
+
+class test_disable_interface_from_snapshots(EosTestSuite):
+
+    def runTest(self):
+        with mock.patch.object(self.driver, '_exec_command') as exec_command:
+            with mock.patch.object(self.driver, '_check_if_connected'):
+                exec_command.side_effect = [
+                    "interface Ethernet1\n   description foo\n",
+                    None,
+                    "interface Ethernet1\n   description foo\n"
+                    "   shutdown\n"]
+                self.driver.disable_interface('Ethernet1')
+                self.assertEqual(3, exec_command.call_count)
+
+                exec_command.side_effect = [
+                    "interface Ethernet1\n   description foo\n",
+                    None,
+                    "interface Ethernet1\n   description foo\n"]
+                self.assertRaises(
+                    ebay_exceptions.PostChangeValidationException,
+                    self.driver.disable_interface, 'Ethernet1')
+
+
+class test_validate_vlan_tags_one_fetch(EosTestSuite):
+
+    def runTest(self):
+        with mock.patch.object(self.driver, '_exec_command_json') \
+                as exec_command:
+            exec_command.return_value = {
+                'vlans': {
+                    '2': {'status': 'active', 'name': 'test-vlan-2'},
+                    '3': {'status': 'active', 'name': 'test-vlan-3'},
+                    '4': {'status': 'suspend', 'name': 'test-vlan-4'}
+                }
+            }
+            self.driver._validate_vlan_tags([2, 3])
+            self.assertRaises(ebay_exceptions.EntityDoesNotExistsException,
+                              self.driver._validate_vlan_tags, [2, 5])
+            self.assertRaises(ebay_exceptions.EntityInSuspendedModeException,
+                              self.driver._validate_vlan_tags, [3, 4])
+            exec_command.assert_called_once_with('show vlan')
+
+
+class test_get_mac_address_table(EosTestSuite):
+
+    def runTest(self):
+        with mock.patch.object(self.driver, '_exec_command') as exec_command:
+            with mock.patch.object(self.driver, '_check_if_connected'):
+                exec_command.return_value = """
+                      Mac Address Table
+------------------------------------------------------------------
+
+Vlan    Mac Address       Type        Ports      Moves   Last Move
+----    -----------       ----        -----      -----   ---------
+   1    001c.7315.b96c    STATIC      Router
+   1    1cc1.de18.9a42    DYNAMIC     Et38       1       410 days, 10:10:18 ag
+   2    1cc1.de18.9a44    DYNAMIC     Et40       1       410 days, 9:43:05 ag
+Total Mac Addresses for this criterion: 2
+                """
+                data = self.driver.get_mac_address_table()
+                expected = [{'vlan': 1, 'interface': 'Ethernet38',
+                             'mac_address': u'1C:C1:DE:18:9A:42'},
+                            {'vlan': 2, 'interface': 'Ethernet40',
+                             'mac_address': u'1C:C1:DE:18:9A:44'}]
+                self.assertEqual(expected, data)
+                exec_command.assert_called_once_with('show mac address-table')
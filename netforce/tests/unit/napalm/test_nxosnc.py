@@ -56,14 +56,11 @@ class NexusOSTestSuite(base.DietTestCase):
 
 class test_update_switch_port_on_interface_vlan_suspended(NexusOSTestSuite):
 
-    def mock_get_vlan(self, *args, **kwargs):
-        return {
-                    'name': 'test-vlan-2',
-                    'status': 'suspend'
-        }
+    def mock_vlan_states(self, *args, **kwargs):
+        return {2: 'suspend'}
 
     def runTest(self):
-        with mock.patch.object(self.driver, 'get_vlan') as get_vlan_mocks:
+        with mock.patch.object(self.driver, 'get_vlan_states') as states:
             with mock.patch.object(self.driver, 'compare_vlan_config') \
                     as compare_config:
                 with mock.patch.object(self.driver, 'get_vlans_on_interface') \
@@ -80,7 +77,7 @@ class test_update_switch_port_on_interface_vlan_suspended(NexusOSTestSuite):
                                 'native_vlan': u'3', 'trunk_vlans': u'3-4'
                             }
                             compare_config.side_effect = [False, True]
-                            get_vlan_mocks.side_effect = self.mock_get_vlan
+                            states.side_effect = self.mock_vlan_states
 
                             port = {
                                 "switch_port_mode": "access",
@@ -103,15 +100,11 @@ class test_update_switch_port_on_interface_vlan_suspended(NexusOSTestSuite):
 class test_update_switch_port_on_int_multi_vlan_not_support_acc_mode(
         NexusOSTestSuite):
 
-    def mock_get_vlan(self, *args, **kwargs):
-
-        return {
-            'name': 'test-vlan-2',
-            'status': 'active'
-        }
+    def mock_vlan_states(self, *args, **kwargs):
+        return {2: 'active', 3: 'active'}
 
     def runTest(self):
-        with mock.patch.object(self.driver, 'get_vlan') as get_vlan_mocks:
+        with mock.patch.object(self.driver, 'get_vlan_states') as states:
             with mock.patch.object(self.driver, 'compare_vlan_config') \
                     as compare_config:
                 with mock.patch.object(self.driver, 'get_vlans_on_interface') \
@@ -128,7 +121,7 @@ class test_update_switch_port_on_int_multi_vlan_not_support_acc_mode(
                                 'native_vlan': u'3', 'trunk_vlans': u'3-4'
                             }
                             compare_config.side_effect = [False, True]
-                            get_vlan_mocks.side_effect = self.mock_get_vlan
+                            states.side_effect = self.mock_vlan_states
                             port = {
                                 "switch_port_mode": "access",
                                 "admin_status": "SUSPENDED",
@@ -154,21 +147,12 @@ class test_update_switch_port_on_int_multi_vlan_not_support_acc_mode(
 class test_update_switch_port_on_interface_invalid_switch_port_mode(
                 NexusOSTestSuite):
 
-    def mock_get_vlan(self, *args, **kwargs):
-        if kwargs['number'] == 2:
-            return {
-                'name': 'test-vlan-2',
-                'status': 'active'
-            }
-        else:
-            return {
-                'name': 'test-vlan-3',
-                'status': 'active'
-            }
+    def mock_vlan_states(self, *args, **kwargs):
+        return {2: 'active', 3: 'active'}
 
     def runTest(self):
-        with mock.patch.object(self.driver, 'get_vlan') as get_vlan_mocks:
-            get_vlan_mocks.side_effect = self.mock_get_vlan
+        with mock.patch.object(self.driver, 'get_vlan_states') as states:
+            states.side_effect = self.mock_vlan_states
             with mock.patch.object(self.driver, '_exec_command') \
                     as push_changes:
                 with mock.patch.object(
@@ -207,11 +191,8 @@ class test_update_switch_port_on_interface_access_mode_success(
     def validate_commands(self, config):
         self.assertIs(5, len(config))
 
-    def mock_get_vlan(self, *args, **kwargs):
-        return {
-            'name': 'test-vlan-2',
-            'status': 'active'
-        }
+    def mock_vlan_states(self, *args, **kwargs):
+        return {2: 'active'}
 
     def mock_get_vlans_on_interfaces(self, interfaces):
         return {
@@ -219,8 +200,8 @@ class test_update_switch_port_on_interface_access_mode_success(
         }
 
     def runTest(self):
-        with mock.patch.object(self.driver, 'get_vlan') as get_vlan_mocks:
-            get_vlan_mocks.side_effect = self.mock_get_vlan
+        with mock.patch.object(self.driver, 'get_vlan_states') as states:
+            states.side_effect = self.mock_vlan_states
 
             with mock.patch.object(self.driver, '_exec_command') \
                     as push_changes:
@@ -259,11 +240,8 @@ class test_update_switch_port_prevalidation_success(
     def validate_commands(self, config):
         self.assertIs(5, len(config))
 
-    def mock_get_vlan(self, *args, **kwargs):
-        return {
-            'name': 'test-vlan-2',
-            'status': 'active'
-        }
+    def mock_vlan_states(self, *args, **kwargs):
+        return {2: 'active'}
 
     def mock_get_vlans_on_interfaces(self, interfaces):
         return {
@@ -271,8 +249,8 @@ class test_update_switch_port_prevalidation_success(
         }
 
     def runTest(self):
-        with mock.patch.object(self.driver, 'get_vlan') as get_vlan_mocks:
-            get_vlan_mocks.side_effect = self.mock_get_vlan
+        with mock.patch.object(self.driver, 'get_vlan_states') as states:
+            states.side_effect = self.mock_vlan_states
 
             with mock.patch.object(self.driver, '_exec_command') \
                     as push_changes:
@@ -312,11 +290,8 @@ class test_update_switch_port_postvalidation_failure(
     def validate_commands(self, config):
         self.assertIs(5, len(config))
 
-    def mock_get_vlan(self, *args, **kwargs):
-        return {
-            'name': 'test-vlan-2',
-            'status': 'active'
-        }
+    def mock_vlan_states(self, *args, **kwargs):
+        return {2: 'active'}
 
     def mock_get_vlans_on_interfaces(self, interfaces):
         return {
@@ -324,8 +299,8 @@ class test_update_switch_port_postvalidation_failure(
         }
 
     def runTest(self):
-        with mock.patch.object(self.driver, 'get_vlan') as get_vlan_mocks:
-            get_vlan_mocks.side_effect = self.mock_get_vlan
+        with mock.patch.object(self.driver, 'get_vlan_states') as states:
+            states.side_effect = self.mock_vlan_states
             port = {
                 "switch_port_mode": "access",
                 "admin_status": "ACTIVE",
@@ -1307,11 +1282,8 @@ class test_update_switch_port_on_interface_trunk_mode_allowed_vlans(
     def validate_commands(self, config):
         self.assertIs(5, len(config))
 
-    def mock_get_vlan(self, *args, **kwargs):
-        return {
-            'name': 'test-vlan-2',
-            'status': 'active'
-        }
+    def mock_vlan_states(self, *args, **kwargs):
+        return {2: 'active', 3: 'active', 5: 'active'}
 
     def mock_get_vlans_on_interfaces(self, interfaces):
         return {
@@ -1319,8 +1291,8 @@ class test_update_switch_port_on_interface_trunk_mode_allowed_vlans(
         }
 
     def runTest(self):
-        with mock.patch.object(self.driver, 'get_vlan') as get_vlan_mocks:
-            get_vlan_mocks.side_effect = self.mock_get_vlan
+        with mock.patch.object(self.driver, 'get_vlan_states') as states:
+            states.side_effect = self.mock_vlan_states
 
             with mock.patch.object(self.driver, '_exec_command') \
                     as push_changes:
@@ -0,0 +1,90 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import eventlet
+import mock
+
+from netforce.services import device_queue
+from neutron.tests import base
+
+
+class TestDeviceWorkQueue(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestDeviceWorkQueue, self).setUp()
+        self.queue = device_queue.DeviceWorkQueue(0, 10)
+        self.batches = []
+        self.stop_coordinator = mock.patch.object(
+            device_queue.lockutils, 'stop_coordinator').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _run_batch(self, device_id, changes):
+        self.batches.append([(c.port_id, c.body) for c in changes])
+        for change in changes:
+            change.done.send(dict(change.body, id=change.port_id))
+
+    def _submit(self, port_id, body, kwargs=None):
+        return eventlet.spawn(self.queue.submit, 'device1', None, port_id,
+                              body, kwargs or {}, self._run_batch)
+
+    def test_updates_of_a_port_are_merged(self):
+        first = self._submit('port1', {'admin_status': 'SUSPENDED'})
+        second = self._submit('port1', {'admin_status': 'ACTIVE',
+                                        'label': 'server1'})
+        other = self._submit('port2', {'label': 'server2'})
+        expected = {'id': 'port1', 'admin_status': 'ACTIVE',
+                    'label': 'server1'}
+        self.assertEqual(expected, first.wait())
+        self.assertEqual(expected, second.wait())
+        self.assertEqual({'id': 'port2', 'label': 'server2'}, other.wait())
+        self.assertEqual([[('port1', {'admin_status': 'ACTIVE',
+                                      'label': 'server1'}),
+                           ('port2', {'label': 'server2'})]], self.batches)
+        self.stop_coordinator.assert_called_once_with()
+
+    def test_flip_and_enable_are_not_merged(self):
+        first = self._submit('port1', {'admin_status': 'ACTIVE'})
+        second = self._submit('port1', {'vlans': [{'vlan': {'tag': '2'}}]})
+        first.wait()
+        second.wait()
+        self.assertEqual(1, len(self.batches))
+        self.assertEqual(['port1', 'port1'],
+                         [port_id for port_id, _ in self.batches[0]])
+
+    def test_batch_failure_is_sent_to_every_change(self):
+        def _run_batch(device_id, changes):
+            raise ValueError('no route to device')
+
+        waiter = eventlet.spawn(self.queue.submit, 'device1', None, 'port1',
+                                {'label': 'server1'}, {}, _run_batch)
+        self.assertRaises(ValueError, waiter.wait)
+
+
+class TestDeviceSession(base.BaseTestCase):
+
+    def test_open_once_and_release(self):
+        driver = mock.Mock()
+        session = device_queue.DeviceSession(driver)
+        session.open()
+        session.get_interface_running_config('Ethernet1')
+        session.close()
+        session.open()
+        self.assertEqual(1, driver.open.call_count)
+        self.assertFalse(driver.close.called)
+        session.release()
+        driver.close.assert_called_once_with()
+        driver.get_interface_running_config.assert_called_once_with(
+            'Ethernet1')
@@ -0,0 +1,87 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import eventlet
+import mock
+
+from netforce.services import reconciliation
+from neutron.tests import base
+
+
+class TestReconciler(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestReconciler, self).setUp()
+        self.plugin = mock.Mock()
+        self.plugin.get_last_reconcile_sweep_id.return_value = 'sweep1'
+        self.saved = {}
+        self.plugin.save_reconciliation.side_effect = self._save
+        self.reconciler = reconciliation.Reconciler(self.plugin, 4, 0.1)
+        mock.patch.object(reconciliation.lockutils, 'lock').start()
+        mock.patch.object(reconciliation.n_context,
+                          'get_admin_context').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _save(self, context, device_id, sweep_id, checked_at, status,
+              error=None, drifts=None):
+        self.saved[device_id] = (sweep_id, status, error, drifts)
+
+    def _reconcile_device(self, context, device_id):
+        if device_id == 'slow':
+            eventlet.sleep(1)
+        if device_id == 'broken':
+            raise Exception('unreachable')
+        return [{'resource': 'port'}] if device_id == 'drifted' else []
+
+    def test_sweep_records_each_device(self):
+        self.plugin.get_devices_to_reconcile.return_value = [
+            'clean', 'drifted', 'slow', 'broken']
+        self.plugin.reconcile_device.side_effect = self._reconcile_device
+
+        summary = self.reconciler.run()
+
+        sweep_id = summary['sweep_id']
+        self.assertEqual({'sweep_id': sweep_id, 'checked': 2, 'failed': 2,
+                          'drifted': 1, 'drifts': 1}, summary)
+        self.assertEqual((sweep_id, 'COMPLETED', None, []),
+                         self.saved['clean'])
+        self.assertEqual((sweep_id, 'COMPLETED', None,
+                          [{'resource': 'port'}]), self.saved['drifted'])
+        self.assertEqual('FAILED', self.saved['slow'][1])
+        self.assertIn('timed out', self.saved['slow'][2])
+        self.assertEqual((sweep_id, 'FAILED', 'unreachable', None),
+                         self.saved['broken'])
+        self.assertFalse(self.plugin.get_last_reconcile_sweep_id.called)
+
+    def test_resume_continues_last_sweep(self):
+        self.plugin.get_devices_to_reconcile.return_value = ['device2']
+        self.plugin.reconcile_device.return_value = []
+
+        summary = self.reconciler.run(resume=True, limit=10)
+
+        self.assertEqual('sweep1', summary['sweep_id'])
+        self.plugin.get_devices_to_reconcile.assert_called_once_with(
+            mock.ANY, 'sweep1', limit=10)
+
+    def test_resume_starts_new_sweep_when_done(self):
+        self.plugin.get_devices_to_reconcile.side_effect = [[], ['device1']]
+        self.plugin.reconcile_device.return_value = []
+
+        summary = self.reconciler.run(resume=True)
+
+        self.assertNotEqual('sweep1', summary['sweep_id'])
+        self.assertEqual(1, summary['checked'])
+        self.assertEqual(summary['sweep_id'], self.saved['device1'][0])
@@ -0,0 +1,79 @@
+# Copyright 2018 eBay Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+
+import datetime
+
+import mock
+
+from netforce.common import periodic
+from netforce.services import ticket_outbox
+from neutron.tests import base
+
+
+class TestTicketOutbox(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestTicketOutbox, self).setUp()
+        self.plugin = mock.Mock()
+        self.outbox = ticket_outbox.TicketOutbox(self.plugin, 10, 3, 5, 600)
+        mock.patch.object(periodic.lockutils, 'lock').start()
+        mock.patch.object(ticket_outbox.n_context,
+                          'get_admin_context').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _update(self, update_id, attempts=0):
+        return mock.Mock(id=update_id, ticket_num='CR1', attempts=attempts,
+                         payload='{"changeimplementation_status": "Complete"}')
+
+    def test_sent_update_is_removed(self):
+        self.plugin.get_due_ticket_updates.return_value = [self._update('u1')]
+
+        self.assertEqual(1, self.outbox.run())
+
+        self.plugin.send_cr_update.assert_called_once_with(
+            'CR1', {'changeimplementation_status': 'Complete'})
+        self.plugin.delete_ticket_update.assert_called_once_with(mock.ANY,
+                                                                 'u1')
+        self.assertFalse(self.plugin.reschedule_ticket_update.called)
+
+    def test_failed_update_is_retried_with_backoff(self):
+        self.plugin.get_due_ticket_updates.return_value = [
+            self._update('u1', attempts=1)]
+        self.plugin.send_cr_update.side_effect = Exception('unavailable')
+
+        self.assertEqual(0, self.outbox.run())
+
+        args = self.plugin.reschedule_ticket_update.call_args[0]
+        self.assertEqual(('u1', 2), args[1:3])
+        # 5 seconds doubled once.
+        delay = args[3] - datetime.datetime.now()
+        self.assertTrue(datetime.timedelta(seconds=9) < delay <=
+                        datetime.timedelta(seconds=10))
+        self.assertEqual('unavailable', args[4])
+        self.assertFalse(self.plugin.delete_ticket_update.called)
+
+    def test_update_is_given_up_after_max_attempts(self):
+        self.plugin.get_due_ticket_updates.return_value = [
+            self._update('u1', attempts=2)]
+        self.plugin.send_cr_update.side_effect = Exception('unavailable')
+
+        self.assertEqual(0, self.outbox.run())
+
+        # the later updates of the ticket are not sent without it.
+        self.plugin.delete_ticket_updates.assert_called_once_with(mock.ANY,
+                                                                  'CR1')
+        self.assertFalse(self.plugin.delete_ticket_update.called)
+        self.assertFalse(self.plugin.reschedule_ticket_update.called)